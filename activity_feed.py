@@ -0,0 +1,90 @@
+"""
+فهرست قابل اسکرول رویدادهای اخیر (تماس‌ها و ارسال‌ها) با RecycleView
+"""
+
+import threading
+import time
+from collections import deque
+
+from kivy.clock import Clock
+from kivy.metrics import sp
+from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+
+from activity_log import DEFAULT_ACTIVITY_SIZE
+from history_store import EVENT_MISSED_CALL, EVENT_SMS_SENT, EVENT_SMS_FAILED
+from persian_text import shape
+
+# متن و رنگ هر نوع رویداد
+EVENT_ROWS = {
+    EVENT_MISSED_CALL: ('تماس از دست رفته', (1, 1, 1, 1)),
+    EVENT_SMS_SENT: ('پیامک ارسال شد', (0, 1, 0, 1)),
+    EVENT_SMS_FAILED: ('خطا در ارسال پیامک', (1, 0, 0, 1)),
+}
+
+
+class FeedRow(Label):
+    """یک سطر فهرست (راست‌چین)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.halign = 'right'
+        self.valign = 'middle'
+        self.bind(size=self.setter('text_size'))
+
+
+class ActivityFeed(RecycleView):
+    """
+    فهرست رویدادها (جدیدترین بالا) با تعداد سطر محدود
+
+    RecycleView فقط برای سطرهای قابل مشاهده ویجت می‌سازد و داده سطرها در یک
+    بافر حلقوی با اندازه max_rows نگه داشته می‌شود. add_entries از هر رشته‌ای
+    قابل فراخوانی است؛ رویدادها جمع و حداکثر یک بار در هر فریم به فهرست
+    اضافه می‌شوند. متن هر سطر یک بار هنگام اضافه شدن ساخته می‌شود: عبارت
+    فارسی از کش شکل‌دهی می‌آید و زمان و شماره (چپ به راست) کنار آن قرار
+    می‌گیرند، پس متن‌های یکتای سطرها کش شکل‌دهی را پر نمی‌کنند.
+    """
+
+    def __init__(self, max_rows=DEFAULT_ACTIVITY_SIZE, row_height=None, **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = FeedRow
+        layout = RecycleBoxLayout(orientation='vertical', default_size=(None, row_height or sp(28)),
+                                  default_size_hint=(1, None), size_hint_y=None)
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.rows = deque(maxlen=max_rows)
+        self._pending = []
+        self._lock = threading.Lock()
+        # فراخوانی‌های پشت سر هم trigger در یک فریم فقط یک بار _refresh را اجرا می‌کنند
+        self._refresh_trigger = Clock.create_trigger(self._refresh)
+
+    def add_entries(self, entries):
+        """افزودن رویدادها (seq، زمان، نوع، شماره، خط) از هر رشته‌ای"""
+        if not entries:
+            return
+        with self._lock:
+            self._pending.extend(entries)
+        self._refresh_trigger()
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+        self.rows.clear()
+        self.data = []
+
+    def _refresh(self, dt=None):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        # رویدادهایی که به هر حال از بافر بیرون می‌افتند ساخته نمی‌شوند
+        for entry in pending[-self.rows.maxlen:]:
+            self.rows.appendleft(self.row_data(entry))
+        self.data = list(self.rows)
+
+    @staticmethod
+    def row_data(entry):
+        """داده سطر یک رویداد برای FeedRow"""
+        _, ts, kind, number, _ = entry
+        text, color = EVENT_ROWS.get(kind, ('', (1, 1, 1, 1)))
+        clock = time.strftime('%H:%M', time.localtime(ts))
+        return {'text': f'{clock}  {number or ""}  {shape(text)}', 'color': color}
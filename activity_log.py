@@ -0,0 +1,44 @@
+"""
+رویدادهای اخیر سرویس (تماس و نتیجه ارسال) در یک بافر حلقوی با اندازه ثابت
+"""
+
+import threading
+import time
+from collections import deque
+
+# حداکثر رویداد نگه داشته شده در حافظه سرویس
+DEFAULT_ACTIVITY_SIZE = 500
+
+
+class ActivityLog:
+    """
+    بافر حلقوی رویدادها با شماره ترتیبی
+
+    هر رویداد (شماره ترتیبی، زمان، نوع، شماره تلفن، خط) است؛ رابط کاربری با
+    since فقط رویدادهای بعد از آخرین شماره‌ای که دیده را می‌گیرد. با پر شدن
+    بافر قدیمی‌ترین رویدادها حذف می‌شوند، پس حافظه با مدت اجرا رشد نمی‌کند.
+    """
+
+    def __init__(self, size=DEFAULT_ACTIVITY_SIZE):
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def seq(self):
+        """شماره ترتیبی آخرین رویداد (0 یعنی هنوز رویدادی نیست)"""
+        return self._seq
+
+    def add(self, kind, number, line=None):
+        with self._lock:
+            self._seq += 1
+            self._events.append((self._seq, round(time.time(), 3), kind, number, line))
+
+    def since(self, seq):
+        """رویدادهای با شماره ترتیبی بیشتر از seq (قدیمی به جدید)"""
+        with self._lock:
+            # شماره‌ها پشت سر هم هستند، پس تعداد رویدادهای جدید بدون جستجو معلوم است
+            count = min(max(self._seq - seq, 0), len(self._events))
+            if not count:
+                return []
+            return list(self._events)[-count:]
@@ -0,0 +1,82 @@
+"""
+بنچمارک فهرست رویدادها: هزینه ثبت رویداد در سرویس و به‌روزرسانی فهرست در هر فریم
+
+رویدادها در ActivityLog سرویس ثبت و مثل رابط کاربری دسته دسته با since
+خوانده و به ActivityFeed داده می‌شوند (یک دسته در هر فریم). زمان هر
+به‌روزرسانی فهرست (با چیدمان سطرهای قابل مشاهده) و حافظه پروسه در طول
+اجرا چاپ می‌شود تا ثابت ماندن آن‌ها با افزایش تعداد رویدادها دیده شود.
+ویجت بدون پنجره ساخته می‌شود، پس زمان رسم روی GPU در این عدد نیست.
+
+نمونه اجرا:
+    python benchmarks/bench_activity_feed.py --events 100000 --per-frame 5
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity_log import ActivityLog
+from activity_feed import ActivityFeed
+from history_store import EVENT_KINDS
+
+
+def percentile(sorted_values, fraction):
+    """صدک از لیست مرتب شده"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the activity ring buffer and feed refresh')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--per-frame', type=int, default=5, help='events delivered between two frames')
+    parser.add_argument('--reports', type=int, default=5, help='progress lines printed during the run')
+    args = parser.parse_args()
+
+    log = ActivityLog()
+    feed = ActivityFeed()
+    numbers = ['+98912%07d' % index for index in range(1000)]
+
+    begin = time.perf_counter()
+    for index in range(args.events):
+        log.add(EVENT_KINDS[index % len(EVENT_KINDS)], numbers[index % len(numbers)])
+    print(f'ActivityLog.add:      {(time.perf_counter() - begin) / args.events * 1e9:8.0f} ns/event')
+
+    log = ActivityLog()
+    seen = 0
+    samples = []
+    report_every = max(1, args.events // args.reports)
+    for index in range(args.events):
+        log.add(EVENT_KINDS[index % len(EVENT_KINDS)], numbers[index % len(numbers)])
+        if (index + 1) % args.per_frame:
+            continue
+        # یک دور poll رابط کاربری و یک فریم
+        begin = time.perf_counter()
+        events = log.since(seen)
+        seen = events[-1][0]
+        feed.add_entries(events)
+        feed._refresh()
+        # کاری که RecycleView در همان فریم انجام می‌دهد (چیدمان و به‌روزرسانی سطرهای قابل مشاهده)
+        feed.refresh_views()
+        samples.append(time.perf_counter() - begin)
+        if (index + 1) % report_every < args.per_frame:
+            samples.sort()
+            # تعداد اشیای زنده و بیشینه RSS پروسه (کیلوبایت روی لینوکس)
+            print(f'{index + 1:10d} events  refresh p50 {percentile(samples, 0.5) * 1000:6.3f} ms  '
+                  f'p99 {percentile(samples, 0.99) * 1000:6.3f} ms  rows {len(feed.data)}  '
+                  f'objects {len(gc.get_objects())}  '
+                  f'max rss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:6.1f} MB')
+            samples = []
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+بنچمارک ایندکس مخاطبین با ۵۰ هزار مخاطب جعلی
+
+زمان همگام‌سازی کامل، نوشتن و بارگذاری snapshot (شروع سرد)، همگام‌سازی
+افزایشی بعد از چند تغییر و زمان lookup در مسیر تماس اندازه‌گیری می‌شود.
+
+نمونه اجرا:
+    python benchmarks/bench_contacts.py --contacts 50000 --changes 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contacts import ContactsIndex
+from fake_android import FakeContactsProvider
+from phone_numbers import normalize_number
+
+
+def timed(func):
+    """(نتیجه، زمان به میلی‌ثانیه)"""
+    begin = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - begin) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the in-memory contacts index')
+    parser.add_argument('--contacts', type=int, default=50000)
+    parser.add_argument('--changes', type=int, default=20, help='contacts changed before the incremental sync')
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    provider = FakeContactsProvider()
+    provider.generate(args.contacts, seed=args.seed)
+    snapshot = os.path.join(tempfile.mkdtemp(prefix='hellosms-contacts-'), 'contacts.json')
+
+    index = ContactsIndex(provider, snapshot_path=snapshot)
+    _, elapsed = timed(index.sync)
+    print(f'full sync + snapshot: {elapsed:8.1f} ms  {index.stats()}')
+    _, elapsed = timed(index.save_snapshot)
+    print(f'snapshot write:       {elapsed:8.1f} ms  ({os.path.getsize(snapshot) / 1e6:.2f} MB)')
+
+    cold = ContactsIndex(provider, snapshot_path=snapshot)
+    _, elapsed = timed(cold.load_snapshot)
+    print(f'cold start (snapshot):{elapsed:8.1f} ms  ({len(cold)} contacts)')
+
+    for _ in range(args.changes):
+        contact_id = rng.randrange(1, args.contacts + 1)
+        if rng.random() < 0.2:
+            provider.delete(contact_id)
+        else:
+            provider.put(contact_id, f'مخاطب ویرایش شده {contact_id}', ['0912%07d' % contact_id, '0936%07d' % contact_id])
+    provider.put(args.contacts + 1, 'مخاطب جدید', ['09199999999'])
+    rows = provider.rows
+    _, elapsed = timed(cold.sync)
+    print(f'incremental sync:     {cold.last_sync_seconds * 1000:8.3f} ms  '
+          f'({provider.rows - rows} rows read, {len(cold)} contacts; {elapsed:.0f} ms with snapshot rewrite)')
+    _, elapsed = timed(cold.sync)
+    print(f'sync without changes: {elapsed:8.3f} ms')
+    assert cold.lookup('09199999999').name == 'مخاطب جدید'
+
+    known = ['0912%07d' % rng.randrange(1, args.contacts + 1) for _ in range(1000)]
+    unknown = ['0917%07d' % rng.randrange(10000000) for _ in range(1000)]
+    for name, numbers in (('lookup (known)', known), ('lookup (unknown)', unknown)):
+        # شماره‌ها در مسیر تماس قبلاً یکسان شده‌اند
+        numbers = [normalize_number(number) for number in numbers]
+        begin = time.perf_counter()
+        for index_ in range(args.lookups):
+            cold.lookup(numbers[index_ % len(numbers)])
+        print(f'{name + ":":22s}{(time.perf_counter() - begin) / args.lookups * 1e9:8.0f} ns')
+
+
+if __name__ == '__main__':
+    main()
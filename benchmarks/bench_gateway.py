@@ -0,0 +1,101 @@
+"""
+بنچمارک درگاه پیامک HTTP روی یک سرور جعلی محلی - ارسال تکی در برابر دسته‌ای
+
+نمونه اجرا:
+    python benchmarks/bench_gateway.py --messages 2000 --batch-size 20
+    python benchmarks/bench_gateway.py --latency 0.005
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_android import FakePendingIntent
+from fake_gateway import FakeSmsGateway
+from sms_delivery import SMS_SENT_ACTION
+from sms_transport import HttpGatewayTransport
+
+MESSAGE = 'سلام، در حال حاضر امکان پاسخگویی ندارم. به زودی با شما تماس می‌گیرم.'
+
+
+def numbers(count):
+    return ['+98912%07d' % i for i in range(count)]
+
+
+def run_single(gateway, count, pool_size):
+    transport = HttpGatewayTransport(gateway.url, pool_size=pool_size)
+    begin = time.perf_counter()
+    ok = sum(transport.send(number, MESSAGE) for number in numbers(count))
+    elapsed = time.perf_counter() - begin
+    transport.stop()
+    return elapsed, ok, transport
+
+
+def run_batched(gateway, count, batch_size):
+    transport = HttpGatewayTransport(gateway.url, batch_size=batch_size)
+    items = [(number, MESSAGE) for number in numbers(count)]
+    begin = time.perf_counter()
+    ok = 0
+    for start in range(0, count, batch_size):
+        ok += sum(transport.send_batch(items[start:start + batch_size]))
+    elapsed = time.perf_counter() - begin
+    transport.stop()
+    return elapsed, ok, transport
+
+
+def run_coalesced(gateway, count, batch_size, batch_window):
+    """send با PendingIntent؛ رشته دسته‌بندی پیامک‌ها را در درخواست‌های مشترک می‌فرستد"""
+    done = threading.Event()
+    results = []
+    lock = threading.Lock()
+
+    def report(intent, success):
+        with lock:
+            results.append(success)
+            if len(results) == count:
+                done.set()
+
+    transport = HttpGatewayTransport(gateway.url, batch_size=batch_size, batch_window=batch_window,
+                                     report=report)
+    transport.start()
+    begin = time.perf_counter()
+    for msg_id, number in enumerate(numbers(count)):
+        transport.send(number, MESSAGE, [FakePendingIntent(SMS_SENT_ACTION, msg_id, 0)])
+    done.wait(60)
+    elapsed = time.perf_counter() - begin
+    transport.stop()
+    return elapsed, sum(results), transport
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTTP SMS gateway transport')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--batch-window', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated gateway latency per request')
+    args = parser.parse_args()
+
+    runs = (
+        ('single, new connection', lambda gw: run_single(gw, args.messages, 0)),
+        ('single, keep-alive', lambda gw: run_single(gw, args.messages, 2)),
+        (f'batched x{args.batch_size}', lambda gw: run_batched(gw, args.messages, args.batch_size)),
+        ('coalesced send()', lambda gw: run_coalesced(gw, args.messages, args.batch_size, args.batch_window)),
+    )
+    for label, run in runs:
+        gateway = FakeSmsGateway(latency=args.latency).start()
+        try:
+            elapsed, ok, transport = run(gateway)
+        finally:
+            gateway.stop()
+        print(f'{label:24s}: {args.messages / elapsed:9.0f} msg/s  {elapsed * 1e3:8.1f} ms  '
+              f'ok={ok} requests={gateway.requests} connections={gateway.connections}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+بنچمارک تاریخچه SQLite: سرعت درج دسته‌ای و زمان پرس‌وجو روی ۱ میلیون رویداد
+
+رویدادها با record (مثل مسیر تماس) ثبت و در رشته نویسنده به صورت دسته‌ای
+نوشته می‌شوند؛ برای مقایسه چند هزار رویداد هم با یک commit برای هر رویداد
+درج می‌شود. سپس زمان پرس‌وجوهای گزارش و حذف رویدادهای قدیمی اندازه‌گیری
+می‌شود.
+
+نمونه اجرا:
+    python benchmarks/bench_history.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import (HistoryStore, SCHEMA, EVENT_MISSED_CALL, EVENT_SMS_SENT, EVENT_SMS_FAILED)
+
+DAY = 86400
+
+
+def synthetic_events(count, days, seed=1):
+    """رویدادهای مصنوعی به ترتیب زمان: چند تماس‌گیرنده پرتکرار و تعداد زیادی شماره کم‌تکرار"""
+    rng = random.Random(seed)
+    now = time.time()
+    numbers = ['+98912%07d' % rng.randrange(10000000) for _ in range(20000)]
+    timestamps = sorted(now - rng.random() * days * DAY for _ in range(count))
+    for index, ts in enumerate(timestamps):
+        number = numbers[min(int(rng.paretovariate(1.2)) - 1, len(numbers) - 1)]
+        kind = (EVENT_MISSED_CALL, EVENT_SMS_SENT, EVENT_SMS_FAILED)[index % 5 // 2]
+        yield ts, kind, number, index % 2
+
+
+def percentile(sorted_values, fraction):
+    """صدک از لیست مرتب شده"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def time_query(name, func, repeat):
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - begin)
+    samples.sort()
+    print(f'{name:28s} p50 {percentile(samples, 0.5) * 1000:8.3f} ms   '
+          f'p99 {percentile(samples, 0.99) * 1000:8.3f} ms   ({result if not isinstance(result, list) else len(result)})')
+
+
+def per_row_commit(path, events):
+    """درج بدون دسته‌بندی: یک تراکنش برای هر رویداد"""
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    for statement in SCHEMA:
+        connection.execute(statement)
+    begin = time.perf_counter()
+    for ts, kind, number, line in events:
+        with connection:
+            connection.execute('INSERT INTO events (ts, kind, number, line) VALUES (?, ?, ?, ?)',
+                               (ts, kind, number, line))
+    elapsed = time.perf_counter() - begin
+    connection.close()
+    return elapsed
+
+
+def batched(path, events):
+    """درج با record و نوشتن دسته‌ای؛ (زمان کل، زمان record برای هر رویداد)"""
+    store = HistoryStore(path, retention_days=0, max_pending=len(events))
+    store.start()
+    record = store.record
+    begin = time.perf_counter()
+    for ts, kind, number, line in events:
+        record(kind, number, line, ts=ts)
+    recorded = time.perf_counter() - begin
+    store.flush(timeout=600)
+    elapsed = time.perf_counter() - begin
+    return store, elapsed, recorded / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SQLite history store')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365, help='spread events over this many days')
+    parser.add_argument('--baseline-rows', type=int, default=5000, help='rows inserted with one commit each')
+    parser.add_argument('--retention', type=int, default=180, help='retention days for the compaction step')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='hellosms-history-')
+    events = list(synthetic_events(args.rows, args.days))
+
+    sample = events[:args.baseline_rows]
+    elapsed = per_row_commit(os.path.join(tmp_dir, 'per-row.db'), sample)
+    print(f'per-row commit ({len(sample)}):  {len(sample) / elapsed:10.0f} rows/s')
+    store, elapsed, _ = batched(os.path.join(tmp_dir, 'batched.db'), sample)
+    store.stop()
+    print(f'batched insert ({len(sample)}):  {len(sample) / elapsed:10.0f} rows/s')
+
+    path = os.path.join(tmp_dir, 'history.db')
+    store, elapsed, per_event = batched(path, events)
+    print(f'record() hot path:    {per_event * 1e9:10.0f} ns/event')
+    print(f'batched insert:       {len(events) / elapsed:10.0f} rows/s  {store.stats()}')
+    print(f'database size:        {os.path.getsize(path) / 1e6:10.1f} MB')
+
+    now = time.time()
+    busiest = store.top_numbers(EVENT_MISSED_CALL, limit=1)[0][0]
+    time_query('sent this week', lambda: store.count(EVENT_SMS_SENT, now - 7 * DAY), args.repeat)
+    time_query('missed calls today', lambda: store.count(EVENT_MISSED_CALL, now - DAY), args.repeat)
+    time_query('top callers (7 days)', lambda: store.top_numbers(EVENT_MISSED_CALL, now - 7 * DAY), args.repeat)
+    time_query('top callers (30 days)', lambda: store.top_numbers(EVENT_MISSED_CALL, now - 30 * DAY), args.repeat)
+    time_query('history of busiest caller', lambda: store.number_history(busiest), args.repeat)
+    time_query('history of rare number', lambda: store.number_history(events[-1][2]), args.repeat)
+
+    store.retention_days = args.retention
+    begin = time.perf_counter()
+    store.compact()
+    store.flush(timeout=600)
+    print(f'compaction ({args.retention} days): {(time.perf_counter() - begin) * 1000:8.0f} ms  '
+          f'removed {store.stats()["compacted"]}, size {os.path.getsize(path) / 1e6:.1f} MB')
+    store.stop()
+
+
+if __name__ == '__main__':
+    main()
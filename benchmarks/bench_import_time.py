@@ -0,0 +1,106 @@
+"""
+بنچمارک رگرسیون زمان import ماژول‌های برنامه (هر اندازه‌گیری در یک پروسه تازه)
+
+Kivy قبل از اندازه‌گیری هر ماژول import می‌شود تا فقط هزینه خود ماژول و
+وابستگی‌هایش شمرده شود. وابستگی‌هایی که باید در اولین استفاده بارگذاری
+شوند (arabic_reshaper، bidi، jnius، http.client) نباید بعد از import ماژول‌ها
+در sys.modules باشند؛ در این صورت اسکریپت با کد 1 خارج می‌شود.
+
+نمونه اجرا:
+    python benchmarks/bench_import_time.py --runs 7
+    python benchmarks/bench_import_time.py --max-ms 15
+"""
+
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    'service',
+    'ipc',
+    'metrics',
+    'activity_log',
+    'activity_feed',
+    'reply_scheduler',
+    'journal',
+    'contacts',
+    'monitor_runtime',
+    'history_store',
+    'sms_transport',
+    'persian_text',
+    'sms_queue',
+    'sms_delivery',
+    'rules',
+    'sms_template',
+    'phone_numbers',
+    'cooldown',
+    'main',
+)
+
+# ماژول‌هایی که نباید در زمان import برنامه بارگذاری شوند
+LAZY_MODULES = ('arabic_reshaper', 'bidi', 'jnius', 'android', 'http.client')
+
+PRELOAD = 'import kivy.logger, kivy.utils'
+
+
+def measure(module):
+    """(زمان import تجمعی به میلی‌ثانیه، ماژول‌های تنبل بارگذاری شده) در یک پروسه تازه"""
+    code = (f'{PRELOAD}\nimport {module}\nimport sys, json\n'
+            f'print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))')
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1', KIVY_NO_FILELOG='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line.split('|')
+        # ماژول سطح بالا دقیقاً یک فاصله قبل از نامش دارد
+        if len(fields) == 3 and fields[2] == f' {module}':
+            cumulative = int(fields[1]) / 1000
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark import time of HelloSms modules')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modules', nargs='*', default=MODULES)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if any module except main imports slower than this (median)')
+    args = parser.parse_args()
+
+    # مثل APK، زمان import با bytecode کامپایل شده اندازه‌گیری می‌شود
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+
+    failed = False
+    print(f'{"module":16s} {"median ms":>10s} {"min ms":>8s}  eager lazy imports')
+    for module in args.modules:
+        timings = []
+        eager = set()
+        for _ in range(args.runs):
+            cumulative, loaded = measure(module)
+            if cumulative is not None:
+                timings.append(cumulative)
+            eager.update(loaded)
+        median = statistics.median(timings) if timings else float('nan')
+        print(f'{module:16s} {median:10.2f} {min(timings, default=float("nan")):8.2f}  '
+              f'{", ".join(sorted(eager)) or "-"}')
+        if eager:
+            failed = True
+        if args.max_ms is not None and module != 'main' and median > args.max_ms:
+            failed = True
+
+    if failed:
+        print('FAILED: import time regression')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+بنچمارک هزینه ثبت متریک در مسیرهای پرتکرار
+
+هزینه inc، observe و observe_since (به همراه perf_counter شروع) در یک رشته و
+با چند رشته همزمان اندازه‌گیری و با یک فراخوانی خالی مقایسه می‌شود. در پایان
+snapshot هیستوگرام observe_since (زمان خالی بین دو perf_counter) چاپ می‌شود.
+
+نمونه اجرا:
+    python benchmarks/bench_metrics.py --iterations 1000000 --threads 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+
+
+def per_call_ns(func, iterations):
+    """میانگین زمان هر فراخوانی func (نانوثانیه)"""
+    begin = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - begin) / iterations * 1e9
+
+
+def timed_span(histogram):
+    """الگوی مسیر اصلی: گرفتن زمان شروع و ثبت زمان سپری شده"""
+    def span():
+        started = time.perf_counter()
+        histogram.observe_since(started)
+    return span
+
+
+def contended_ns(func, iterations, threads):
+    """میانگین زمان هر فراخوانی وقتی چند رشته همزمان همان متریک را ثبت می‌کنند"""
+    workers = [threading.Thread(target=per_call_ns, args=(func, iterations)) for _ in range(threads)]
+    begin = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - begin) / (iterations * threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cost of recording metrics')
+    parser.add_argument('--iterations', type=int, default=1000000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter('bench.counter')
+    histogram = registry.histogram('bench.latency')
+    spans = registry.histogram('bench.span')
+
+    baseline = per_call_ns(lambda: None, args.iterations)
+    print(f'empty call:           {baseline:8.0f} ns')
+    print(f'counter.inc:          {per_call_ns(counter.inc, args.iterations) - baseline:8.0f} ns')
+    print(f'histogram.observe:    {per_call_ns(partial(histogram.observe, 0.0123), args.iterations) - baseline:8.0f} ns')
+    print(f'observe_since span:   {per_call_ns(timed_span(spans), args.iterations) - baseline:8.0f} ns')
+    print(f'counter.inc ({args.threads} threads):  {contended_ns(counter.inc, args.iterations, args.threads) - baseline:8.0f} ns')
+
+    begin = time.perf_counter()
+    snapshot = registry.snapshot()
+    print(f'snapshot:             {(time.perf_counter() - begin) * 1e6:8.0f} us')
+    span = snapshot['histograms']['bench.span']
+    print(f"bench.span: count {span['count']} p50 {span['p50']} p99 {span['p99']} max {span['max']}")
+
+
+if __name__ == '__main__':
+    main()
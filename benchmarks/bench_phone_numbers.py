@@ -0,0 +1,61 @@
+"""
+بنچمارک هزینه یکسان‌سازی شماره تلفن (بدون کش، با کش و گروهی)
+
+نمونه اجرا:
+    python benchmarks/bench_phone_numbers.py --count 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import phone_numbers
+from phone_numbers import normalize_number, normalize_many
+
+FORMATS = ('+98 {} {} {}', '0{}-{}-{}', '0098{}{}{}', '0{} {} {}', '({}) {}{}')
+
+
+def sample_numbers(count, seed=1):
+    """شماره‌های مصنوعی در قالب‌های مختلف"""
+    rng = random.Random(seed)
+    numbers = []
+    for _ in range(count):
+        fmt = rng.choice(FORMATS)
+        numbers.append(fmt.format('9%02d' % rng.randrange(100), '%03d' % rng.randrange(1000),
+                                  '%04d' % rng.randrange(10000)))
+    return numbers
+
+
+def per_number_ns(func, numbers):
+    begin = time.perf_counter_ns()
+    func(numbers)
+    return (time.perf_counter_ns() - begin) / len(numbers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark phone number normalization')
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    numbers = sample_numbers(args.count)
+    hot = numbers[:phone_numbers.NORMALIZE_CACHE_SIZE // 2]
+
+    def one_by_one(items):
+        for number in items:
+            normalize_number(number)
+
+    phone_numbers._normalize.cache_clear()
+    print(f'cold (cache miss) : {per_number_ns(one_by_one, numbers):8.0f} ns/number')
+    one_by_one(hot)
+    print(f'warm (cache hit)  : {per_number_ns(one_by_one, hot * 20):8.0f} ns/number')
+    phone_numbers._normalize.cache_clear()
+    print(f'bulk normalize    : {per_number_ns(normalize_many, numbers):8.0f} ns/number')
+    print(f'cache             : {phone_numbers.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+بنچمارک تایمرهای پاسخ: ده‌ها هزار پاسخ زمان‌بندی شده با ژورنال روی دیسک
+
+هزینه schedule و cancel با تعداد زیادی تایمر فعال، زمان بازخوانی ژورنال
+بعد از اجرای مجدد، و دقت اجرای تایمرها (تاخیر نسبت به زمان تعیین شده) با
+تعداد بیدار شدن رشته کارگر اندازه‌گیری می‌شود.
+
+نمونه اجرا:
+    python benchmarks/bench_reply_timers.py --timers 50000 --fire 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reply_scheduler import TimerQueue
+
+
+def percentile(sorted_values, fraction):
+    """صدک از لیست مرتب شده"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the persistent reply timer queue')
+    parser.add_argument('--timers', type=int, default=50000, help='pending timers spread over a day')
+    parser.add_argument('--fire', type=int, default=2000, help='timers fired within a few seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='hellosms-timers-')
+    journal = os.path.join(tmp_dir, 'timers.journal')
+    now = time.time()
+    numbers = ['+98912%07d' % index for index in range(args.timers)]
+    payload = {'text': 'سلام، بعداً تماس می‌گیرم.', 'pri': 1, 'sub': None}
+
+    timers = TimerQueue(lambda key, data: None, journal)
+    timers.start()
+    begin = time.perf_counter()
+    for number in numbers:
+        timers.schedule(number, now + 3600 + rng.random() * 86400, payload)
+    print(f'schedule:        {(time.perf_counter() - begin) / args.timers * 1e6:8.1f} us/timer')
+
+    cancelled = numbers[::2]
+    begin = time.perf_counter()
+    for number in cancelled:
+        timers.cancel(number)
+    print(f'cancel:          {(time.perf_counter() - begin) / len(cancelled) * 1e6:8.1f} us/timer')
+    print(f'stats:           {timers.stats()}')
+    timers.stop()
+    print(f'journal size:    {os.path.getsize(journal) / 1e6:8.2f} MB')
+
+    restarted = TimerQueue(lambda key, data: None, journal)
+    begin = time.perf_counter()
+    restarted.start()
+    print(f'replay:          {(time.perf_counter() - begin) * 1000:8.0f} ms  '
+          f'({restarted.pending_count()} pending, journal {os.path.getsize(journal) / 1e6:.2f} MB)')
+    restarted.stop()
+
+    # دقت اجرا: تایمرهای چند ثانیه آینده در کنار تایمرهای دور
+    lateness = []
+    done = threading.Event()
+
+    def on_fire(key, data):
+        lateness.append(time.time() - data['at'])
+        if len(lateness) == args.fire:
+            done.set()
+
+    timers = TimerQueue(on_fire, os.path.join(tmp_dir, 'fire.journal'))
+    timers.start()
+    start = time.time()
+    for index in range(args.fire):
+        at = start + 0.5 + rng.random() * 2
+        timers.schedule(f'fire-{index}', at, {'at': at})
+    done.wait(30)
+    stats = timers.stats()
+    timers.stop()
+    lateness.sort()
+    print(f'fire lateness:   p50 {percentile(lateness, 0.5) * 1000:.2f} ms  p99 {percentile(lateness, 0.99) * 1000:.2f} ms  '
+          f'max {lateness[-1] * 1000 if lateness else 0:.2f} ms')
+    print(f'fired {stats["fired"]} with {stats["wakeups"]} worker wakeups')
+    if len(lateness) != args.fire:
+        print('FAILED')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+اجرای سرویس مانیتورینگ بدون رابط کاربری روی لینوکس و اندازه‌گیری کانال IPC
+
+service.py در یک پروسه جدا (با کلاس‌های جعلی fake_android) اجرا می‌شود و
+این اسکریپت مثل رابط کاربری به socket آن وصل می‌شود: زمان رفت و برگشت
+دستور status، ارسال تنظیمات و زمان تماس از دست رفته تا گزارش ارسال موفق
+(با دستور call_state) اندازه‌گیری می‌شود. در پایان سرویس با دستور stop
+متوقف و خروج پروسه بررسی می‌شود.
+
+نمونه اجرا:
+    python benchmarks/bench_service_ipc.py --requests 5000 --calls 200
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from call_state import CALL_STATE_IDLE, CALL_STATE_RINGING
+from ipc import IpcClient, IpcError, IPC_SOCKET_FILE
+
+
+def percentile(sorted_values, fraction):
+    """صدک از لیست مرتب شده"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summary_us(samples):
+    samples = sorted(samples)
+    return {'p50': round(percentile(samples, 0.50) * 1e6, 1),
+            'p99': round(percentile(samples, 0.99) * 1e6, 1),
+            'max': round(samples[-1] * 1e6, 1) if samples else 0}
+
+
+def wait_for_service(client, timeout=10):
+    """انتظار تا آماده شدن socket سرویس"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return client.request('status')
+        except IpcError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the monitor service headless and benchmark its IPC channel')
+    parser.add_argument('--requests', type=int, default=2000, help='status requests to time')
+    parser.add_argument('--calls', type=int, default=100, help='simulated missed calls')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='hellosms-service-')
+    env = dict(os.environ, KIVY_NO_FILELOG='1')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'service.py')], cwd=work_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = IpcClient(os.path.join(work_dir, IPC_SOCKET_FILE))
+    try:
+        wait_for_service(client)
+        print(f'service ready: {(time.perf_counter() - started) * 1000:.0f} ms')
+
+        samples = []
+        for _ in range(args.requests):
+            begin = time.perf_counter()
+            client.request('status')
+            samples.append(time.perf_counter() - begin)
+        print(f'status round trip us: {summary_us(samples)}')
+
+        settings = {'sms_enabled': {'value': True},
+                    'sms_text': {'value': 'سلام {number}، بعداً تماس می‌گیرم.'},
+                    'reply_cooldown_minutes': {'value': 0},
+                    # سهمیه پیش‌فرض ارسال فقط یک burst کوچک اجازه می‌دهد
+                    'rate_messages_per_minute': {'value': 1000000},
+                    'rate_parts_per_minute': {'value': 1000000},
+                    'rate_burst': {'value': args.calls}}
+        begin = time.perf_counter()
+        client.request('settings', settings=settings)
+        print(f'settings push: {(time.perf_counter() - begin) * 1e6:.0f} us')
+
+        # تماس بی‌پاسخ: RINGING و سپس IDLE روی خط پیش‌فرض
+        latencies = []
+        for index in range(args.calls):
+            sent_before = client.request('status')['sent']
+            begin = time.perf_counter()
+            client.request('call_state', state=CALL_STATE_RINGING, number='0912%07d' % index)
+            client.request('call_state', state=CALL_STATE_IDLE)
+            while client.request('status')['sent'] == sent_before:
+                pass
+            latencies.append(time.perf_counter() - begin)
+        print(f'missed call to SMS sent us: {summary_us(latencies)}')
+
+        status = client.request('status')
+        print(f"sent: {status['sent']} failed: {status['failed']} queue: {status['queue']}")
+
+        # قطع اتصال رابط کاربری روی سرویس اثری ندارد
+        client.close()
+        client.request('status')
+        client.request('stop')
+        process.wait(10)
+        print(f'service exited with code {process.returncode}')
+        if status['sent'] != args.calls or process.returncode != 0:
+            print('FAILED')
+            sys.exit(1)
+    finally:
+        client.close()
+        if process.poll() is None:
+            process.kill()
+
+
+if __name__ == '__main__':
+    main()
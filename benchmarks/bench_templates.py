@@ -0,0 +1,54 @@
+"""
+بنچمارک کامپایل و render قالب پیامک
+
+نمونه اجرا:
+    python benchmarks/bench_templates.py --renders 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sms_template import compile_template
+
+TEMPLATE = (
+    'سلام{?name} {name}{/name}، {time_of_day} بخیر. متأسفانه نتوانستم تماس شما را پاسخ دهم.'
+    '{?callback_window} لطفاً {callback_window} دوباره تماس بگیرید.{/callback_window}'
+    '{!name} (شماره {number}){/name} - تماس شماره {call_count} امروز'
+)
+
+VALUES = (
+    {'name': 'علی', 'number': '+989121234567', 'time_of_day': 'صبح', 'call_count': 1,
+     'callback_window': 'بعد از ساعت ۱۷'},
+    {'number': '+989351112233', 'time_of_day': 'شب', 'call_count': 3, 'callback_window': ''},
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SMS template compile and render')
+    parser.add_argument('--renders', type=int, default=1000000)
+    parser.add_argument('--compiles', type=int, default=10000)
+    args = parser.parse_args()
+
+    begin = time.perf_counter()
+    for _ in range(args.compiles):
+        template = compile_template(TEMPLATE)
+    elapsed = time.perf_counter() - begin
+    print(f'compile : {elapsed / args.compiles * 1e6:8.2f} us/template')
+
+    render = template.render
+    first, second = VALUES
+    begin = time.perf_counter()
+    for _ in range(args.renders // 2):
+        render(first)
+        render(second)
+    elapsed = time.perf_counter() - begin
+    print(f'render  : {elapsed / args.renders * 1e9:8.0f} ns/message '
+          f'({args.renders / elapsed:,.0f} renders/sec)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+"""
+آزمون بار سرتاسری مسیر تماس از دست رفته تا ارسال پیامک
+
+رویدادهای وضعیت تماس مثل listener های اندروید به AndroidCallMonitor.on_call_state
+داده می‌شوند و از همان MonitorRuntime، قوانین، قالب، ایندکس مخاطبین، صف،
+DeliveryTracker و AndroidSmsTransport (با SmsManager جعلی fake_android)
+عبور می‌کنند. هر سناریو در یک پروسه جدا اجرا می‌شود تا حافظه و متریک‌ها
+مستقل باشند:
+    storm     هزاران تماس‌گیرنده متفاوت پشت سر هم روی همه سیم‌کارت‌ها
+    redial    تعداد کمی تماس‌گیرنده که مدام دوباره تماس می‌گیرند (cooldown)
+    waiting   انتظار تماس: تماس اول پاسخ داده و تماس دوم بی‌پاسخ می‌ماند
+    mixed     ترکیب تماس بی‌پاسخ، پاسخ داده شده، انتظار تماس و تماس خروجی
+
+نتیجه هر سناریو (توان عملیاتی، صدک‌های تاخیر تماس تا نتیجه ارسال، حداکثر
+حافظه و هزینه شکل‌دهی متن فهرست رویدادها) به صورت JSON ذخیره می‌شود و
+حالت مقایسه، بدتر شدن بیش از آستانه بین دو اجرا را گزارش می‌کند.
+
+نمونه اجرا:
+    python benchmarks/load_test.py --callers 5000 --output before.json
+    python benchmarks/load_test.py --callers 5000 --output after.json
+    python benchmarks/load_test.py --compare before.json after.json --threshold 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from call_state import CALL_STATE_IDLE, CALL_STATE_RINGING, CALL_STATE_OFFHOOK
+
+SCENARIOS = ('storm', 'redial', 'waiting', 'mixed')
+
+RESULTS_VERSION = 1
+
+# متریک‌های مقایسه شده: (کلید، True اگر مقدار بیشتر بهتر است، کف نویز)
+# تغییر فقط وقتی بدتر شدن گزارش می‌شود که هم از آستانه درصدی و هم از کف نویز
+# (به واحد همان متریک) بیشتر باشد؛ صدک‌های p99 (تعویض GIL با رشته‌های صف) و
+# رشد چند مگابایتی حافظه در مقادیر کوچک درصد تغییر زیادی دارند. صدک‌های
+# مراحل داخلی از سطل‌های هیستوگرام metrics می‌آیند و کف نویزشان حداقل یک سطل است
+COMPARED = (
+    ('calls_per_sec', True, 0),
+    ('sms_per_sec', True, 0),
+    ('call_path_p50_us', False, 10),
+    ('call_path_p99_us', False, 250),
+    ('e2e_p50_ms', False, 25),
+    ('e2e_p99_ms', False, 25),
+    ('call_idle_to_enqueue_p99_ms', False, 5),
+    ('sms_enqueue_to_sent_p99_ms', False, 25),
+    ('sms_send_sms_p99_ms', False, 5),
+    ('peak_rss_mb', False, 2),
+    ('rss_growth_mb', False, 5),
+    ('shape_row_us', False, 10),
+)
+
+# کلیدهای جدول نتیجه
+REPORTED = (
+    'events', 'missed_calls', 'replies', 'incomplete', 'calls_per_sec', 'sms_per_sec',
+    'call_path_p50_us', 'call_path_p99_us', 'e2e_p50_ms', 'e2e_p99_ms',
+    'call_idle_to_enqueue_p50_ms', 'call_idle_to_enqueue_p99_ms',
+    'sms_enqueue_to_sent_p50_ms', 'sms_enqueue_to_sent_p99_ms',
+    'sms_send_sms_p50_ms', 'sms_send_sms_p99_ms',
+    'peak_rss_mb', 'rss_growth_mb', 'shape_row_us',
+)
+
+SMS_TEXT = 'سلام{?name} {name}{/name}، در جلسه هستم و بعداً تماس می‌گیرم. (تماس {call_count})'
+
+
+def percentile(sorted_values, fraction):
+    """صدک از لیست مرتب شده"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def caller(index):
+    return '0912%07d' % index
+
+
+def scenario_calls(name, callers, rng):
+    """لیست تماس‌ها؛ هر تماس لیست (وضعیت، شماره) روی یک سیم‌کارت است"""
+    missed = lambda number: [(CALL_STATE_RINGING, number), (CALL_STATE_IDLE, None)]
+    if name == 'storm':
+        return [missed(caller(index)) for index in range(callers)]
+    if name == 'redial':
+        # هر تماس‌گیرنده حدود ده بار تماس می‌گیرد؛ گاهی RINGING تکراری می‌رسد
+        pool = max(1, callers // 10)
+        calls = []
+        for _ in range(callers):
+            number = caller(rng.randrange(pool))
+            call = missed(number)
+            if rng.random() < 0.1:
+                call.insert(0, (CALL_STATE_RINGING, number))
+            calls.append(call)
+        return calls
+    if name == 'waiting':
+        return [[(CALL_STATE_RINGING, caller(index)), (CALL_STATE_OFFHOOK, None),
+                 (CALL_STATE_RINGING, '0935%07d' % index), (CALL_STATE_IDLE, None)]
+                for index in range(callers)]
+    calls = []
+    for index in range(callers):
+        number = caller(rng.randrange(callers))
+        kind = rng.random()
+        if kind < 0.5:
+            calls.append(missed(number))
+        elif kind < 0.8:
+            calls.append([(CALL_STATE_RINGING, number), (CALL_STATE_OFFHOOK, None), (CALL_STATE_IDLE, None)])
+        elif kind < 0.9:
+            calls.append([(CALL_STATE_RINGING, number), (CALL_STATE_OFFHOOK, None),
+                          (CALL_STATE_RINGING, '0935%07d' % index), (CALL_STATE_IDLE, None)])
+        else:
+            calls.append([(CALL_STATE_OFFHOOK, number), (CALL_STATE_IDLE, None)])
+    return calls
+
+
+def interleave(calls, lines):
+    """
+    رویدادهای (سیم‌کارت، وضعیت، شماره) با تماس‌های همزمان روی همه سیم‌کارت‌ها
+
+    روی اندروید callback همه listener ها روی Looper یک رشته اجرا می‌شوند،
+    پس رویدادهای سیم‌کارت‌ها یک در میان در یک رشته پخش می‌شوند.
+    """
+    queues = [deque() for _ in range(lines)]
+    for index, call in enumerate(calls):
+        queues[index % lines].extend(call)
+    events = []
+    while any(queues):
+        for line, steps in enumerate(queues):
+            if steps:
+                state, number = steps.popleft()
+                events.append((line + 1, state, number))
+    return events
+
+
+def max_rss_mb():
+    # ru_maxrss روی لینوکس به کیلوبایت است
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(name, args):
+    """اجرای یک سناریو در همین پروسه (داخل پوشه موقت) و برگرداندن نتیجه"""
+    from activity_feed import ActivityFeed
+    from contacts import ContactsIndex
+    from fake_android import (FakeSmsManagerClass, FakeSubscriptionManager, FakeContactsProvider,
+                              fake_intent_factory)
+    from history_store import HistoryStore
+    from metrics import metrics
+    from monitor_runtime import MonitorRuntime
+    from persian_text import shape
+    from service import SubscriptionRegistry
+    from settings_store import SettingsStore, DEFAULT_SETTINGS
+
+    rng = random.Random(args.seed)
+    events = interleave(scenario_calls(name, args.callers, rng), args.lines)
+
+    # بخشی از تماس‌گیرندگان مخاطب ذخیره شده هستند تا {name} پر شود
+    provider = FakeContactsProvider()
+    provider.generate(args.contacts, seed=args.seed)
+    sms_manager_class = FakeSmsManagerClass(
+        on_broadcast=lambda *report: runtime.delivery_tracker.handle_broadcast(*report),
+        failure_rate=args.failure_rate, latency=args.sms_latency, seed=args.seed)
+    runtime = MonitorRuntime(settings_store=SettingsStore('settings.json', defaults=DEFAULT_SETTINGS),
+                             subscriptions=SubscriptionRegistry(
+                                 sms_manager_class, FakeSubscriptionManager(range(1, args.lines + 1))),
+                             intent_factory=fake_intent_factory, history=HistoryStore('history.db'),
+                             contacts=ContactsIndex(provider, snapshot_path=None))
+    runtime.update_settings({
+        'sms_text': {'value': SMS_TEXT},
+        # cooldown فقط در سناریوی redial؛ بقیه هر تماس بی‌پاسخ را پاسخ می‌دهند
+        'reply_cooldown_minutes': {'value': 60 if name == 'redial' else 0},
+        'rate_messages_per_minute': {'value': 1000000},
+        'rate_parts_per_minute': {'value': 1000000},
+        'rate_burst': {'value': len(events)},
+    })
+    # ایندکس قبل از start ساخته می‌شود تا همگام‌سازی کامل با تماس‌ها همزمان نشود
+    runtime.contacts.sync()
+    runtime.start()
+
+    # زمان رویداد IDLE هر پاسخ صف شده تا نتیجه نهایی ارسال آن
+    pending = {}
+    scheduled = [0]
+    latencies = []
+    done = threading.Condition()
+    current = [0.0]
+    schedule_reply = runtime.schedule_reply
+    on_result = runtime.delivery_tracker.on_result
+
+    def timed_schedule_reply(phone_number, *rest, **kwargs):
+        pending.setdefault(phone_number, deque()).append(current[0])
+        scheduled[0] += 1
+        schedule_reply(phone_number, *rest, **kwargs)
+
+    def timed_on_result(phone_number, message, success):
+        on_result(phone_number, message, success)
+        finished = time.perf_counter()
+        with done:
+            latencies.append(finished - pending[phone_number].popleft())
+            done.notify_all()
+
+    runtime.schedule_reply = timed_schedule_reply
+    runtime.delivery_tracker.on_result = timed_on_result
+
+    rss_before = max_rss_mb()
+    call_path = []
+    on_call_state = runtime.call_monitor.on_call_state
+    perf_counter = time.perf_counter
+    begin = perf_counter()
+    for line, state, number in events:
+        current[0] = started = perf_counter()
+        on_call_state(line, state, number)
+        call_path.append(perf_counter() - started)
+    driven = perf_counter() - begin
+    replies = scheduled[0]
+
+    deadline = time.monotonic() + args.timeout
+    with done:
+        while len(latencies) < replies and time.monotonic() < deadline:
+            done.wait(0.1)
+    elapsed = perf_counter() - begin
+    completed = len(latencies)
+
+    # شکل‌دهی متن فهرست رویدادهای رابط کاربری با کش خالی
+    shape.cache_clear()
+    entries = runtime.activity.since(0)
+    shape_begin = perf_counter()
+    for entry in entries:
+        ActivityFeed.row_data(entry)
+    shape_elapsed = perf_counter() - shape_begin
+
+    status = runtime.status()
+    snapshot = metrics.snapshot()
+    runtime.stop()
+
+    call_path.sort()
+    latencies.sort()
+    histograms = snapshot['histograms']
+    result = {
+        'events': len(events),
+        'missed_calls': snapshot['counters'].get('call.missed', 0),
+        'replies': replies,
+        'sent': status['sent'],
+        'failed': status['failed'],
+        'incomplete': replies - completed,
+        'calls_per_sec': round(len(events) / driven),
+        'sms_per_sec': round(completed / elapsed) if elapsed else 0,
+        'call_path_p50_us': round(percentile(call_path, 0.50) * 1e6, 1),
+        'call_path_p99_us': round(percentile(call_path, 0.99) * 1e6, 1),
+        'e2e_p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'e2e_p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'e2e_max_ms': round(latencies[-1] * 1000, 3) if latencies else 0,
+        'peak_rss_mb': round(max_rss_mb(), 1),
+        'rss_growth_mb': round(max_rss_mb() - rss_before, 1),
+        'shape_row_us': round(shape_elapsed / len(entries) * 1e6, 2) if entries else 0,
+        'shape_rows': len(entries),
+    }
+    # صدک‌های متریک‌های داخلی هر مرحله (میلی‌ثانیه)
+    for metric in ('call.idle_to_enqueue_seconds', 'sms.enqueue_to_sent_seconds', 'sms.send_sms_seconds',
+                   'shape.miss_seconds'):
+        histogram = histograms.get(metric)
+        if histogram and histogram['count']:
+            key = metric.replace('_seconds', '').replace('.', '_')
+            result[f'{key}_p50_ms'] = round(histogram['p50'] * 1000, 3)
+            result[f'{key}_p99_ms'] = round(histogram['p99'] * 1000, 3)
+    return result
+
+
+def run_worker(name, args):
+    """اجرای سناریو در یک پروسه تازه؛ نتیجه آخرین خط stdout آن است"""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', name,
+               '--callers', str(args.callers), '--lines', str(args.lines), '--contacts', str(args.contacts),
+               '--failure-rate', str(args.failure_rate), '--sms-latency', str(args.sms_latency),
+               '--timeout', str(args.timeout), '--seed', str(args.seed)]
+    env = dict(os.environ, KIVY_NO_FILELOG='1')
+    result = subprocess.run(command, cwd=tempfile.mkdtemp(prefix='hellosms-load-'), env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'scenario {name} failed:\n{result.stderr[-2000:]}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def best_of(runs):
+    """بهترین مقدار هر متریک مقایسه شده بین چند اجرا (مثل timeit)"""
+    best = dict(runs[0])
+    for key, higher_is_better, _ in COMPARED:
+        values = [run[key] for run in runs if key in run]
+        if values:
+            best[key] = max(values) if higher_is_better else min(values)
+    return best
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    scenarios = list(results['scenarios'])
+    print(f'{"":28s}' + ''.join(f'{name:>12s}' for name in scenarios))
+    for key in REPORTED:
+        print(f'{key:28s}' + ''.join(f'{results["scenarios"][name].get(key, ""):>12}' for name in scenarios))
+
+
+def compare(base_path, new_path, threshold):
+    """
+    مقایسه دو فایل نتیجه
+
+    Returns:
+        int: تعداد متریک‌هایی که بیش از threshold درصد (و کف نویزشان) بدتر شده‌اند
+    """
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    if base.get('config') != new.get('config'):
+        print(f'warning: runs used different options: {base.get("config")} vs {new.get("config")}')
+    print(f'{base_path} ({base.get("revision")}) -> {new_path} ({new.get("revision")}), threshold {threshold}%')
+    regressions = 0
+    for name, result in new['scenarios'].items():
+        before = base['scenarios'].get(name)
+        if before is None:
+            continue
+        for key, higher_is_better, noise_floor in COMPARED:
+            old_value, new_value = before.get(key), result.get(key)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value * 100
+            worse = -change if higher_is_better else change
+            flag = ''
+            if abs(new_value - old_value) <= noise_floor:
+                pass
+            elif worse > threshold:
+                flag = 'REGRESSION'
+                regressions += 1
+            elif -worse > threshold:
+                flag = 'improved'
+            print(f'{name:8s} {key:28s} {old_value:>12} {new_value:>12} {change:+8.1f}%  {flag}')
+        if result.get('incomplete'):
+            print(f'{name:8s} {result["incomplete"]} replies did not complete  REGRESSION')
+            regressions += 1
+    print(f'{regressions} regression(s)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test of the missed-call to SMS pipeline')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated scenario names')
+    parser.add_argument('--callers', type=int, default=5000, help='calls per scenario')
+    parser.add_argument('--lines', type=int, default=2, help='SIM lines receiving calls at the same time')
+    parser.add_argument('--contacts', type=int, default=2000, help='saved contacts (callers 1..N have a name)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fake SmsManager failure rate')
+    parser.add_argument('--sms-latency', type=float, default=0.0, help='fake SmsManager report delay (s)')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for send results')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scenario; the best value is kept')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two result files')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+
+    if args.worker:
+        print(json.dumps(run_scenario(args.worker, args)))
+        return
+
+    names = [name for name in args.scenarios.split(',') if name]
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name!r} (choose from {", ".join(SCENARIOS)})')
+    results = {
+        'version': RESULTS_VERSION,
+        'ts': round(time.time(), 3),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': {'callers': args.callers, 'lines': args.lines, 'contacts': args.contacts,
+                   'failure_rate': args.failure_rate, 'sms_latency': args.sms_latency, 'seed': args.seed},
+        'scenarios': {},
+    }
+    for name in names:
+        results['scenarios'][name] = best_of([run_worker(name, args) for _ in range(max(1, args.repeat))])
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+    if any(result['incomplete'] for result in results['scenarios'].values()):
+        print('FAILED: some replies did not complete')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
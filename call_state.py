@@ -0,0 +1,81 @@
+"""
+ماشین حالت تماس (مستقل از jnius) - تشخیص تماس‌های رد شده یا بی‌پاسخ
+"""
+
+# حالت‌های تماس (مقادیر TelephonyManager.CALL_STATE_*)
+CALL_STATE_IDLE = 0
+CALL_STATE_RINGING = 1
+CALL_STATE_OFFHOOK = 2
+
+
+class CallStateMachine:
+    """
+    پردازش رویدادهای RINGING/OFFHOOK/IDLE و اعلام تماس‌های از دست رفته
+
+    - انتظار تماس: RINGING دوم در حین OFFHOOK به عنوان تماس در انتظار ثبت
+      می‌شود؛ اگر قبل از IDLE یک OFFHOOK دیگر برسد پاسخ داده شده حساب
+      می‌شود، وگرنه در IDLE از دست رفته است.
+    - رویدادهای خارج از ترتیب: رویدادی که timestamp آن از آخرین رویداد
+      پردازش شده قدیمی‌تر است کنار گذاشته می‌شود. RINGING تکراری و IDLE
+      بدون تماس نادیده گرفته می‌شوند.
+    - OFFHOOK بدون تماس ورودی یعنی تماس خروجی.
+    """
+
+    def __init__(self, on_missed_call, on_outgoing_call=None):
+        """
+        Args:
+            on_missed_call: تابعی که با شماره تماس از دست رفته فراخوانی می‌شود
+            on_outgoing_call: تابع اختیاری که با شماره تماس خروجی فراخوانی می‌شود
+        """
+        self.on_missed_call = on_missed_call
+        self.on_outgoing_call = on_outgoing_call
+        self.state = CALL_STATE_IDLE
+        self.last_timestamp = None
+        self.stale_events = 0
+        # شماره -> پاسخ داده شده؟ (به ترتیب ورود)
+        self._calls = {}
+        self._in_call = False
+
+    def handle(self, state, phone_number=None, timestamp=None):
+        """
+        پردازش یک رویداد تغییر وضعیت تماس
+
+        Returns:
+            bool: False اگر رویداد به عنوان قدیمی کنار گذاشته شد
+        """
+        if timestamp is not None:
+            if self.last_timestamp is not None and timestamp < self.last_timestamp:
+                self.stale_events += 1
+                return False
+            self.last_timestamp = timestamp
+
+        if state == CALL_STATE_RINGING:
+            # تماس ورودی (یا تماس در انتظار اگر در حال مکالمه هستیم)
+            if phone_number not in self._calls:
+                self._calls[phone_number] = False
+            if not self._in_call:
+                self.state = CALL_STATE_RINGING
+
+        elif state == CALL_STATE_OFFHOOK:
+            # آخرین تماس پاسخ داده نشده همان تماسی است که جواب داده شد
+            for number in reversed(self._calls):
+                if not self._calls[number]:
+                    self._calls[number] = True
+                    break
+            else:
+                if not self._in_call and not self._calls and self.on_outgoing_call:
+                    self.on_outgoing_call(phone_number)
+            self._in_call = True
+            self.state = CALL_STATE_OFFHOOK
+
+        elif state == CALL_STATE_IDLE:
+            # تماس(ها) قطع شد - هر تماس بی‌پاسخ، از دست رفته یا رد شده است
+            calls = self._calls
+            self._calls = {}
+            self._in_call = False
+            self.state = CALL_STATE_IDLE
+            for number, answered in calls.items():
+                if number and not answered:
+                    self.on_missed_call(number)
+
+        return True
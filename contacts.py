@@ -0,0 +1,295 @@
+"""
+ایندکس مخاطبین در حافظه برای یافتن نام تماس‌گیرنده بدون پرس‌وجو در مسیر تماس
+
+ایندکس یک بار (از snapshot روی دیسک یا با همگام‌سازی کامل) ساخته می‌شود و
+بعد از آن فقط تغییرات از آخرین همگام‌سازی (change token) از provider گرفته
+و اعمال می‌شود. lookup فقط یک جستجوی dict است.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from kivy.logger import Logger
+
+from phone_numbers import normalize_number, get_default_country
+
+# مسیر فایل snapshot ایندکس مخاطبین
+CONTACTS_SNAPSHOT_FILE = 'hellosms_contacts.json'
+
+# نسخه ساختار فایل snapshot (با تغییر قواعد یکسان‌سازی شماره هم افزایش می‌یابد)
+CONTACTS_SNAPSHOT_VERSION = 2
+
+# فاصله همگام‌سازی دوره‌ای (ثانیه)
+DEFAULT_SYNC_INTERVAL = 15 * 60
+
+# حداقل فاصله همگام‌سازی درخواست شده با request_sync (ثانیه)
+MIN_SYNC_INTERVAL = 30
+
+# سیاست پاسخ بر اساس مخاطبین (تنظیم reply_contacts_policy)
+CONTACTS_POLICY_ALL = 'all'
+CONTACTS_POLICY_CONTACTS = 'contacts'
+CONTACTS_POLICY_UNKNOWN = 'unknown'
+
+# یک مخاطب
+#   contact_id: شناسه مخاطب در provider
+#   name: نام نمایشی
+#   numbers: شماره‌های یکسان شده (tuple)
+Contact = namedtuple('Contact', 'contact_id name numbers')
+
+# نتیجه همگام‌سازی از provider
+#   token: change token جدید (برای همگام‌سازی بعدی)
+#   contacts: مخاطبین اضافه یا تغییر یافته (با همه شماره‌ها، شماره‌ها بدون یکسان‌سازی)
+#   deleted: شناسه مخاطبین حذف شده
+#   full: True یعنی contacts همه مخاطبین است و بقیه باید حذف شوند
+ContactChanges = namedtuple('ContactChanges', 'token contacts deleted full')
+
+
+class ContactsProvider:
+    """
+    رابط منبع مخاطبین
+
+    changes(None) همه مخاطبین را برمی‌گرداند (full=True)؛ با token قبلی فقط
+    مخاطبین تغییر یافته یا حذف شده بعد از آن. provider می‌تواند اگر تغییرات
+    را نمی‌داند، دوباره همه را با full=True برگرداند.
+    """
+
+    name = 'provider'
+
+    def changes(self, token=None):
+        raise NotImplementedError
+
+
+class ContactsIndex:
+    """
+    نگاشت شماره یکسان شده -> مخاطب با همگام‌سازی افزایشی در رشته پس‌زمینه
+
+    lookup بدون قفل از رشته تماس خوانده می‌شود؛ رشته همگام‌سازی تغییرات را
+    با قفل اعمال می‌کند و همگام‌سازی کامل dict جدید را یک‌جا جایگزین می‌کند.
+    بعد از هر تغییر snapshot فشرده ایندکس نوشته می‌شود تا اجرای بعدی بدون
+    پرس‌وجوی کامل مخاطبین آماده باشد.
+    """
+
+    def __init__(self, provider, snapshot_path=CONTACTS_SNAPSHOT_FILE, sync_interval=DEFAULT_SYNC_INTERVAL):
+        """
+        Args:
+            provider: ContactsProvider
+            snapshot_path: مسیر snapshot (None یعنی بدون ذخیره روی دیسک)
+            sync_interval: فاصله همگام‌سازی دوره‌ای (ثانیه)
+        """
+        self.provider = provider
+        self.snapshot_path = snapshot_path
+        self.sync_interval = sync_interval
+        self.token = None
+        self._contacts = {}
+        self._by_number = {}
+        # شماره -> شناسه همه مخاطبینی که آن را دارند (به ترتیب اضافه شدن)
+        self._owners = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._sync_requested = False
+        self._last_sync = 0.0
+        self._running = False
+        self._thread = None
+        self.syncs = 0
+        self.full_syncs = 0
+        self.last_sync_seconds = 0.0
+
+    def start(self):
+        """بارگذاری snapshot و شروع همگام‌سازی (اولین همگام‌سازی بلافاصله)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._sync_requested = True
+        self.load_snapshot()
+        self._thread = threading.Thread(target=self._run, name='HelloSmsContacts', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def lookup(self, phone_number):
+        """مخاطب یک شماره (یکسان شده یا نه) یا None"""
+        return self._by_number.get(normalize_number(phone_number))
+
+    def request_sync(self, force=False):
+        """همگام‌سازی در رشته پس‌زمینه (بدون force حداکثر یک بار در MIN_SYNC_INTERVAL)"""
+        with self._cond:
+            if not force and time.monotonic() - self._last_sync < MIN_SYNC_INTERVAL:
+                return
+            self._sync_requested = True
+            self._cond.notify()
+
+    def resync(self):
+        """همگام‌سازی کامل در اولین فرصت (مثلاً بعد از تغییر کد کشور پیش‌فرض)"""
+        with self._cond:
+            self.token = None
+            self._sync_requested = True
+            self._cond.notify()
+
+    def sync(self):
+        """
+        گرفتن و اعمال تغییرات از provider
+
+        Returns:
+            bool: True اگر ایندکس تغییر کرد
+        """
+        started = time.perf_counter()
+        try:
+            changes = self.provider.changes(self.token)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error reading contacts from {self.provider.name}: {e}")
+            return False
+        changed = self.apply(changes)
+        self.syncs += 1
+        self.last_sync_seconds = time.perf_counter() - started
+        if changed:
+            Logger.info(f"HelloSms: Contacts index synced ({len(self._contacts)} contacts, "
+                        f"{len(changes.contacts)} updated, {len(changes.deleted)} deleted, "
+                        f"{self.last_sync_seconds * 1000:.0f} ms)")
+            self.save_snapshot()
+        return changed
+
+    def apply(self, changes):
+        """اعمال نتیجه ContactsProvider.changes روی ایندکس"""
+        contacts = [Contact(contact.contact_id, contact.name,
+                            tuple(number for number in map(normalize_number, contact.numbers) if number))
+                    for contact in changes.contacts]
+        if changes.full:
+            self.full_syncs += 1
+            self._replace(contacts, changes.token)
+            return True
+        if not contacts and not changes.deleted:
+            self.token = changes.token
+            return False
+        with self._lock:
+            for contact_id in changes.deleted:
+                self._remove(contact_id)
+            for contact in contacts:
+                self._remove(contact.contact_id)
+                self._add(contact)
+            self.token = changes.token
+        return True
+
+    def load_snapshot(self):
+        """
+        بارگذاری snapshot روی دیسک
+
+        Returns:
+            bool: True اگر snapshot معتبر بارگذاری شد
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error loading contacts snapshot: {e}")
+            return False
+        if data.get('version') != CONTACTS_SNAPSHOT_VERSION or data.get('country') != get_default_country():
+            # شماره‌ها با کد کشور دیگری یکسان شده‌اند
+            return False
+        self._replace([Contact(contact_id, name, tuple(numbers))
+                       for contact_id, name, numbers in data.get('contacts', ())], data.get('token'))
+        Logger.info(f"HelloSms: Loaded {len(self._contacts)} contacts from snapshot")
+        return True
+
+    def save_snapshot(self):
+        """نوشتن اتمیک snapshot ایندکس"""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            data = {
+                'version': CONTACTS_SNAPSHOT_VERSION,
+                'country': get_default_country(),
+                'token': self.token,
+                'contacts': [[contact.contact_id, contact.name, contact.numbers]
+                             for contact in self._contacts.values()],
+            }
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error saving contacts snapshot: {e}")
+
+    def stats(self):
+        return {
+            'contacts': len(self._contacts),
+            'numbers': len(self._by_number),
+            'syncs': self.syncs,
+            'full_syncs': self.full_syncs,
+            'last_sync_ms': round(self.last_sync_seconds * 1000, 1),
+        }
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def _replace(self, contacts, token):
+        """جایگزینی کل ایندکس (lookup همزمان dict قبلی یا جدید را می‌بیند)"""
+        by_id = {}
+        by_number = {}
+        owners = {}
+        for contact in contacts:
+            by_id[contact.contact_id] = contact
+            for number in contact.numbers:
+                by_number[number] = contact
+                owners.setdefault(number, []).append(contact.contact_id)
+        with self._lock:
+            self._contacts = by_id
+            self._by_number = by_number
+            self._owners = owners
+            self.token = token
+
+    def _add(self, contact):
+        """(باید با قفل فراخوانی شود)"""
+        self._contacts[contact.contact_id] = contact
+        for number in contact.numbers:
+            self._by_number[number] = contact
+            self._owners.setdefault(number, []).append(contact.contact_id)
+
+    def _remove(self, contact_id):
+        """(باید با قفل فراخوانی شود)"""
+        contact = self._contacts.pop(contact_id, None)
+        if contact is None:
+            return
+        for number in contact.numbers:
+            owners = self._owners.get(number)
+            if owners is None or contact_id not in owners:
+                continue
+            # یک مخاطب ممکن است یک شماره را با دو قالب مختلف داشته باشد
+            owners[:] = [owner for owner in owners if owner != contact_id]
+            if owners:
+                # شماره مشترک به آخرین مخاطب باقی‌مانده صاحب آن اشاره می‌کند
+                self._by_number[number] = self._contacts[owners[-1]]
+            else:
+                del self._owners[number]
+                del self._by_number[number]
+
+    def _run(self):
+        """حلقه رشته همگام‌سازی"""
+        while True:
+            with self._cond:
+                while self._running and not self._sync_requested:
+                    remaining = self.sync_interval - (time.monotonic() - self._last_sync)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._running:
+                    return
+                self._sync_requested = False
+                self._last_sync = time.monotonic()
+            self.sync()
@@ -0,0 +1,136 @@
+"""
+کش جلوگیری از ارسال تکراری پیامک به یک شماره در بازه زمانی مشخص
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from kivy.logger import Logger
+
+from phone_numbers import normalize_number
+
+# مسیر فایل ذخیره کش
+COOLDOWN_FILE = 'hellosms_cooldown.json'
+
+# بازه پیش‌فرض عدم ارسال مجدد (ثانیه)
+DEFAULT_COOLDOWN_SECONDS = 3600
+
+# حداکثر تعداد شماره‌های نگه‌داری شده
+DEFAULT_MAX_ENTRIES = 5000
+
+# حداکثر تاخیر ذخیره کش بعد از تغییر (ثانیه)
+DEFAULT_SAVE_DELAY = 5
+
+
+class CooldownCache:
+    """
+    ایندکس شماره یکسان شده -> زمان آخرین ارسال با انقضای TTL و حذف LRU
+
+    ترتیب OrderedDict همان ترتیب زمان آخرین ارسال است، پس قدیمی‌ترین
+    ورودی‌ها همیشه در ابتدای آن قرار دارند.
+    """
+
+    def __init__(self, ttl=DEFAULT_COOLDOWN_SECONDS, max_entries=DEFAULT_MAX_ENTRIES, path=COOLDOWN_FILE,
+                 save_delay=DEFAULT_SAVE_DELAY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+
+    def should_send(self, phone_number, now=None):
+        """
+        بررسی و ثبت ارسال برای یک شماره
+
+        Returns:
+            bool: True اگر باید پیامک ارسال شود (زمان ارسال ثبت می‌شود)،
+                  False اگر شماره هنوز در بازه عدم ارسال است
+        """
+        key = normalize_number(phone_number)
+        if now is None:
+            now = time.time()
+        with self._lock:
+            last_sent = self._entries.get(key)
+            if last_sent is not None and now - last_sent < self.ttl:
+                self.hits += 1
+                return False
+
+            self.misses += 1
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+            self._evict(now)
+            self._dirty = True
+            return True
+
+    def forget(self, phone_number):
+        """حذف شماره از کش (مثلاً وقتی ارسال ناموفق بود)"""
+        with self._lock:
+            if self._entries.pop(normalize_number(phone_number), None) is not None:
+                self._dirty = True
+
+    def stats(self):
+        """شمارنده‌های کش - hits تعداد ارسال‌های صرفه‌جویی شده است"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def _evict(self, now):
+        """حذف ورودی‌های منقضی و ورودی‌های اضافه (باید با قفل فراخوانی شود)"""
+        entries = self._entries
+        while entries:
+            key, last_sent = next(iter(entries.items()))
+            if now - last_sent < self.ttl and len(entries) <= self.max_entries:
+                break
+            del entries[key]
+
+    def load(self):
+        """بارگذاری کش از فایل"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # فایل به صورت [[شماره، زمان]، ...] به ترتیب زمان ذخیره می‌شود
+            with self._lock:
+                self._entries = OrderedDict((key, ts) for key, ts in data)
+                self._evict(time.time())
+        except Exception as e:
+            Logger.error(f"HelloSms: Error loading cooldown cache: {e}")
+
+    def schedule_save(self):
+        """
+        ذخیره کش حداکثر save_delay ثانیه بعد
+
+        تغییرات این فاصله (مثلاً نتیجه یک دسته ارسال) با یک بار نوشتن فایل
+        ذخیره می‌شوند؛ برخلاف تمدید تایمر، ارسال‌های پیوسته ذخیره را عقب نمی‌اندازند.
+        """
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self.save)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def save(self):
+        """ذخیره کش در فایل در صورت تغییر (و لغو ذخیره زمان‌بندی شده)"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            data = list(self._entries.items())
+            self._dirty = False
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error saving cooldown cache: {e}")
@@ -0,0 +1,203 @@
+"""
+جایگزین‌های جعلی کلاس‌های تلفن اندروید (لایه jnius) برای اجرا و بنچمارک روی لینوکس
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_right
+
+from contacts import Contact, ContactChanges, ContactsProvider
+from sms_segment import segment_message
+
+
+class FakePendingIntent:
+    """PendingIntent جعلی - فقط اطلاعات همبستگی پیامک را نگه می‌دارد"""
+
+    __slots__ = ('action', 'msg_id', 'part')
+
+    def __init__(self, action, msg_id, part):
+        self.action = action
+        self.msg_id = msg_id
+        self.part = part
+
+
+def fake_intent_factory(action, msg_id, part):
+    """سازنده PendingIntent جعلی با امضای intent_factory در DeliveryTracker"""
+    return FakePendingIntent(action, msg_id, part)
+
+
+class FakeSmsManager:
+    """
+    SmsManager جعلی با همان متدهای ارسال
+
+    برای هر PendingIntent، on_broadcast(action, msg_id, part, success) را
+    (بلافاصله یا بعد از latency ثانیه در یک Timer) فراخوانی می‌کند؛ معمولاً
+    DeliveryTracker.handle_broadcast به آن وصل می‌شود.
+    """
+
+    def __init__(self, on_broadcast=None, failure_rate=0.0, latency=0.0, deliver=True, seed=None):
+        self.on_broadcast = on_broadcast
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.deliver = deliver
+        self.sent = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def divideMessage(self, message):
+        return list(segment_message(message).parts)
+
+    def sendTextMessage(self, destination, service_center, text, sent_intent, delivery_intent):
+        self._send(destination, [text], [sent_intent], [delivery_intent])
+
+    def sendMultipartTextMessage(self, destination, service_center, parts, sent_intents, delivery_intents):
+        count = len(parts)
+        self._send(destination, list(parts), list(sent_intents or [None] * count),
+                   list(delivery_intents or [None] * count))
+
+    def _send(self, destination, parts, sent_intents, delivery_intents):
+        with self._lock:
+            self.sent.append((destination, parts))
+            results = [self._rng.random() >= self.failure_rate for _ in parts]
+        reports = []
+        for success, sent_intent, delivery_intent in zip(results, sent_intents, delivery_intents):
+            if sent_intent is not None:
+                reports.append((sent_intent, success))
+            if success and self.deliver and delivery_intent is not None:
+                reports.append((delivery_intent, True))
+        if not reports or not self.on_broadcast:
+            return
+        if self.latency:
+            threading.Timer(self.latency, self._report, (reports,)).start()
+        else:
+            self._report(reports)
+
+    def _report(self, reports):
+        for intent, success in reports:
+            self.on_broadcast(intent.action, intent.msg_id, intent.part, success)
+
+
+class FakeSmsManagerClass:
+    """
+    جایگزین autoclass('android.telephony.SmsManager')
+
+    برای هر سیم‌کارت یک FakeSmsManager جدا می‌سازد و تعداد lookup ها را
+    می‌شمارد (هر lookup روی اندروید یک فراخوانی JNI است).
+    """
+
+    def __init__(self, **manager_kwargs):
+        self.manager_kwargs = manager_kwargs
+        self.managers = {}
+        self.lookups = 0
+
+    def getDefault(self):
+        return self._manager(None)
+
+    def getSmsManagerForSubscriptionId(self, subscription_id):
+        return self._manager(subscription_id)
+
+    def _manager(self, subscription_id):
+        self.lookups += 1
+        manager = self.managers.get(subscription_id)
+        if manager is None:
+            manager = self.managers[subscription_id] = FakeSmsManager(**self.manager_kwargs)
+        return manager
+
+
+class FakeSubscriptionInfo:
+    """SubscriptionInfo جعلی"""
+
+    def __init__(self, subscription_id, slot_index):
+        self.subscription_id = subscription_id
+        self.slot_index = slot_index
+
+    def getSubscriptionId(self):
+        return self.subscription_id
+
+    def getSimSlotIndex(self):
+        return self.slot_index
+
+
+class FakeSubscriptionManager:
+    """SubscriptionManager جعلی با لیست قابل تغییر سیم‌کارت‌ها"""
+
+    def __init__(self, subscription_ids=()):
+        self.calls = 0
+        self.set_subscriptions(subscription_ids)
+
+    def set_subscriptions(self, subscription_ids):
+        """تغییر سیم‌کارت‌های فعال؛ شکاف‌ها به ترتیب لیست هستند"""
+        self._infos = [FakeSubscriptionInfo(subscription_id, slot)
+                       for slot, subscription_id in enumerate(subscription_ids)]
+
+    def getActiveSubscriptionInfoList(self):
+        self.calls += 1
+        # اندروید به جای لیست خالی null برمی‌گرداند
+        return list(self._infos) or None
+
+
+class FakeContactsProvider(ContactsProvider):
+    """
+    منبع مخاطبین جعلی با change token (مثل CONTACT_LAST_UPDATED_TIMESTAMP)
+
+    هر تغییر یک شماره ترتیبی می‌گیرد و در یک لاگ ثبت می‌شود، پس changes با
+    token قبلی فقط تغییرات بعد از آن را (مثل پرس‌وجوی index دار روی
+    ContactsContract) پیدا می‌کند. latency تاخیر هر پرس‌وجو را شبیه‌سازی می‌کند.
+    """
+
+    name = 'fake contacts'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        # شناسه -> (نام، شماره‌ها)
+        self._contacts = {}
+        self._deleted = set()
+        # (شماره ترتیبی تغییر، شناسه مخاطب) به ترتیب
+        self._log = []
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+
+    def generate(self, count, seed=None, numbers_per_contact=2):
+        """ساخت count مخاطب با شماره‌های موبایل تصادفی (شماره‌های اول هر مخاطب یکتا هستند)"""
+        rng = random.Random(seed)
+        for contact_id in range(1, count + 1):
+            numbers = ['0912%07d' % contact_id]
+            numbers += ['0935%07d' % rng.randrange(10000000) for _ in range(rng.randrange(numbers_per_contact))]
+            self.put(contact_id, f'مخاطب {contact_id}', numbers)
+
+    def put(self, contact_id, name, numbers):
+        """افزودن یا تغییر یک مخاطب"""
+        with self._lock:
+            self._contacts[contact_id] = (name, tuple(numbers))
+            self._deleted.discard(contact_id)
+            self._touch(contact_id)
+
+    def delete(self, contact_id):
+        with self._lock:
+            if self._contacts.pop(contact_id, None) is not None:
+                self._deleted.add(contact_id)
+                self._touch(contact_id)
+
+    def changes(self, token=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if token is None:
+                contacts = [Contact(contact_id, name, numbers)
+                            for contact_id, (name, numbers) in self._contacts.items()]
+                self.rows += len(contacts)
+                return ContactChanges(self._clock, contacts, [], True)
+            changed = {contact_id for _, contact_id in self._log[bisect_right(self._log, (token, float('inf'))):]}
+            contacts = [Contact(contact_id, *self._contacts[contact_id])
+                        for contact_id in changed if contact_id in self._contacts]
+            deleted = [contact_id for contact_id in changed if contact_id in self._deleted]
+            self.rows += len(changed)
+            return ContactChanges(self._clock, contacts, deleted, False)
+
+    def _touch(self, contact_id):
+        self._clock += 1
+        self._log.append((self._clock, contact_id))
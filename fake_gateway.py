@@ -0,0 +1,92 @@
+"""
+درگاه پیامک HTTP جعلی روی localhost برای اجرا و بنچمارک HttpGatewayTransport
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 تا اتصال‌ها keep-alive بمانند
+    protocol_version = 'HTTP/1.1'
+    # هدر و بدنه پاسخ جدا نوشته می‌شوند؛ بدون این، Nagle و delayed ACK هر پاسخ را ~40ms کند می‌کنند
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.gateway._count_connection()
+
+    def do_POST(self):
+        gateway = self.server.gateway
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            messages = json.loads(self.rfile.read(length))['messages']
+        except (ValueError, KeyError, TypeError):
+            self._respond(400, {'error': 'bad request'})
+            return
+        if gateway.latency:
+            time.sleep(gateway.latency)
+        self._respond(200, {'results': gateway._accept(messages)})
+
+    def _respond(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSmsGateway:
+    """
+    سرور HTTP با پروتکل درگاه sms_transport
+
+    پیامک‌های دریافتی در received ذخیره می‌شوند؛ هر پیامک با احتمال
+    failure_rate ناموفق گزارش می‌شود و هر درخواست latency ثانیه طول می‌کشد.
+    """
+
+    def __init__(self, failure_rate=0.0, latency=0.0, seed=None):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.received = []
+        self.requests = 0
+        self.connections = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/send'
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _GatewayHandler)
+        self._server.daemon_threads = True
+        self._server.gateway = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='FakeSmsGateway', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _accept(self, messages):
+        with self._lock:
+            self.requests += 1
+            self.received.extend((message.get('to'), message.get('text')) for message in messages)
+            return [{'ok': self._rng.random() >= self.failure_rate} for _ in messages]
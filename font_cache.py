@@ -0,0 +1,123 @@
+"""
+کش مسیر فونت فارسی روی دیسک و گرم کردن گلیف‌ها بعد از اولین فریم
+"""
+
+import json
+import os
+import threading
+
+from kivy.logger import Logger
+
+from persian_text import shape, shape_many
+
+# مسیر فایل کش فونت
+FONT_CACHE_FILE = 'hellosms_font.json'
+
+# حروف فارسی/عربی که فرم‌های نمایشی آن‌ها گرم می‌شوند
+PERSIAN_LETTERS = 'ءآأؤإئابةتثجحخدذرزسشصضطظعغفقلمنهوىيپچژکگی'
+
+# ارقام فارسی و علائم رایج
+PERSIAN_EXTRA = '۰۱۲۳۴۵۶۷۸۹،؛؟٪'
+
+
+def resolve_font(candidates, platform_name, path=FONT_CACHE_FILE):
+    """
+    اولین فونت موجود از candidates با استفاده از کش دیسک
+
+    کش با پلتفرم و لیست مسیرهای بررسی شده کلید می‌خورد و با mtime فایل
+    فونت اعتبارسنجی می‌شود، پس در اجراهای بعدی فقط یک stat انجام می‌شود.
+
+    Returns:
+        tuple: (مسیر فونت یا None، True اگر از کش آمده باشد)
+    """
+    candidates = list(candidates)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('platform') == platform_name and cached.get('candidates') == candidates:
+            font_path = cached['path']
+            if os.stat(font_path).st_mtime == cached['mtime']:
+                return font_path, True
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        # کش وجود ندارد، خراب است یا فونت تغییر کرده/حذف شده
+        pass
+
+    for font_path in candidates:
+        try:
+            mtime = os.stat(font_path).st_mtime
+        except OSError:
+            continue
+        try:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'platform': platform_name, 'candidates': candidates,
+                           'path': font_path, 'mtime': mtime}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error saving font cache: {e}")
+        return font_path, False
+    return None, False
+
+
+def persian_glyph_sample():
+    """
+    متن نمایشی شامل همه فرم‌های حروف فارسی (تنها، ابتدا، وسط، انتها)
+
+    هر حرف در کنار «ب» قرار می‌گیرد تا reshape همه فرم‌های اتصال را تولید کند.
+    """
+    words = []
+    for letter in PERSIAN_LETTERS:
+        words.extend((letter, letter + 'ب', 'ب' + letter, 'ب' + letter + 'ب'))
+    return shape(' '.join(words)) + ' ' + PERSIAN_EXTRA
+
+
+def prewarm_shaping(texts=()):
+    """
+    شکل‌دهی متن‌ها در یک رشته پس‌زمینه
+
+    بارگذاری arabic_reshaper/bidi و پر کردن کش shape قبل از اولین تعامل
+    کاربر انجام می‌شود.
+    """
+    def run():
+        try:
+            shape_many(texts)
+            persian_glyph_sample()
+        except Exception as e:
+            Logger.error(f"HelloSms: Error pre-warming text shaping: {e}")
+
+    thread = threading.Thread(target=run, name='HelloSmsShapeWarmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def prewarm_glyphs(font_sizes, font_name=None):
+    """
+    rasterize گلیف‌های فارسی در اندازه‌های استفاده شده، هر فریم یک اندازه
+
+    ساخت texture فقط در رشته اصلی ممکن است، پس کار بین فریم‌ها تقسیم
+    می‌شود تا رابط کاربری گیر نکند. فونت و کش گلیف SDL_ttf برای هر
+    (فونت، اندازه) یک بار ساخته می‌شوند و Label های بعدی از آن استفاده می‌کنند.
+    """
+    from kivy.clock import Clock
+    from kivy.core.text import Label as CoreLabel, DEFAULT_FONT
+
+    pending = list(font_sizes)
+    sample = []
+
+    def warm_next(dt):
+        if not pending:
+            return
+        font_size, bold = pending.pop(0)
+        try:
+            if not sample:
+                sample.append(persian_glyph_sample())
+            label = CoreLabel(text=sample[0], font_size=font_size, bold=bold,
+                              font_name=font_name or DEFAULT_FONT)
+            label.refresh()
+        except Exception as e:
+            Logger.error(f"HelloSms: Error pre-warming glyphs: {e}")
+            return
+        if pending:
+            Clock.schedule_once(warm_next, 0)
+
+    Clock.schedule_once(warm_next, 0)
@@ -0,0 +1,259 @@
+"""
+تاریخچه تماس‌ها و پیامک‌ها در SQLite - نوشتن دسته‌ای خارج از مسیر تماس
+
+record فقط رویداد را به صف حافظه اضافه می‌کند؛ رشته نویسنده رویدادها را
+دسته‌ای در یک تراکنش (group commit) می‌نویسد. پایگاه داده در حالت WAL است
+تا پرس‌وجوها همزمان با نوشتن اجرا شوند.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from kivy.logger import Logger
+
+# مسیر فایل پایگاه داده تاریخچه
+HISTORY_DB_FILE = 'hellosms_history.db'
+
+# نوع رویدادها
+EVENT_MISSED_CALL = 1
+EVENT_SMS_SENT = 2
+EVENT_SMS_FAILED = 3
+EVENT_KINDS = (EVENT_MISSED_CALL, EVENT_SMS_SENT, EVENT_SMS_FAILED)
+
+# حداکثر رویداد در هر تراکنش
+DEFAULT_BATCH_SIZE = 500
+
+# حداکثر تاخیر نوشتن رویداد (ثانیه)
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# نگهداری رویدادها (روز)؛ 0 یعنی بدون حذف
+DEFAULT_RETENTION_DAYS = 180
+
+# حداکثر رویداد نوشته نشده در حافظه؛ بیشتر از آن قدیمی‌ترین‌ها حذف می‌شوند
+DEFAULT_MAX_PENDING = 50000
+
+# فاصله اجرای حذف رویدادهای قدیمی (ثانیه)
+COMPACT_INTERVAL = 6 * 3600
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS events ('
+    ' id INTEGER PRIMARY KEY,'
+    ' ts REAL NOT NULL,'
+    ' kind INTEGER NOT NULL,'
+    ' number TEXT,'
+    ' line INTEGER,'
+    ' detail TEXT)',
+    # تاریخچه یک شماره
+    'CREATE INDEX IF NOT EXISTS events_number_ts ON events (number, ts)',
+    # شمارش بر اساس نوع و بازه زمانی، پرتکرارترین شماره‌ها (index پوشا) و حذف رویدادهای قدیمی
+    'CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts, number)',
+)
+
+
+class HistoryStore:
+    """
+    ذخیره رویدادهای تماس و پیامک با نوشتن دسته‌ای در رشته پس‌زمینه
+
+    اتصال نوشتن فقط در رشته نویسنده استفاده می‌شود و پرس‌وجوها از یک اتصال
+    جدا (با قفل) اجرا می‌شوند. رویدادهای قدیمی‌تر از retention_days به صورت
+    دوره‌ای حذف و فضای آزاد شده به فایل برگردانده می‌شود.
+    """
+
+    def __init__(self, path=HISTORY_DB_FILE, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 retention_days=DEFAULT_RETENTION_DAYS, max_pending=DEFAULT_MAX_PENDING):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_pending = max_pending
+        # با پر شدن صف، deque قدیمی‌ترین رویداد را خودش کنار می‌گذارد
+        self._pending = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._writing = False
+        self._flush_waiters = 0
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        # None یعنی حذف رویدادهای قدیمی در اولین دور رشته نویسنده
+        self._last_compact = None
+        self._compact_at = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.compacted = 0
+
+    def start(self):
+        """ساخت جدول‌ها و راه‌اندازی رشته نویسنده"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        connection = self._connect()
+        self._thread = threading.Thread(target=self._run, args=(connection,), name='HelloSmsHistory', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """نوشتن رویدادهای باقی‌مانده و بستن اتصال‌ها"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._reader_lock:
+            if self._reader:
+                self._reader.close()
+                self._reader = None
+
+    def record(self, kind, number, line=None, detail=None, ts=None):
+        """ثبت یک رویداد (بدون I/O؛ نوشتن در رشته نویسنده)"""
+        event = (time.time() if ts is None else ts, kind, number, line, detail)
+        with self._cond:
+            if len(self._pending) == self.max_pending:
+                self.dropped += 1
+            self._pending.append(event)
+            # رشته نویسنده بدون رویداد منتظر می‌ماند؛ اولین رویداد مهلت flush_interval را شروع می‌کند
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self, timeout=10):
+        """انتظار تا نوشته شدن همه رویدادهای ثبت شده"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                while self._running and (self._pending or self._writing or self._last_compact is None):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flush_waiters -= 1
+        return True
+
+    def count(self, kind, since=None, until=None):
+        """تعداد رویدادهای یک نوع در بازه زمانی"""
+        query = 'SELECT COUNT(*) FROM events WHERE kind = ? AND ts >= ? AND ts < ?'
+        return self._query(query, (kind, since or 0, until or float('inf')))[0][0]
+
+    def top_numbers(self, kind=EVENT_MISSED_CALL, since=None, limit=10):
+        """پرتکرارترین شماره‌ها: لیست (شماره، تعداد)"""
+        query = ('SELECT number, COUNT(*) AS total FROM events WHERE kind = ? AND ts >= ? '
+                 'GROUP BY number ORDER BY total DESC LIMIT ?')
+        return [tuple(row) for row in self._query(query, (kind, since or 0, limit))]
+
+    def number_history(self, number, limit=50):
+        """آخرین رویدادهای یک شماره: لیست (زمان، نوع، خط، توضیح)"""
+        query = 'SELECT ts, kind, line, detail FROM events WHERE number = ? ORDER BY ts DESC LIMIT ?'
+        return [tuple(row) for row in self._query(query, (number, limit))]
+
+    def compact(self, now=None):
+        """حذف رویدادهای قدیمی‌تر از retention_days (در رشته نویسنده)"""
+        with self._cond:
+            self._last_compact = None
+            self._compact_at = now
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'written': self.written, 'batches': self.batches, 'pending': len(self._pending),
+                    'dropped': self.dropped, 'compacted': self.compacted}
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        # auto_vacuum فقط قبل از ساخت اولین جدول اثر دارد
+        connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.execute('PRAGMA journal_mode = WAL')
+        # در WAL با NORMAL فقط آخرین تراکنش‌ها در قطع برق از دست می‌روند
+        connection.execute('PRAGMA synchronous = NORMAL')
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        return connection
+
+    def _query(self, query, params):
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(self.path, check_same_thread=False)
+            return self._reader.execute(query, params).fetchall()
+
+    def _write(self, connection, events):
+        try:
+            with connection:
+                connection.executemany(
+                    'INSERT INTO events (ts, kind, number, line, detail) VALUES (?, ?, ?, ?, ?)', events)
+        except sqlite3.Error as e:
+            Logger.error(f"HelloSms: Error writing {len(events)} history events: {e}")
+            return
+        self.written += len(events)
+        self.batches += 1
+
+    def _delete_expired(self, connection, now):
+        if not self.retention_days:
+            return
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        try:
+            with connection:
+                # kind IN (...) تا حذف از index زمانی events_kind_ts استفاده کند
+                deleted = connection.execute(
+                    f"DELETE FROM events WHERE kind IN ({','.join('?' * len(EVENT_KINDS))}) AND ts < ?",
+                    EVENT_KINDS + (cutoff,)).rowcount
+            if deleted:
+                # incremental_vacuum در هر step یک صفحه آزاد می‌کند و execute فقط یک step
+                # اجرا می‌کند؛ executescript تا آزاد شدن همه صفحه‌ها ادامه می‌دهد
+                connection.executescript('PRAGMA incremental_vacuum;')
+                connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                self.compacted += deleted
+                Logger.info(f"HelloSms: Removed {deleted} history events older than {self.retention_days} days")
+        except sqlite3.Error as e:
+            Logger.error(f"HelloSms: Error compacting history: {e}")
+
+    def _wait_for_work(self):
+        """
+        انتظار تا دسته بعدی (با قفل)
+
+        دسته کامل، flush، حذف درخواست شده یا توقف بدون انتظار انجام می‌شود.
+        بدون رویداد نوشته نشده رشته تا record بعدی یا زمان حذف رویدادهای
+        قدیمی بیدار نمی‌شود؛ با وجود رویداد حداکثر flush_interval صبر می‌کند.
+        """
+        while self._running and self._last_compact is not None and len(self._pending) < self.batch_size:
+            if self._pending:
+                if not self._flush_waiters:
+                    self._cond.wait(self.flush_interval)
+                return
+            timeout = self._last_compact + COMPACT_INTERVAL - time.monotonic()
+            if timeout <= 0:
+                return
+            self._cond.wait(timeout)
+
+    def _run(self, connection):
+        """حلقه رشته نویسنده"""
+        try:
+            while True:
+                with self._cond:
+                    self._wait_for_work()
+                    events = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                    running = self._running
+                    now = time.monotonic()
+                    compact_due = self._last_compact is None or now - self._last_compact >= COMPACT_INTERVAL
+                    if compact_due:
+                        self._last_compact = now
+                    compact_at, self._compact_at = self._compact_at, None
+                    self._writing = bool(events) or compact_due
+                if events:
+                    self._write(connection, events)
+                if compact_due:
+                    self._delete_expired(connection, compact_at)
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+                    if not running and not self._pending:
+                        return
+        finally:
+            connection.close()
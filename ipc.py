@@ -0,0 +1,186 @@
+"""
+کانال ارتباطی محلی بین رابط کاربری و سرویس پس‌زمینه (Unix socket)
+
+پروتکل: هر درخواست و پاسخ یک خط JSON است.
+    درخواست: {"cmd": "status"} یا {"cmd": "settings", "settings": {...}}
+    پاسخ:    {"ok": true, ...} یا {"ok": false, "error": "..."}
+یک اتصال می‌تواند برای چند درخواست پشت سر هم استفاده شود.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+
+from kivy.logger import Logger
+from kivy.utils import platform
+
+# نام فایل socket سرویس در پوشه خصوصی برنامه (default_socket_path)
+IPC_SOCKET_FILE = 'hellosms_service.sock'
+
+# مهلت پیش‌فرض هر درخواست سمت رابط کاربری (ثانیه)
+DEFAULT_IPC_TIMEOUT = 1.0
+
+
+class IpcError(Exception):
+    """سرویس در دسترس نیست یا درخواست را رد کرده است"""
+
+
+def default_socket_path():
+    """
+    مسیر مطلق socket سرویس
+
+    پروسه رابط کاربری و سرویس پوشه جاری یکسانی ندارند، پس مسیر از پوشه
+    خصوصی برنامه ساخته می‌شود (روی اندروید ANDROID_PRIVATE که python-for-android
+    برای هر دو پروسه تنظیم می‌کند و فقط برای کاربر برنامه قابل دسترس است).
+    روی سیستم‌های دیگر پوشه جاری استفاده می‌شود.
+    """
+    base = os.environ.get('ANDROID_PRIVATE') if platform == 'android' else None
+    if platform == 'android' and not base:
+        Logger.warning("HelloSms: ANDROID_PRIVATE is not set, using the working directory for the IPC socket")
+    return os.path.join(os.path.abspath(base or os.getcwd()), IPC_SOCKET_FILE)
+
+
+class _IpcRequestHandler(socketserver.StreamRequestHandler):
+    """خواندن درخواست‌های خط به خط یک اتصال و نوشتن پاسخ هر کدام"""
+
+    def handle(self):
+        for line in self.rfile:
+            response = self.server.ipc.dispatch(line)
+            self.wfile.write(json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                             + b'\n')
+            self.wfile.flush()
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class IpcServer:
+    """
+    سرور IPC سرویس پس‌زمینه
+
+    handlers نگاشت نام دستور به handler(request) است؛ مقدار بازگشتی (dict یا
+    None) به پاسخ اضافه می‌شود و خطای handler به صورت {"ok": false} برمی‌گردد.
+    """
+
+    def __init__(self, handlers, path=None):
+        self.handlers = dict(handlers)
+        self.path = path or default_socket_path()
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """ساخت socket و شروع پاسخ‌گویی در یک رشته پس‌زمینه"""
+        if self._server:
+            return
+        # socket باقی‌مانده از اجرای قبلی (مثلاً بعد از kill شدن پروسه)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = _ThreadingUnixServer(self.path, _IpcRequestHandler)
+        self._server.ipc = self
+        os.chmod(self.path, 0o600)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='HelloSmsIpc', daemon=True)
+        self._thread.start()
+        Logger.info(f"HelloSms: IPC server listening on {self.path}")
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def dispatch(self, line):
+        """اجرای یک خط درخواست و ساخت پاسخ"""
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            handler = self.handlers.get(request.get('cmd'))
+            if handler is None:
+                return {'ok': False, 'error': f"unknown command {request.get('cmd')!r}"}
+            response = {'ok': True}
+            response.update(handler(request) or {})
+            return response
+        except Exception as e:
+            Logger.error(f"HelloSms: Error handling IPC request: {e}")
+            return {'ok': False, 'error': str(e)}
+
+
+class IpcClient:
+    """
+    کلاینت IPC رابط کاربری
+
+    اتصال بین درخواست‌ها باز می‌ماند؛ اگر سرویس دوباره راه‌اندازی شده باشد
+    یک بار با اتصال تازه تلاش می‌شود.
+    """
+
+    def __init__(self, path=None, timeout=DEFAULT_IPC_TIMEOUT):
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def request(self, cmd, **fields):
+        """
+        ارسال یک دستور و انتظار برای پاسخ
+
+        Returns:
+            dict: پاسخ سرویس
+
+        Raises:
+            IpcError: اگر سرویس در دسترس نباشد یا دستور ناموفق باشد
+        """
+        fields['cmd'] = cmd
+        line = json.dumps(fields, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            for attempt in range(2):
+                reused = self._sock is not None
+                try:
+                    if not reused:
+                        self._connect()
+                    self._sock.sendall(line)
+                    reply = self._file.readline()
+                    if not reply:
+                        raise ConnectionError("service closed the connection")
+                    break
+                except OSError as e:
+                    self._close()
+                    # اتصال قدیمی ممکن است با راه‌اندازی مجدد سرویس بسته شده باشد
+                    if not reused or attempt:
+                        raise IpcError(f"service not reachable: {e}") from e
+        response = json.loads(reply)
+        if not response.get('ok'):
+            raise IpcError(response.get('error', 'request failed'))
+        return response
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._file = sock.makefile('rb')
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,114 @@
+"""
+ژورنال پایدار رکوردهای JSON روی دیسک برای صف ارسال و تایمرهای پاسخ
+"""
+
+import json
+import os
+
+from kivy.logger import Logger
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class Journal:
+    """
+    ژورنال خط به خط: هر آیتم با رکورد add و شناسه‌اش ثبت و با رکورد done تمام می‌شود
+
+    replay رکوردهای add بدون done را برمی‌گرداند و خط ناقص (قطع شدن پروسه
+    هنگام نوشتن) را کنار می‌گذارد. rewrite ژورنال را به صورت اتمیک فقط با
+    آیتم‌های باقی‌مانده بازنویسی می‌کند. این کلاس قفل ندارد؛ صاحب ژورنال
+    همه فراخوانی‌ها را با قفل خودش انجام می‌دهد.
+    """
+
+    def __init__(self, path, name):
+        """
+        Args:
+            path: مسیر فایل ژورنال
+            name: نام ژورنال در پیام‌های لاگ (مثلاً 'SMS')
+        """
+        self.path = path
+        self.name = name
+        # تعداد رکوردهای فایل برای تصمیم‌گیری درباره کوتاه کردن آن
+        self.records = 0
+        self._file = None
+
+    @property
+    def is_open(self):
+        return self._file is not None
+
+    def open(self):
+        """باز کردن ژورنال برای اضافه کردن رکورد"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, record):
+        """نوشتن یک رکورد در انتهای ژورنال (بدون اثر اگر ژورنال باز نیست)"""
+        if self._file is None:
+            return
+        self._file.write(_dump(record))
+        self._file.flush()
+        self.records += 1
+
+    def replay(self):
+        """
+        خواندن ژورنال
+
+        Returns:
+            (dict شناسه -> رکورد add بدون done به ترتیب ثبت، بیشترین شناسه دیده شده)
+        """
+        live = {}
+        max_id = 0
+        if not os.path.exists(self.path):
+            return live, max_id
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # خط ناقص در اثر قطع شدن پروسه هنگام نوشتن
+                        continue
+                    record_id = record.get('id', 0)
+                    max_id = max(max_id, record_id)
+                    if record.get('op') == 'add':
+                        live[record_id] = record
+                    elif record.get('op') == 'done':
+                        live.pop(record_id, None)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error reading {self.name} journal: {e}")
+        return live, max_id
+
+    def rewrite(self, records):
+        """بازنویسی اتمیک ژورنال فقط با رکوردهای داده شده (ژورنال باز دوباره باز می‌شود)"""
+        reopen = self._file is not None
+        self.close()
+        tmp_path = self.path + '.tmp'
+        try:
+            count = 0
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(_dump(record))
+                    count += 1
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.records = count
+        except Exception as e:
+            Logger.error(f"HelloSms: Error compacting {self.name} journal: {e}")
+        if reopen:
+            self.open()
+
+    def truncate(self):
+        """خالی کردن ژورنال باز وقتی هیچ آیتمی باقی نمانده است"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self.records = 0
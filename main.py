@@ -2,9 +2,11 @@
 برنامه اصلی HelloSms - ارسال خودکار پیامک پس از رد یا از دست رفتن تماس
 """
 
-import json
-import os
-import re
+# پروفایلر شروع باید قبل از بقیه import ها ساخته شود
+from startup_profile import profiler
+
+import threading
+import time
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
@@ -15,13 +17,30 @@ from kivy.uix.scrollview import ScrollView
 from kivy.utils import platform
 from kivy.logger import Logger
 from kivy.clock import Clock
-import arabic_reshaper
-from bidi.algorithm import get_display
+from kivy.core.text import LabelBase, DEFAULT_FONT
+from kivy.metrics import sp
+
+from service import start_monitor_service
+from ipc import IpcClient, IpcError, default_socket_path
+from persian_text import shape, shape_many, layout_line, base_direction
+from sms_segment import segment_message
+from sms_template import compile_template, TemplateError
+from font_cache import resolve_font, prewarm_shaping, prewarm_glyphs
+from settings_store import SettingsStore, DEFAULT_SETTINGS
+from metrics import metrics, UI_METRICS_FILE
+from activity_feed import ActivityFeed
+
+profiler.record('imports', profiler.started)
 
-from service import AndroidCallMonitor, send_sms
+# فاصله خواندن وضعیت سرویس مانیتورینگ در رابط کاربری (ثانیه)
+SERVICE_POLL_INTERVAL = 2
 
-# مسیر فایل تنظیمات
-SETTINGS_FILE = 'hellosms_settings.json'
+# متن و رنگ برچسب وضعیت برای هر حالت سرویس
+SERVICE_STATES = {
+    'waiting': ('وضعیت: در انتظار سرویس مانیتورینگ', (1, 0.5, 0, 1)),
+    'ready': ('وضعیت: سرویس فعال و آماده', (0, 1, 0, 1)),
+    'stopped': ('وضعیت: سرویس غیرفعال', (1, 0.5, 0, 1)),
+}
 
 
 def get_persian_font():
@@ -55,117 +74,263 @@ def get_persian_font():
     ]
     persian_fonts.extend(local_fonts)
     
-    # بررسی وجود فونت‌ها
-    for font_path in persian_fonts:
-        if os.path.exists(font_path):
-            Logger.info(f"HelloSms: Using Persian font: {font_path}")
-            return font_path
+    # بررسی وجود فونت‌ها (نتیجه با کلید پلتفرم روی دیسک کش می‌شود)
+    font_path, cached = resolve_font(persian_fonts, platform)
+    if font_path:
+        Logger.info(f"HelloSms: Using Persian font: {font_path}{' (cached)' if cached else ''}")
+        return font_path
     
     # اگر هیچ فونت فارسی پیدا نشد، از فونت پیش‌فرض استفاده می‌شود
     Logger.warning("HelloSms: No Persian font found, using default font")
     return None
 
-# پیکربندی arabic_reshaper برای فارسی بهتر
-try:
-    # تنظیمات برای reshape بهتر کاراکترهای فارسی
-    arabic_reshaper.config['delete_harakat'] = False
-    arabic_reshaper.config['delete_tatweel'] = False
-    arabic_reshaper.config['support_ligatures'] = True
-except:
-    pass
+class PersianTextInput(TextInput):
+    """
+    TextInput سفارشی برای پشتیبانی از فارسی با reshape و bidi خودکار
 
+    متن اصلی به صورت لیستی از خطوط منطقی نگه داشته می‌شود. هر ویرایش فقط
+    خطوط تغییر کرده را کثیف علامت می‌زند و یک reshape تجمیع شده (debounced)
+    برای کل دنباله ویرایش اجرا می‌شود. موقعیت cursor با نگاشت دقیق
+    layout_line بین ترتیب منطقی و نمایشی تبدیل می‌شود.
 
-class PersianTextInput(TextInput):
-    """TextInput سفارشی برای پشتیبانی از فارسی با reshape و bidi خودکار"""
+    undo/redo داخلی TextInput روی اندیس‌های متن نمایشی کار می‌کند و با
+    خطوط منطقی هماهنگ نمی‌ماند، پس undo/redo روی خطوط منطقی انجام می‌شود.
+    """
+    
+    # تاخیر reshape بعد از آخرین ویرایش (ثانیه)
+    RESHAPE_DELAY = 0.1
+    
+    # حداکثر مراحل undo
+    UNDO_LIMIT = 100
     
     def __init__(self, **kwargs):
-        # تنظیم _is_reshaping قبل از super().__init__ تا در on_text قابل استفاده باشد
-        self._is_reshaping = False
+        # تنظیم _is_reshaping قبل از super().__init__ تا در متدهای override شده قابل استفاده باشد
+        self._is_reshaping = True
         
-        # ذخیره متن اصلی (بدون reshape و bidi)
+        # ذخیره متن اصلی (بدون reshape و bidi) به صورت خط به خط
         original_text = kwargs.get('text', '')
+        self._logical_lines = original_text.split('\n')
+        self._paragraph_dir = base_direction(self._logical_lines)
+        self._line_layouts = [layout_line(line, self._paragraph_dir) for line in self._logical_lines]
+        self._dirty_lines = set()
+        # موقعیت منطقی cursor در طول یک دنباله ویرایش (سطر، ستون)
+        self._pending_cursor = None
+        self._expected_cursor_index = None
+        # وضعیت‌های قبلی (خطوط منطقی، cursor منطقی) برای undo و redo
+        self._undo_states = []
+        self._redo_states = []
         
-        # برای نمایش: reshape + bidi
-        display_text = original_text
-        if original_text and re.search(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]', original_text):
-            try:
-                reshaped = arabic_reshaper.reshape(original_text)
-                display_text = get_display(reshaped)
-            except:
-                pass
-        
-        kwargs['text'] = display_text
+        kwargs['text'] = '\n'.join(layout.display for layout in self._line_layouts)
         super().__init__(**kwargs)
-        # ذخیره متن اصلی (بدون reshape و bidi)
-        self._original_text = original_text
+        self._is_reshaping = False
+        self._reshape_trigger = Clock.create_trigger(self._reshape_dirty, self.RESHAPE_DELAY)
     
     def insert_text(self, substring, from_undo=False):
-        """درج متن با reshape و bidi خودکار"""
+        """درج متن در متن اصلی و زمان‌بندی reshape تجمیع شده"""
         if self._is_reshaping:
             return super().insert_text(substring, from_undo)
         
-        # اضافه کردن به متن اصلی
-        cursor_pos = self.cursor[0]
-        # تبدیل موقعیت cursor از bidi به موقعیت واقعی (تقریبی)
-        # برای سادگی، از موقعیت فعلی استفاده می‌کنیم
-        self._original_text = self._original_text[:cursor_pos] + substring + self._original_text[cursor_pos:]
+        row, col = self._logical_cursor()
+        self._push_undo((row, col))
+        line = self._logical_lines[row]
+        new_lines = (line[:col] + substring + line[col:]).split('\n')
+        self._replace_lines(row, 1, new_lines)
         
-        # reshape و bidi کردن substring برای نمایش
-        display_substring = substring
-        if substring and re.search(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]', substring):
-            try:
-                reshaped = arabic_reshaper.reshape(substring)
-                display_substring = get_display(reshaped)
-            except:
-                pass
+        # موقعیت منطقی cursor بعد از متن درج شده
+        last_row = row + len(new_lines) - 1
+        if len(new_lines) == 1:
+            self._pending_cursor = (row, col + len(substring))
+        else:
+            self._pending_cursor = (last_row, len(substring) - substring.rfind('\n') - 1)
         
-        result = super().insert_text(display_substring, from_undo)
+        # نمایش فوری substring تا reshape نهایی
+        result = super().insert_text(shape(substring), from_undo)
+        self._expected_cursor_index = self.cursor_index()
+        self._reshape_trigger()
+        return result
+    
+    def _key_down(self, key, repeat=False):
+        """
+        کلید Delete مستقیماً کاراکتر منطقی بعد از cursor را حذف می‌کند
+
+        TextInput برای Delete اول cursor را یک قدم به راست (به ترتیب نمایشی)
+        می‌برد و بعد backspace می‌زند، که در متن راست به چپ یا انتهای خط
+        کاراکتر منطقی اشتباه را حذف می‌کند؛ پس cursor قبل از جابجایی خوانده می‌شود.
+        """
+        if key[2] == 'del' and not self._selection and not self._is_reshaping:
+            return self.do_backspace(mode='del')
+        return super()._key_down(key, repeat)
+
+    def do_backspace(self, from_undo=False, mode='bkspc'):
+        """حذف یک کاراکتر منطقی قبل (یا بعد در حالت del) از cursor"""
+        if self._is_reshaping or self.readonly:
+            return super().do_backspace(from_undo, mode)
         
-        # reshape و bidi کردن کل متن برای اطمینان از صحت
-        Clock.schedule_once(lambda dt: self._reshape_all_text(), 0.1)
+        row, col = self._logical_cursor()
+        line = self._logical_lines[row]
+        if (mode == 'del' and col == len(line) and row + 1 == len(self._logical_lines)) or \
+                (mode != 'del' and col == 0 and row == 0):
+            # چیزی برای حذف نیست
+            return
+        self._push_undo((row, col))
+        if mode == 'del':
+            if col < len(line):
+                self._replace_lines(row, 1, [line[:col] + line[col + 1:]])
+            elif row + 1 < len(self._logical_lines):
+                self._replace_lines(row, 2, [line + self._logical_lines[row + 1]])
+        elif col > 0:
+            self._replace_lines(row, 1, [line[:col - 1] + line[col:]])
+            col -= 1
+        elif row > 0:
+            col = len(self._logical_lines[row - 1])
+            self._replace_lines(row - 1, 2, [self._logical_lines[row - 1] + line])
+            row -= 1
         
-        return result
+        self._pending_cursor = (row, col)
+        self._expected_cursor_index = self.cursor_index()
+        self._reshape_trigger()
     
-    def _reshape_all_text(self):
-        """reshape و bidi کردن کل متن بر اساس متن اصلی"""
-        if self._is_reshaping:
+    def delete_selection(self, from_undo=False):
+        """حذف بازه منطقی متناظر با انتخاب نمایشی"""
+        if self._is_reshaping or not self._selection:
+            return super().delete_selection(from_undo)
+        
+        if self._dirty_lines:
+            self._reshape_dirty()
+        start, end = self._selection_to_logical(
+            min(self.selection_from, self.selection_to),
+            max(self.selection_from, self.selection_to))
+        self.cancel_selection()
+        self._push_undo(start)
+        
+        (start_row, start_col), (end_row, end_col) = start, end
+        merged = self._logical_lines[start_row][:start_col] + self._logical_lines[end_row][end_col:]
+        self._replace_lines(start_row, end_row - start_row + 1, [merged])
+        self._pending_cursor = start
+        self._expected_cursor_index = self.cursor_index()
+        self._reshape_trigger()
+    
+    def do_undo(self):
+        """بازگرداندن آخرین ویرایش روی خطوط منطقی"""
+        if self._undo_states:
+            self._redo_states.append(self._undo_state())
+            self._restore(self._undo_states.pop())
+    
+    def do_redo(self):
+        """انجام دوباره آخرین ویرایش بازگردانده شده"""
+        if self._redo_states:
+            self._undo_states.append(self._undo_state())
+            self._restore(self._redo_states.pop())
+    
+    def _undo_state(self, cursor=None):
+        """(کپی خطوط منطقی، cursor منطقی) - رشته‌ها تغییرناپذیرند و کپی لیست کافی است"""
+        return list(self._logical_lines), cursor or self._logical_cursor()
+    
+    def _push_undo(self, cursor):
+        """ثبت وضعیت قبل از یک ویرایش"""
+        self._undo_states.append(self._undo_state(cursor))
+        del self._undo_states[:-self.UNDO_LIMIT]
+        self._redo_states.clear()
+    
+    def _restore(self, state):
+        """جایگزینی همه خطوط منطقی و reshape فوری"""
+        lines, cursor = state
+        self._logical_lines = list(lines)
+        self._line_layouts = [None] * len(lines)
+        self._dirty_lines = set(range(len(lines)))
+        self._pending_cursor = cursor
+        self._reshape_dirty()
+    
+    def _replace_lines(self, row, count, new_lines):
+        """جایگزینی count خط منطقی از row با new_lines و علامت زدن آن‌ها"""
+        shift = len(new_lines) - count
+        self._logical_lines[row:row + count] = new_lines
+        self._line_layouts[row:row + count] = [None] * len(new_lines)
+        self._dirty_lines = {
+            r + shift if r >= row + count else r
+            for r in self._dirty_lines if not row <= r < row + count
+        }
+        self._dirty_lines.update(range(row, row + len(new_lines)))
+    
+    def _logical_cursor(self):
+        """موقعیت منطقی (سطر، ستون) cursor فعلی"""
+        if self._pending_cursor is not None and self.cursor_index() == self._expected_cursor_index:
+            # هنوز در همان دنباله ویرایش هستیم
+            return self._pending_cursor
+        if self._dirty_lines:
+            # cursor وسط دنباله ویرایش جابجا شده - اول reshape معوق اعمال شود
+            self._reshape_dirty()
+        return self._display_to_logical(self.cursor_index())
+    
+    def _display_to_logical(self, index):
+        """تبدیل اندیس در متن نمایشی به (سطر، ستون) منطقی"""
+        row, index = self._display_row(index)
+        return row, self._line_layouts[row].to_logical[index]
+    
+    def _selection_to_logical(self, start, end):
+        """
+        تبدیل بازه نمایشی [start, end] به بازه منطقی ((سطر، ستون)، (سطر، ستون))
+
+        در هر سطر، کوچک‌ترین و بزرگ‌ترین ستون منطقی موقعیت‌های نمایشی
+        انتخاب شده گرفته می‌شود، چون در متن راست به چپ ابتدای نمایشی
+        انتهای منطقی است.
+        """
+        start_row, start_index = self._display_row(start)
+        end_row, end_index = self._display_row(end)
+        start_map = self._line_layouts[start_row].to_logical
+        end_map = self._line_layouts[end_row].to_logical
+        if start_row == end_row:
+            cols = start_map[start_index:end_index + 1]
+            return (start_row, min(cols)), (end_row, max(cols))
+        return (start_row, min(start_map[start_index:])), (end_row, max(end_map[:end_index + 1]))
+    
+    def _display_row(self, index):
+        """تبدیل اندیس در متن نمایشی به (سطر، اندیس در همان سطر)"""
+        for row, layout in enumerate(self._line_layouts):
+            length = len(layout.display)
+            if index <= length:
+                return row, index
+            index -= length + 1
+        last = len(self._line_layouts) - 1
+        return last, len(self._line_layouts[last].display)
+    
+    def _logical_to_display(self, row, col):
+        """تبدیل (سطر، ستون) منطقی به اندیس در متن نمایشی"""
+        index = sum(len(layout.display) + 1 for layout in self._line_layouts[:row])
+        return index + self._line_layouts[row].to_visual[col]
+    
+    def _reshape_dirty(self, dt=None):
+        """reshape و bidi کردن فقط خطوط تغییر کرده و به‌روزرسانی نمایش"""
+        if self._is_reshaping or not self._dirty_lines:
             return
         
         self._is_reshaping = True
         try:
-            text = self._original_text
-            if text and re.search(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]', text):
-                try:
-                    reshaped = arabic_reshaper.reshape(text)
-                    bidi_text = get_display(reshaped)
-                    if self.text != bidi_text:
-                        cursor_pos = self.cursor[0]
-                        self.text = bidi_text
-                        # حفظ موقعیت cursor (تقریبی)
-                        if cursor_pos <= len(bidi_text):
-                            self.cursor = (cursor_pos, 0)
-                except Exception as e:
-                    Logger.warning(f"HelloSms: Error reshaping all text: {e}")
+            base_dir = base_direction(self._logical_lines)
+            if base_dir != self._paragraph_dir:
+                # جهت پاراگراف عوض شده - همه خطوط دوباره چیده می‌شوند
+                self._paragraph_dir = base_dir
+                self._dirty_lines = set(range(len(self._logical_lines)))
+            for row in self._dirty_lines:
+                self._line_layouts[row] = layout_line(self._logical_lines[row], base_dir)
+            self._dirty_lines.clear()
+            
+            self.text = '\n'.join(layout.display for layout in self._line_layouts)
+            # تاریخچه undo داخلی TextInput استفاده نمی‌شود
+            self.reset_undo()
+            if self._pending_cursor is not None:
+                index = self._logical_to_display(*self._pending_cursor)
+                self.cursor = self.get_cursor_from_index(index)
+        except Exception as e:
+            Logger.warning(f"HelloSms: Error reshaping text: {e}")
         finally:
+            self._pending_cursor = None
+            self._expected_cursor_index = None
             self._is_reshaping = False
     
-    def on_text(self, instance, value):
-        """هنگام تغییر متن - reshape و bidi کردن کل متن"""
-        # بررسی اینکه _is_reshaping وجود دارد (برای جلوگیری از خطا در زمان اولیه)
-        if not hasattr(self, '_is_reshaping'):
-            return
-        
-        if self._is_reshaping:
-            return
-        
-        # اگر متن به صورت دستی تغییر کرد (paste/cut)، متن اصلی را به‌روزرسانی کنیم
-        # این کار پیچیده است، پس فقط reshape می‌کنیم
-        if value and re.search(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]', value):
-            Clock.schedule_once(lambda dt: self._reshape_all_text(), 0.1)
-    
     def get_original_text(self):
         """دریافت متن اصلی (بدون reshape و bidi)"""
-        return self._original_text
+        return '\n'.join(self._logical_lines)
 
 
 class HelloSmsApp(App):
@@ -173,20 +338,46 @@ class HelloSmsApp(App):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.call_monitor = None
-        self.settings = self.load_settings()
+        # مانیتورینگ و ارسال در پروسه سرویس اجرا می‌شوند (service.run_service)
+        self.service_client = IpcClient(default_socket_path())
+        self.service_poll = None
+        self.service_state = None
+        self.settings_pending = False
+        # بررسی وضعیت سرویس در رشته پس‌زمینه در جریان است
+        self.service_polling = False
+        # شماره ترتیبی آخرین رویداد سرویس که در فهرست نمایش داده شده
+        self.activity_seq = 0
+        with profiler.phase('settings'):
+            # self.settings همان dict داخل store است و با بارگذاری مجدد در جا به‌روز می‌شود
+            self.settings_store = SettingsStore(defaults=DEFAULT_SETTINGS)
+            self.settings = self.settings_store.load()
     
     def build(self):
         """ساخت رابط کاربری"""
+        build_started = time.perf_counter()
         # یافتن فونت فارسی
-        persian_font = get_persian_font()
+        with profiler.phase('font discovery'):
+            persian_font = get_persian_font()
+            if persian_font:
+                # فونت پیش‌فرض همه ویجت‌ها - نیازی به تنظیم font_name روی هر ویجت نیست
+                LabelBase.register(DEFAULT_FONT, persian_font)
+        
+        # شکل‌دهی گروهی همه برچسب‌های ثابت صفحه
+        (title_text, switch_text, sms_label_text,
+         save_text, status_text) = shape_many([
+            'HelloSms - ارسال خودکار پیامک',
+            'سرویس فعال:',
+            'متن پیامک:',
+            'ذخیره تنظیمات',
+            'وضعیت: آماده',
+        ])
         
         # لایه اصلی عمودی
         main_layout = BoxLayout(orientation='vertical', padding=20, spacing=15)
         
         # عنوان برنامه
         title = Label(
-            text=self.reshape_persian('HelloSms - ارسال خودکار پیامک'),
+            text=title_text,
             size_hint_y=None,
             height=60,
             font_size='24sp',
@@ -195,22 +386,18 @@ class HelloSmsApp(App):
             valign='middle',
             text_size=(None, None)
         )
-        if persian_font:
-            title.font_name = persian_font
         title.bind(texture_size=title.setter('size'))
         main_layout.add_widget(title)
         
         # سوییچ فعال/غیرفعال
         switch_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=50)
         switch_label = Label(
-            text=self.reshape_persian('سرویس فعال:'),
+            text=switch_text,
             size_hint_x=0.7,
             halign='right',
             valign='middle',
             text_size=(None, None)
         )
-        if persian_font:
-            switch_label.font_name = persian_font
         switch_label.bind(texture_size=switch_label.setter('size'))
         
         self.service_switch = Switch(
@@ -225,15 +412,13 @@ class HelloSmsApp(App):
         
         # برچسب متن پیامک
         sms_label = Label(
-            text=self.reshape_persian('متن پیامک:'),
+            text=sms_label_text,
             size_hint_y=None,
             height=40,
             halign='right',
             valign='middle',
             text_size=(None, None)
         )
-        if persian_font:
-            sms_label.font_name = persian_font
         sms_label.bind(texture_size=sms_label.setter('size'))
         main_layout.add_widget(sms_label)
         
@@ -250,27 +435,37 @@ class HelloSmsApp(App):
             font_size='16sp',
             padding=[10, 10, 10, 10]
         )
-        if persian_font:
-            self.sms_text_input.font_name = persian_font
         self.sms_text_input.bind(minimum_height=self.sms_text_input.setter('height'))
         scroll.add_widget(self.sms_text_input)
         main_layout.add_widget(scroll)
         
+        # تعداد بخش و هزینه پیامک (هنگام تایپ به‌روز می‌شود)
+        self.segment_label = Label(
+            text='',
+            size_hint_y=None,
+            height=30,
+            font_size='14sp',
+            halign='right',
+            valign='middle',
+            text_size=(None, None)
+        )
+        self.sms_text_input.bind(text=self.update_segment_info)
+        self.update_segment_info()
+        main_layout.add_widget(self.segment_label)
+        
         # دکمه ذخیره
         save_button = Button(
-            text=self.reshape_persian('ذخیره تنظیمات'),
+            text=save_text,
             size_hint_y=None,
             height=50,
             font_size='18sp'
         )
-        if persian_font:
-            save_button.font_name = persian_font
         save_button.bind(on_press=self.save_settings)
         main_layout.add_widget(save_button)
         
         # برچسب وضعیت
         self.status_label = Label(
-            text=self.reshape_persian('وضعیت: آماده'),
+            text=status_text,
             size_hint_y=None,
             height=40,
             halign='right',
@@ -278,11 +473,13 @@ class HelloSmsApp(App):
             text_size=(None, None),
             color=(0, 1, 0, 1)
         )
-        if persian_font:
-            self.status_label.font_name = persian_font
         self.status_label.bind(texture_size=self.status_label.setter('size'))
         main_layout.add_widget(self.status_label)
         
+        # رویدادهای اخیر سرویس (تماس‌ها و نتیجه ارسال‌ها)
+        self.activity_feed = ActivityFeed(size_hint_y=0.3)
+        main_layout.add_widget(self.activity_feed)
+        
         # راه‌اندازی مانیتورینگ تماس
         if platform == 'android':
             Clock.schedule_once(self.setup_call_monitor, 1)
@@ -290,40 +487,31 @@ class HelloSmsApp(App):
             self.status_label.text = self.reshape_persian('وضعیت: فقط در اندروید کار می‌کند')
             self.status_label.color = (1, 0.5, 0, 1)
         
+        profiler.record('widget build', build_started)
+        Clock.schedule_once(self.on_first_frame, 0)
         return main_layout
     
+    def on_first_frame(self, dt):
+        """اولین فریم رسم شد - روی اندروید گزارش شروع بعد از راه‌اندازی مانیتورینگ نوشته می‌شود"""
+        profiler.mark('first frame')
+        if platform != 'android':
+            profiler.report()
+        # گرم کردن شکل‌دهی در پس‌زمینه و گلیف‌ها در فریم‌های بعدی برای اولین تعامل
+        prewarm_shaping()
+        prewarm_glyphs([(sp(24), True), (sp(18), False), (sp(16), False), (sp(15), False), (sp(14), False)])
+    
     def reshape_persian(self, text):
-        """تبدیل متن فارسی برای نمایش صحیح - reshape + bidi"""
-        if not text:
-            return text
-        try:
-            # اگر متن فقط انگلیسی یا عدد است، reshape نکن
-            if not re.search(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]', text):
-                return text
-            
-            # reshape کردن متن فارسی
-            reshaped_text = arabic_reshaper.reshape(text)
-            # تبدیل به bidi برای نمایش راست به چپ
-            bidi_text = get_display(reshaped_text)
-            return bidi_text
-        except Exception as e:
-            Logger.warning(f"HelloSms: Error reshaping text: {e}")
-            return text
+        """تبدیل متن فارسی برای نمایش صحیح - reshape + bidi (از کش مشترک)"""
+        return shape(text)
     
-    def load_settings(self):
-        """بارگذاری تنظیمات از فایل JSON"""
-        try:
-            if os.path.exists(SETTINGS_FILE):
-                with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            Logger.error(f"HelloSms: Error loading settings: {e}")
-        
-        # تنظیمات پیش‌فرض
-        return {
-            'sms_enabled': {'value': True},
-            'sms_text': {'value': 'سلام، متأسفانه نتواستم تماس شما را پاسخ دهم. لطفاً در زمان دیگری تماس بگیرید.'}
-        }
+    def update_segment_info(self, *args):
+        """نمایش کدگذاری، تعداد بخش و هزینه متن فعلی پیامک"""
+        segmented = segment_message(self.sms_text_input.get_original_text())
+        info = f'بخش‌ها: {len(segmented.parts)} ({segmented.encoding}، {segmented.units} کاراکتر)'
+        price = self.settings.get('sms_part_price', {}).get('value', 0)
+        if price:
+            info += f' - هزینه: {len(segmented.parts) * price}'
+        self.segment_label.text = self.reshape_persian(info)
     
     def save_settings(self, instance):
         """ذخیره تنظیمات در فایل JSON"""
@@ -334,17 +522,28 @@ class HelloSmsApp(App):
                 text_value = self.sms_text_input.get_original_text()
             else:
                 text_value = self.sms_text_input.text
+            # اعتبارسنجی و کامپایل قالب قبل از ذخیره
+            try:
+                sms_template = compile_template(text_value)
+            except TemplateError as e:
+                self.status_label.text = self.reshape_persian(f'وضعیت: خطا در قالب پیامک - {e}')
+                self.status_label.color = (1, 0, 0, 1)
+                return
             self.settings['sms_text'] = {'value': text_value}
+            # تقسیم پیامک یک بار برای هر نسخه متن ثابت؛ ارسال‌ها از کش استفاده می‌کنند
+            if not sms_template.variables:
+                segment_message(text_value)
             
-            with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, ensure_ascii=False, indent=4)
+            # نوشتن اتمیک (فایل موقت + rename)
+            if not self.settings_store.save():
+                raise OSError("settings file could not be written")
             
             self.status_label.text = self.reshape_persian('وضعیت: تنظیمات ذخیره شد')
             self.status_label.color = (0, 1, 0, 1)
             
             Logger.info("HelloSms: Settings saved")
             
-            # به‌روزرسانی مانیتورینگ
+            # راه‌اندازی سرویس و ارسال تنظیمات جدید به آن
             if platform == 'android':
                 self.setup_call_monitor()
         
@@ -355,23 +554,26 @@ class HelloSmsApp(App):
     
     def on_switch_active(self, instance, value):
         """هنگام تغییر وضعیت سوییچ"""
-        self.settings['sms_enabled'] = {'value': value}
+        # نوشتن با تاخیر تا تغییرات سریع پشت سر هم یک بار نوشته شوند
+        self.settings_store.set('sms_enabled', value)
         if platform == 'android':
             self.setup_call_monitor()
     
     def setup_call_monitor(self, dt=None):
-        """راه‌اندازی مانیتورینگ تماس"""
+        """راه‌اندازی مانیتورینگ تماس (اولین اجرا آخرین مرحله پروفایل شروع است)"""
+        with profiler.phase('monitor setup'):
+            self._setup_call_monitor()
+        profiler.report()
+    
+    def _setup_call_monitor(self):
         try:
             if platform != 'android':
                 return
             
             # بررسی اینکه سرویس فعال است یا نه
             if not self.settings.get('sms_enabled', {}).get('value', True):
-                if self.call_monitor:
-                    # غیرفعال کردن مانیتورینگ
-                    self.call_monitor = None
-                    self.status_label.text = self.reshape_persian('وضعیت: سرویس غیرفعال')
-                    self.status_label.color = (1, 0.5, 0, 1)
+                # توقف سرویس (و اعلان foreground آن) وقتی پاسخ خودکار غیرفعال است
+                self.stop_monitor_service()
                 return
             
             # بررسی اینکه متن پیامک خالی نباشد
@@ -381,58 +583,122 @@ class HelloSmsApp(App):
                 self.status_label.color = (1, 0, 0, 1)
                 return
             
-            # راه‌اندازی مانیتورینگ
-            if not self.call_monitor:
-                self.call_monitor = AndroidCallMonitor(self.on_missed_call)
-                self.status_label.text = self.reshape_persian('وضعیت: سرویس فعال و آماده')
-                self.status_label.color = (0, 1, 0, 1)
-                Logger.info("HelloSms: Call monitor started")
+            # شروع سرویس اثری ندارد اگر در حال اجرا باشد
+            start_monitor_service()
+            if not self.service_poll:
+                self.service_poll = Clock.schedule_interval(self.poll_service_status, SERVICE_POLL_INTERVAL)
+                Logger.info("HelloSms: Monitor service started")
+            self.push_settings()
         
         except Exception as e:
             Logger.error(f"HelloSms: Error setting up call monitor: {e}")
             self.status_label.text = self.reshape_persian(f'وضعیت: خطا - {str(e)}')
             self.status_label.color = (1, 0, 0, 1)
     
-    def on_missed_call(self, phone_number):
-        """هنگام رد یا از دست رفتن تماس"""
+    def stop_monitor_service(self):
+        """توقف سرویس مانیتورینگ از طریق IPC"""
+        if self.service_poll:
+            self.service_poll.cancel()
+            self.service_poll = None
         try:
-            # بررسی اینکه سرویس فعال است
-            if not self.settings.get('sms_enabled', {}).get('value', True):
-                return
-            
-            # دریافت متن پیامک
-            sms_text = self.settings.get('sms_text', {}).get('value', '')
-            if not sms_text.strip():
-                Logger.warning("HelloSms: SMS text is empty")
-                return
-            
-            # ارسال پیامک
-            if phone_number:
-                success = send_sms(phone_number, sms_text)
-                if success:
-                    Logger.info(f"HelloSms: SMS sent to {phone_number}")
-                    # به‌روزرسانی وضعیت در UI
-                    Clock.schedule_once(
-                        lambda dt: setattr(
-                            self.status_label, 
-                            'text', 
-                            self.reshape_persian(f'وضعیت: پیامک ارسال شد به {phone_number}')
-                        ), 
-                        0
-                    )
-                else:
-                    Logger.error(f"HelloSms: Failed to send SMS to {phone_number}")
-                    Clock.schedule_once(
-                        lambda dt: setattr(
-                            self.status_label, 
-                            'text', 
-                            self.reshape_persian('وضعیت: خطا در ارسال پیامک')
-                        ), 
-                        0
-                    )
-        
-        except Exception as e:
-            Logger.error(f"HelloSms: Error in on_missed_call: {e}")
+            self.service_client.request('stop')
+        except IpcError:
+            # سرویس در حال اجرا نیست
+            pass
+        self.service_client.close()
+        self.show_service_state('stopped')
+    
+    def push_settings(self):
+        """ارسال تنظیمات به سرویس؛ اگر سرویس هنوز آماده نیست در بررسی وضعیت بعدی"""
+        self.settings_pending = True
+        self.poll_service_status()
+    
+    def poll_service_status(self, dt=None):
+        """
+        خواندن وضعیت سرویس و رویدادهای جدید آن در یک رشته پس‌زمینه
+
+        درخواست‌های IPC (با مهلت و تلاش مجدد) رشته اصلی را نگه نمی‌دارند و
+        نتیجه با Clock در رشته اصلی نمایش داده می‌شود. تا پایان بررسی قبلی
+        بررسی جدیدی شروع نمی‌شود.
+        """
+        if self.service_polling:
+            return
+        self.service_polling = True
+        settings = dict(self.settings) if self.settings_pending else None
+        self.settings_pending = False
+        threading.Thread(target=self._poll_service, args=(settings, self.activity_seq),
+                         name='HelloSmsPoll', daemon=True).start()
+    
+    def _poll_service(self, settings, activity_seq):
+        """درخواست‌های بررسی وضعیت (در رشته پس‌زمینه)"""
+        state = 'ready'
+        events = []
+        try:
+            if settings is not None:
+                self.service_client.request('settings', settings=settings)
+                settings = None
+            status = self.service_client.request('status')
+            seq = status.get('activity_seq', 0)
+            if seq < activity_seq:
+                # سرویس دوباره اجرا شده و شماره‌گذاری رویدادها از اول است
+                activity_seq = 0
+            if seq != activity_seq:
+                events = self.service_client.request('activity', since=activity_seq)['events']
+        except IpcError as e:
+            Logger.debug(f"HelloSms: Monitor service not reachable: {e}")
+            state = 'waiting'
+        Clock.schedule_once(lambda dt: self._show_service_status(state, activity_seq, events, settings), 0)
+    
+    def _show_service_status(self, state, activity_seq, events, unsent_settings):
+        """نمایش نتیجه بررسی وضعیت در رشته اصلی"""
+        self.service_polling = False
+        if unsent_settings is not None:
+            # سرویس هنوز آماده نیست؛ تنظیمات در بررسی بعدی ارسال می‌شوند
+            self.settings_pending = True
+        if not self.service_poll:
+            # سرویس در این فاصله متوقف شده است
+            return
+        self.show_service_state(state)
+        if state == 'ready':
+            self.activity_seq = activity_seq
+            if events:
+                self.activity_seq = events[-1][0]
+                self.activity_feed.add_entries(events)
+            if self.settings_pending:
+                # تنظیماتی که در حین این بررسی ذخیره شدند
+                self.poll_service_status()
+    
+    def show_service_state(self, state):
+        """نمایش حالت سرویس فقط در صورت تغییر (پیام ذخیره تنظیمات پاک نمی‌شود)"""
+        if state == self.service_state:
+            return
+        self.service_state = state
+        text, color = SERVICE_STATES[state]
+        self.status_label.text = self.reshape_persian(text)
+        self.status_label.color = color
+    
+    def on_pause(self):
+        """رفتن به پس‌زمینه - سرویس مستقل از رابط کاربری به کار ادامه می‌دهد"""
+        self.settings_store.flush()
+        self.write_metrics()
+        return True
+    
+    def on_resume(self):
+        if self.service_poll:
+            self.poll_service_status()
+    
+    def on_stop(self):
+        """هنگام بسته شدن برنامه (سرویس مانیتورینگ متوقف نمی‌شود)"""
+        self.settings_store.flush()
+        self.write_metrics()
+        self.service_client.close()
+    
+    def write_metrics(self):
+        """ذخیره متریک‌های پروسه رابط کاربری (شکل‌دهی متن و تنظیمات)"""
+        try:
+            metrics.write(UI_METRICS_FILE)
+        except OSError as e:
+            Logger.error(f"HelloSms: Error writing metrics: {e}")
 
 
 if __name__ == '__main__':
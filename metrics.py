@@ -0,0 +1,270 @@
+"""
+شمارنده‌ها، گیج‌ها و هیستوگرام‌های تاخیر برای مسیرهای پرتکرار برنامه
+
+ثبت هر رویداد بدون قفل و فقط چند عمل حسابی روی سلول همان رشته است. مقدارهایی
+که از قبل در جای دیگری شمرده می‌شوند (مثل آمار کش شکل‌دهی) با gauge_func
+فقط هنگام گرفتن snapshot خوانده می‌شوند و هزینه‌ای در مسیر اصلی ندارند.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# فایل خروجی snapshot سرویس و رابط کاربری (هر پروسه متریک‌های خودش را دارد)
+METRICS_FILE = 'hellosms_metrics.json'
+UI_METRICS_FILE = 'hellosms_metrics_ui.json'
+
+# مرز بالای سطل‌های هیستوگرام تاخیر (ثانیه) - از ۱۰ میکروثانیه تا ۳۰ ثانیه
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class _PerThreadMetric:
+    """
+    پایه متریک‌هایی که هر رشته در سلول خودش می‌نویسد
+
+    هر سلول فقط یک نویسنده (رشته مالک) دارد، پس به‌روزرسانی آن بدون قفل و
+    بدون از دست رفتن مقدار است؛ snapshot سلول‌ها را جمع می‌زند و سلول
+    رشته‌های تمام شده را در یک سلول بازنشسته ادغام می‌کند.
+    """
+
+    __slots__ = ('_local', '_cells', '_retired', '_lock')
+
+    def __init__(self):
+        self._local = threading.local()
+        # (رشته، سلول)
+        self._cells = []
+        self._retired = self._make_cell()
+        self._lock = threading.Lock()
+
+    def _make_cell(self):
+        raise NotImplementedError
+
+    def _merge(self, into, cell):
+        raise NotImplementedError
+
+    def _new_cell(self):
+        """سلول رشته جاری (اولین استفاده هر رشته)"""
+        cell = self._make_cell()
+        with self._lock:
+            self._cells.append((threading.current_thread(), cell))
+        self._local.cell = cell
+        return cell
+
+    def _collect(self):
+        """سلول بازنشسته و سلول رشته‌های زنده (سلول رشته‌های تمام شده ادغام می‌شود)"""
+        with self._lock:
+            live = []
+            for thread, cell in self._cells:
+                if thread.is_alive():
+                    live.append((thread, cell))
+                else:
+                    self._merge(self._retired, cell)
+            self._cells = live
+            return [self._retired] + [cell for _, cell in live]
+
+
+class Counter(_PerThreadMetric):
+    """شمارنده افزایشی"""
+
+    __slots__ = ()
+
+    def _make_cell(self):
+        return [0]
+
+    def _merge(self, into, cell):
+        into[0] += cell[0]
+
+    def inc(self, amount=1):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._new_cell()[0] += amount
+
+    @property
+    def value(self):
+        return sum(cell[0] for cell in self._collect())
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """مقدار لحظه‌ای (مثلاً عمق صف)"""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram(_PerThreadMetric):
+    """
+    هیستوگرام با سطل‌های ثابت
+
+    صدک‌ها از روی سطل‌ها تخمین زده می‌شوند (مرز بالای سطلی که صدک در آن
+    است)، پس دقت آن‌ها به اندازه فاصله سطل‌هاست. snapshot همزمان با observe
+    ممکن است یک مشاهده در حال ثبت را فقط در بخشی از مقادیر ببیند.
+    """
+
+    __slots__ = ('buckets',)
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__()
+
+    def _make_cell(self):
+        # [تعداد هر سطل (سطل آخر برای مقدارهای بزرگ‌تر از آخرین مرز)، تعداد، مجموع، بیشینه]
+        return [[0] * (len(self.buckets) + 1), 0, 0.0, 0.0]
+
+    def _merge(self, into, cell):
+        counts = into[0]
+        for index, bucket_count in enumerate(cell[0]):
+            counts[index] += bucket_count
+        into[1] += cell[1]
+        into[2] += cell[2]
+        into[3] = max(into[3], cell[3])
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[0][index] += 1
+        cell[1] += 1
+        cell[2] += value
+        if value > cell[3]:
+            cell[3] = value
+
+    def observe_since(self, started):
+        """ثبت زمان سپری شده از started (مقدار perf_counter)"""
+        self.observe(time.perf_counter() - started)
+
+    def percentile(self, fraction):
+        counts, count, _, maximum = self._totals()
+        return self._percentile(counts, count, maximum, fraction)
+
+    def _totals(self):
+        """(تعداد هر سطل، تعداد، مجموع، بیشینه) از همه سلول‌ها"""
+        totals = self._make_cell()
+        for cell in self._collect():
+            self._merge(totals, cell)
+        return totals
+
+    def _percentile(self, counts, count, maximum, fraction):
+        if not count:
+            return 0.0
+        rank = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                if index < len(self.buckets):
+                    return min(self.buckets[index], maximum)
+                return maximum
+        return maximum
+
+    def snapshot(self):
+        counts, count, total, maximum = self._totals()
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'avg': round(total / count, 6) if count else 0.0,
+            'max': round(maximum, 6),
+            'p50': round(self._percentile(counts, count, maximum, 0.50), 6),
+            'p90': round(self._percentile(counts, count, maximum, 0.90), 6),
+            'p99': round(self._percentile(counts, count, maximum, 0.99), 6),
+            # [مرز بالا، تعداد] فقط برای سطل‌های غیرخالی؛ None یعنی بیشتر از آخرین مرز
+            'buckets': [[self.buckets[index] if index < len(self.buckets) else None, bucket_count]
+                        for index, bucket_count in enumerate(counts) if bucket_count],
+        }
+
+
+class MetricsRegistry:
+    """
+    مجموعه متریک‌های یک پروسه با نام
+
+    counter/gauge/histogram با همان نام همان شیء را برمی‌گردانند، پس ماژول‌ها
+    می‌توانند متریک را یک بار در سطح ماژول بگیرند و در مسیر اصلی فقط inc یا
+    observe فراخوانی کنند.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._metrics = {}
+        self._funcs = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def gauge(self, name):
+        return self._get(name, Gauge)
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS):
+        return self._get(name, lambda: Histogram(buckets))
+
+    def gauge_func(self, name, func):
+        """مقدار name هنگام snapshot از func() خوانده می‌شود"""
+        with self._lock:
+            self._funcs[name] = func
+
+    def snapshot(self):
+        """همه متریک‌ها به صورت dict قابل تبدیل به JSON"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            funcs = dict(self._funcs)
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for name, metric in sorted(metrics.items()):
+            if isinstance(metric, Counter):
+                counters[name] = metric.snapshot()
+            elif isinstance(metric, Gauge):
+                gauges[name] = metric.snapshot()
+            else:
+                histograms[name] = metric.snapshot()
+        for name, func in sorted(funcs.items()):
+            try:
+                gauges[name] = func()
+            except Exception as e:
+                gauges[name] = f'error: {e}'
+        return {
+            'ts': round(time.time(), 3),
+            'uptime': round(time.time() - self.started, 1),
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms,
+        }
+
+    def write(self, path=METRICS_FILE):
+        """نوشتن snapshot در فایل JSON (اتمیک)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def _get(self, name, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = factory()
+        return metric
+
+
+# متریک‌های همین پروسه
+metrics = MetricsRegistry()
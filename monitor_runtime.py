@@ -0,0 +1,449 @@
+"""
+اجرای مانیتورینگ تماس، صف و ارسال پیامک بدون رابط کاربری
+
+این کلاس در پروسه سرویس پس‌زمینه (service.run_service) ساخته می‌شود و به
+Kivy App وابسته نیست؛ رابط کاربری از طریق ipc با آن ارتباط دارد.
+"""
+
+import threading
+import time
+
+from kivy.logger import Logger
+from kivy.utils import platform
+
+from service import (AndroidCallMonitor, AndroidContactsProvider, AndroidSmsTransport, SmsStatusReceiver,
+                     SubscriptionRegistry, create_sms_intent)
+from sms_queue import SmsQueue
+from sms_delivery import DeliveryTracker
+from sms_transport import HttpGatewayTransport, FailoverTransport
+from send_scheduler import SendRateLimiter, PRIORITY_HIGH, PRIORITY_NORMAL
+from cooldown import CooldownCache, DEFAULT_COOLDOWN_SECONDS
+from sms_segment import segment_message
+from phone_numbers import normalize_number, get_default_country, set_default_country, DEFAULT_COUNTRY_CODE
+from rules import RuleSet, ACTION_BLOCK, ACTION_ALLOW
+from sms_template import compile_template, literal_template, time_of_day, TemplateError
+from settings_store import SettingsStore, DEFAULT_SETTINGS
+from history_store import (HistoryStore, EVENT_MISSED_CALL, EVENT_SMS_SENT, EVENT_SMS_FAILED,
+                           DEFAULT_RETENTION_DAYS)
+from metrics import metrics
+from activity_log import ActivityLog
+from reply_scheduler import TimerQueue, QuietHours
+from contacts import ContactsIndex, CONTACTS_POLICY_ALL, CONTACTS_POLICY_CONTACTS, CONTACTS_POLICY_UNKNOWN
+
+_sms_success = metrics.counter('sms.result.success')
+_sms_failure = metrics.counter('sms.result.failure')
+_replies_cancelled = metrics.counter('reply.cancelled_by_callback')
+
+
+class MonitorRuntime:
+    """
+    مانیتورینگ تماس و ارسال پاسخ پیامکی
+
+    تنظیمات از فایل مشترک با رابط کاربری خوانده می‌شوند؛ این پروسه فایل را
+    نمی‌نویسد و تنظیمات جدید را با update_settings (از طریق IPC) یا با تغییر
+    فایل دریافت می‌کند. تغییر فایل در اولین تماس بعدی فقط با یک stat تشخیص
+    داده و بارگذاری آن در یک رشته پس‌زمینه انجام می‌شود.
+    """
+
+    def __init__(self, settings_store=None, subscriptions=None, intent_factory=create_sms_intent, history=None,
+                 contacts=None):
+        """
+        Args:
+            settings_store: SettingsStore (پیش‌فرض: فایل تنظیمات برنامه)
+            subscriptions: SubscriptionRegistry (روی لینوکس با کلاس‌های جعلی fake_android)
+            intent_factory: سازنده PendingIntent گزارش ارسال/تحویل
+            history: HistoryStore (پیش‌فرض: فایل تاریخچه برنامه)
+            contacts: ContactsIndex (پیش‌فرض: مخاطبین اندروید؛ روی لینوکس با FakeContactsProvider)
+        """
+        self.settings_store = settings_store or SettingsStore(defaults=DEFAULT_SETTINGS)
+        self.settings = self.settings_store.load()
+        self.history = history or HistoryStore()
+        # رویدادهای اخیر برای فهرست رابط کاربری
+        self.activity = ActivityLog()
+        self.subscriptions = subscriptions
+        self.contacts = contacts
+        self.contacts_policy = CONTACTS_POLICY_ALL
+        self.call_monitor = None
+        self.sms_status_receiver = None
+        self.sms_transport = None
+        # محدودکننده نرخ و بک‌اند SmsManager با تغییر تنظیمات عوض نمی‌شوند (فقط پیکربندی آن‌ها)
+        self.rate_limiter = None
+        self.android_transport = None
+        self.gateway = None
+        self._transport_settings = None
+        # نتیجه نهایی ارسال از گزارش‌های ارسال/تحویل (با ارسال مجدد خودکار) می‌آید و
+        # رکورد done ژورنال صف تا آن زمان نوشته نمی‌شود
+        self.delivery_tracker = DeliveryTracker(None, intent_factory=intent_factory, on_result=self.on_sms_result)
+        self.sms_queue = SmsQueue(self.delivery_tracker.send, deferred=True)
+        # پاسخ‌های عقب افتاده (ارسال با تاخیر یا بعد از ساعات سکوت)
+        self.reply_timers = TimerQueue(self.on_reply_due)
+        self.quiet_hours = QuietHours()
+        self.reply_delay = 0.0
+        self.cooldown = CooldownCache(ttl=self.get_cooldown_seconds())
+        self.cooldown.load()
+        self.rules = RuleSet.from_settings(self.settings)
+        self.sms_template = None
+        self.started_at = None
+        self.sent_count = 0
+        self.failed_count = 0
+        self.last_result = None
+        self._lock = threading.Lock()
+        # apply_settings از رشته IPC و رشته بارگذاری مجدد فراخوانی می‌شود
+        self._settings_lock = threading.RLock()
+        self._reloading = False
+        # شمارش تماس‌های از دست رفته امروز برای متغیر call_count
+        self.missed_counts_day = None
+        self.missed_counts = {}
+        self.apply_settings()
+
+    def start(self):
+        """راه‌اندازی صف، گزارش‌ها و مانیتورینگ تماس (پیامک‌های معوق ژورنال دوباره ارسال می‌شوند)"""
+        if self.started_at is not None:
+            return
+        self.started_at = time.time()
+        self.history.start()
+        if self.subscriptions is None:
+            # سیم‌کارت‌های فعال و SmsManager هر کدام تا تغییر سیم‌کارت کش می‌شوند
+            self.subscriptions = SubscriptionRegistry()
+        self.subscriptions.start()
+        if self.contacts is None:
+            # ایندکس از snapshot بارگذاری و در پس‌زمینه با مخاطبین همگام می‌شود
+            self.contacts = ContactsIndex(AndroidContactsProvider())
+        self.contacts.start()
+        self.configure_transport()
+        self.delivery_tracker.start()
+        self.sms_status_receiver = SmsStatusReceiver(self.delivery_tracker)
+        self.sms_status_receiver.start()
+        self.sms_queue.start()
+        self.reply_timers.start()
+        self.call_monitor = AndroidCallMonitor(self.on_missed_call, self.subscriptions,
+                                               outgoing_callback=self.on_outgoing_call,
+                                               scheduler=self.delivery_tracker.scheduler)
+        # آمار اجزا فقط هنگام snapshot خوانده می‌شود
+        metrics.gauge_func('sms.queue', self.sms_queue.stats)
+        metrics.gauge_func('sms.in_flight', lambda: len(self.delivery_tracker.in_flight()))
+        metrics.gauge_func('cooldown', self.cooldown.stats)
+        metrics.gauge_func('history', self.history.stats)
+        metrics.gauge_func('reply.timers', self.reply_timers.stats)
+        metrics.gauge_func('contacts', self.contacts.stats)
+        # بک‌اند ارسال با تغییر تنظیمات درگاه دوباره ساخته می‌شود
+        metrics.gauge_func('sms.transport', lambda: self.sms_transport.stats() if self.sms_transport else None)
+        Logger.info("HelloSms: Monitor runtime started")
+
+    def stop(self):
+        """توقف همه اجزا؛ پیامک‌های ارسال نشده در ژورنال می‌مانند"""
+        if self.started_at is None:
+            return
+        if self.call_monitor:
+            self.call_monitor.stop()
+        self.reply_timers.stop()
+        self.sms_queue.stop()
+        self.sms_status_receiver.stop()
+        self.delivery_tracker.stop()
+        if self.sms_transport:
+            self.sms_transport.stop()
+        # start بعدی بک‌اندها را دوباره راه‌اندازی می‌کند
+        self._transport_settings = None
+        self.subscriptions.stop()
+        self.contacts.stop()
+        self.history.stop()
+        self.cooldown.save()
+        self.started_at = None
+        Logger.info(f"HelloSms: Cooldown cache stats: {self.cooldown.stats()}")
+        Logger.info(f"HelloSms: SMS queue stats: {self.sms_queue.stats()}")
+        Logger.info(f"HelloSms: Reply timer stats: {self.reply_timers.stats()}")
+        if self.sms_transport:
+            Logger.info(f"HelloSms: SMS transport stats: {self.sms_transport.stats()}")
+
+    def compile_sms_text(self, text):
+        """کامپایل متن پیامک ذخیره شده؛ متن نامعتبر بدون جایگذاری ارسال می‌شود"""
+        try:
+            return compile_template(text)
+        except TemplateError as e:
+            Logger.error(f"HelloSms: Invalid SMS template, sending it verbatim: {e}")
+            return literal_template(text)
+
+    def template_values(self, phone_number, contact=None):
+        """مقادیر متغیرهای قالب برای یک تماس از دست رفته (contact از ایندکس مخاطبین)"""
+        now = time.localtime()
+        today = (now.tm_year, now.tm_yday)
+        if today != self.missed_counts_day:
+            self.missed_counts_day = today
+            self.missed_counts = {}
+        count = self.missed_counts.get(phone_number, 0) + 1
+        self.missed_counts[phone_number] = count
+        return {
+            'name': contact.name if contact else '',
+            'number': phone_number,
+            'time_of_day': time_of_day(now.tm_hour),
+            'call_count': count,
+            'callback_window': self.settings.get('callback_window', {}).get('value', ''),
+        }
+
+    def get_cooldown_seconds(self):
+        """بازه عدم ارسال مجدد به یک شماره (ثانیه) از تنظیمات"""
+        minutes = self.settings.get('reply_cooldown_minutes', {}).get('value')
+        if minutes is None:
+            return DEFAULT_COOLDOWN_SECONDS
+        return float(minutes) * 60
+
+    def apply_settings(self):
+        """به‌روزرسانی اجزای وابسته به تنظیمات (بعد از دریافت یا بارگذاری مجدد)"""
+        with self._settings_lock:
+            self._apply_settings()
+
+    def _apply_settings(self):
+        country = get_default_country()
+        set_default_country(self.settings.get('default_country', {}).get('value', DEFAULT_COUNTRY_CODE))
+        if self.contacts and get_default_country() != country:
+            # شماره‌های ایندکس با کد کشور قبلی یکسان شده‌اند
+            self.contacts.resync()
+        self.contacts_policy = self.settings.get('reply_contacts_policy', {}).get('value', CONTACTS_POLICY_ALL)
+        sms_text = self.settings.get('sms_text', {}).get('value', '')
+        self.sms_template = self.compile_sms_text(sms_text)
+        # تقسیم پیامک یک بار برای هر نسخه متن ثابت؛ ارسال‌ها از کش استفاده می‌کنند
+        if not self.sms_template.variables:
+            segment_message(sms_text)
+        self.cooldown.ttl = self.get_cooldown_seconds()
+        self.rules = RuleSet.from_settings(self.settings)
+        self.history.retention_days = float(
+            self.settings.get('history_retention_days', {}).get('value', DEFAULT_RETENTION_DAYS))
+        self.quiet_hours = QuietHours.from_settings(self.settings)
+        self.reply_delay = float(self.settings.get('reply_delay_minutes', {}).get('value', 0)) * 60
+        if self.sms_transport:
+            self.configure_transport()
+
+    def update_settings(self, settings):
+        """تنظیمات ارسال شده از رابط کاربری (IPC)"""
+        self.settings_store.update(settings)
+        self.apply_settings()
+        Logger.info("HelloSms: Settings received from UI")
+
+    def reload_settings_in_background(self):
+        """بارگذاری مجدد فایل تنظیمات تغییر یافته خارج از رشته تماس (حداکثر یک رشته همزمان)"""
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload_settings, name='HelloSmsSettings', daemon=True).start()
+
+    def _reload_settings(self):
+        try:
+            if self.settings_store.reload_if_changed():
+                self.apply_settings()
+        except Exception as e:
+            Logger.error(f"HelloSms: Error reloading settings: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _settings_with_prefix(self, *prefixes):
+        return {key: value.get('value') for key, value in self.settings.items() if key.startswith(prefixes)}
+
+    def configure_transport(self):
+        """
+        پیکربندی بک‌اندهای ارسال از تنظیمات و اتصال آن‌ها به DeliveryTracker و صف
+
+        فقط وقتی تنظیمات rate_*، sim_rate_* یا gateway_* تغییر کرده باشند
+        کاری انجام می‌شود. محدودکننده‌ها در جا پیکربندی می‌شوند تا سهمیه
+        مصرف شده حفظ شود و درگاه فقط با تغییر تنظیمات خودش دوباره ساخته می‌شود.
+        """
+        with self._settings_lock:
+            rates = self._settings_with_prefix('rate_', 'sim_rate_')
+            gateway_settings = self._settings_with_prefix('gateway_')
+            previous = self._transport_settings
+            if previous == (rates, gateway_settings):
+                return
+            self._transport_settings = (rates, gateway_settings)
+
+            # سهمیه جداگانه هر سیم‌کارت فقط در صورت تنظیم sim_rate_*
+            line_limiter_factory = None
+            if 'sim_rate_messages_per_minute' in self.settings:
+                line_limiter_factory = lambda: SendRateLimiter.from_settings(self.settings, prefix='sim_')
+            if self.rate_limiter is None:
+                self.rate_limiter = SendRateLimiter.from_settings(self.settings)
+                self.android_transport = AndroidSmsTransport(subscriptions=self.subscriptions)
+            elif previous is None or previous[0] != rates:
+                self.rate_limiter.configure_from_settings(self.settings)
+                for line_limiter in list(self.android_transport.line_limiters.values()):
+                    line_limiter.configure_from_settings(self.settings, prefix='sim_')
+            android = self.android_transport
+            android.line_limiter_factory = line_limiter_factory
+            if line_limiter_factory is None:
+                android.line_limiters.clear()
+            if previous is not None and previous[1] == gateway_settings:
+                return
+
+            try:
+                gateway = HttpGatewayTransport.from_settings(self.settings)
+            except ValueError as e:
+                Logger.error(f"HelloSms: Ignoring SMS gateway settings: {e}")
+                gateway = None
+            if gateway:
+                # با درگاه پشتیبان، صف منتظر سهمیه سیم‌کارت نمی‌ماند و پیامک‌های
+                # بیش از سهمیه از درگاه ارسال می‌شوند
+                android.limiter = self.rate_limiter
+                transport = FailoverTransport([android, gateway])
+                self.sms_queue.limiter = None
+                self.delivery_tracker.limiter = None
+            else:
+                # یک بک‌اند بدون FailoverTransport: خطای یک پیامک نباید ارسال‌های بعدی را متوقف کند
+                android.limiter = None
+                transport = android
+                # صف و ارسال‌های مجدد DeliveryTracker از یک سهمیه می‌گیرند
+                self.sms_queue.limiter = self.rate_limiter
+                self.delivery_tracker.limiter = self.rate_limiter
+
+            transport.start()
+            old_gateway, self.gateway = self.gateway, gateway
+            self.sms_transport = transport
+            self.delivery_tracker.send_func = transport.send
+            if old_gateway:
+                old_gateway.stop()
+
+    def on_missed_call(self, phone_number, subscription_id=None):
+        """هنگام رد یا از دست رفتن تماس (subscription_id سیم‌کارت دریافت‌کننده تماس)"""
+        # ثبت در صف حافظه تاریخچه؛ نوشتن در رشته تاریخچه انجام می‌شود
+        self.history.record(EVENT_MISSED_CALL, phone_number, subscription_id)
+        self.activity.add(EVENT_MISSED_CALL, phone_number, subscription_id)
+        try:
+            # تغییر فایل تنظیمات توسط پروسه دیگر فقط با یک stat بررسی و در پس‌زمینه بارگذاری می‌شود
+            if self.settings_store.changed():
+                self.reload_settings_in_background()
+
+            # بررسی اینکه سرویس فعال است
+            if not self.settings.get('sms_enabled', {}).get('value', True):
+                return
+
+            # دریافت متن پیامک
+            sms_text = self.settings.get('sms_text', {}).get('value', '')
+            if not sms_text.strip():
+                Logger.warning("HelloSms: SMS text is empty")
+                return
+
+            # فقط صف کردن پیامک - ارسال در رشته صف انجام می‌شود
+            if phone_number:
+                template = self.sms_template
+                priority = PRIORITY_NORMAL
+                # قوانین لیست مسدود/مجاز و قالب اختصاصی شماره
+                rule = self.rules.match(phone_number)
+                if rule:
+                    if rule.action == ACTION_BLOCK:
+                        Logger.info(f"HelloSms: Skipping SMS to {phone_number} (rule {rule.pattern})")
+                        return
+                    if rule.action == ACTION_ALLOW:
+                        # شماره‌های لیست مجاز در صف ارسال جلو می‌افتند
+                        priority = PRIORITY_HIGH
+                    if rule.compiled:
+                        template = rule.compiled
+
+                # فقط جستجو در ایندکس حافظه؛ شماره ناشناس همگام‌سازی پس‌زمینه را درخواست می‌کند
+                contact = self.contacts.lookup(phone_number) if self.contacts else None
+                if contact is None and self.contacts:
+                    self.contacts.request_sync()
+                # شماره‌های لیست مجاز از سیاست مخاطبین مستثنا هستند
+                if not (rule and rule.action == ACTION_ALLOW):
+                    if self.contacts_policy == CONTACTS_POLICY_CONTACTS and contact is None:
+                        Logger.info(f"HelloSms: Skipping SMS to {phone_number} (not in contacts)")
+                        return
+                    if self.contacts_policy == CONTACTS_POLICY_UNKNOWN and contact is not None:
+                        Logger.info(f"HelloSms: Skipping SMS to {phone_number} (saved contact)")
+                        return
+
+                values = self.template_values(phone_number, contact)
+
+                # جلوگیری از ارسال تکراری به تماس‌گیرنده‌ای که دوباره تماس گرفته
+                if not self.cooldown.should_send(phone_number):
+                    Logger.info(f"HelloSms: Skipping SMS to {phone_number} (cooldown)")
+                    return
+                self.schedule_reply(phone_number, template.render(values), priority, subscription_id)
+
+        except Exception as e:
+            Logger.error(f"HelloSms: Error in on_missed_call: {e}")
+
+    def schedule_reply(self, phone_number, message, priority=PRIORITY_NORMAL, subscription_id=None):
+        """ورود پاسخ به صف ارسال، یا زمان‌بندی آن بعد از reply_delay و خارج از ساعات سکوت"""
+        now = time.time()
+        send_at = self.quiet_hours.release_time(now + self.reply_delay)
+        if send_at <= now:
+            self.sms_queue.enqueue(phone_number, message, priority, subscription_id)
+            return
+        self.reply_timers.schedule(phone_number, send_at, {'text': message, 'pri': priority, 'sub': subscription_id})
+        Logger.info(f"HelloSms: Reply to {phone_number} scheduled in {send_at - now:.0f}s")
+
+    def on_reply_due(self, phone_number, payload):
+        """رسیدن زمان پاسخ زمان‌بندی شده (رشته تایمرها)"""
+        # ساعات سکوت ممکن است بعد از زمان‌بندی تغییر کرده یا دستگاه خاموش بوده باشد
+        now = time.time()
+        send_at = self.quiet_hours.release_time(now)
+        if send_at > now:
+            self.reply_timers.schedule(phone_number, send_at, payload)
+            return
+        self.sms_queue.enqueue(phone_number, payload['text'], payload.get('pri', PRIORITY_NORMAL), payload.get('sub'))
+
+    def on_outgoing_call(self, phone_number, subscription_id=None):
+        """تماس خروجی - تماس با شماره‌ای که پاسخش در انتظار است پاسخ را لغو می‌کند"""
+        if not self.settings.get('cancel_on_callback', {}).get('value', True):
+            return
+        phone_number = normalize_number(phone_number)
+        if not phone_number or self.reply_timers.cancel(phone_number) is None:
+            return
+        # پاسخی ارسال نشد، پس تماس بعدی این شماره دوباره پاسخ می‌گیرد
+        self.cooldown.forget(phone_number)
+        _replies_cancelled.inc()
+        Logger.info(f"HelloSms: Cancelled pending reply to {phone_number} (called back)")
+
+    def on_sms_result(self, phone_number, message, success):
+        """نتیجه نهایی ارسال پیامک (فراخوانی از رشته گزارش‌ها یا ارسال مجدد)"""
+        if not success:
+            # ارسال ناموفق نباید جلوی تلاش بعدی را بگیرد
+            self.cooldown.forget(phone_number)
+        # نوشتن کل فایل کش برای هر نتیجه گران است؛ stop باقی‌مانده را ذخیره می‌کند
+        self.cooldown.schedule_save()
+        kind = EVENT_SMS_SENT if success else EVENT_SMS_FAILED
+        self.history.record(kind, phone_number)
+        self.activity.add(kind, phone_number)
+
+        (_sms_success if success else _sms_failure).inc()
+        with self._lock:
+            if success:
+                self.sent_count += 1
+            else:
+                self.failed_count += 1
+            self.last_result = {'number': phone_number, 'success': success, 'ts': round(time.time(), 3)}
+        if success:
+            Logger.info(f"HelloSms: SMS sent to {phone_number}")
+        else:
+            Logger.error(f"HelloSms: Failed to send SMS to {phone_number}")
+
+    def history_summary(self, days=7, limit=10):
+        """خلاصه تاریخچه چند روز اخیر: تعداد تماس‌ها و پیامک‌ها و پرتکرارترین تماس‌گیرندگان"""
+        since = time.time() - days * 86400
+        return {
+            'days': days,
+            'missed_calls': self.history.count(EVENT_MISSED_CALL, since),
+            'sent': self.history.count(EVENT_SMS_SENT, since),
+            'failed': self.history.count(EVENT_SMS_FAILED, since),
+            'top_callers': self.history.top_numbers(EVENT_MISSED_CALL, since, limit),
+        }
+
+    def status(self):
+        """وضعیت سرویس برای رابط کاربری (قابل تبدیل به JSON)"""
+        with self._lock:
+            status = {
+                'running': self.started_at is not None,
+                'uptime': round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+                'platform': platform,
+                'sent': self.sent_count,
+                'failed': self.failed_count,
+                'last_result': self.last_result,
+            }
+        status['activity_seq'] = self.activity.seq
+        status['scheduled'] = self.reply_timers.pending_count()
+        status['contacts'] = len(self.contacts) if self.contacts else 0
+        status['enabled'] = bool(self.settings.get('sms_enabled', {}).get('value', True))
+        status['sms_text_set'] = bool(self.settings.get('sms_text', {}).get('value', '').strip())
+        status['lines'] = len(self.subscriptions.subscription_ids()) if self.subscriptions else 0
+        status['queue'] = self.sms_queue.stats()
+        status['in_flight'] = len(self.delivery_tracker.in_flight())
+        return status
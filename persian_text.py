@@ -0,0 +1,215 @@
+"""
+موتور شکل‌دهی متن فارسی (reshape + bidi) با کش مشترک
+"""
+
+import re
+import time
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+from kivy.logger import Logger
+
+from metrics import metrics
+
+# حداکثر تعداد متن‌های شکل‌داده شده در کش
+SHAPE_CACHE_SIZE = 512
+
+# تشخیص کاراکترهای عربی/فارسی (یک بار کامپایل می‌شود)
+PERSIAN_RE = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]')
+
+# فرم‌های نمایشی عربی که reshape تولید می‌کند (قابل برگشت با NFKC)
+PRESENTATION_FORMS_RE = re.compile(r'[\uFB50-\uFDFF\uFE70-\uFEFF]')
+
+# چیدمان نمایشی یک خط همراه با نگاشت موقعیت cursor
+#   display: متن نمایشی (reshape + bidi)
+#   to_visual: موقعیت منطقی (0..len(line)) -> موقعیت نمایشی
+#   to_logical: موقعیت نمایشی (0..len(display)) -> موقعیت منطقی
+LineLayout = namedtuple('LineLayout', 'display to_visual to_logical')
+
+# زمان شکل‌دهی متن‌هایی که در کش نبودند (برخورد با کش هزینه‌ای ندارد)
+_shape_miss_time = metrics.histogram('shape.miss_seconds')
+
+
+@lru_cache(maxsize=None)
+def _engines():
+    """
+    بارگذاری arabic_reshaper و bidi در اولین استفاده
+
+    این دو کتابخانه فقط برای نمایش متن لازم هستند، پس import آن‌ها زمان
+    شروع برنامه و مسیرهای بدون UI را کند نمی‌کند.
+
+    Returns:
+        (arabic_reshaper, bidi.algorithm)
+    """
+    import arabic_reshaper
+    from bidi import algorithm as bidi_algorithm
+
+    # پیکربندی arabic_reshaper برای فارسی بهتر
+    try:
+        # تنظیمات برای reshape بهتر کاراکترهای فارسی
+        arabic_reshaper.config['delete_harakat'] = False
+        arabic_reshaper.config['delete_tatweel'] = False
+        arabic_reshaper.config['support_ligatures'] = True
+    except:
+        pass
+    return arabic_reshaper, bidi_algorithm
+
+
+def has_persian(text):
+    """آیا متن شامل کاراکتر فارسی/عربی است"""
+    return bool(text) and PERSIAN_RE.search(text) is not None
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def shape(text):
+    """تبدیل متن فارسی برای نمایش صحیح - reshape + bidi (با کش)"""
+    if not text or PERSIAN_RE.search(text) is None:
+        # متن فقط انگلیسی یا عدد است، reshape نکن
+        return text
+    started = time.perf_counter()
+    try:
+        arabic_reshaper, bidi_algorithm = _engines()
+        return bidi_algorithm.get_display(arabic_reshaper.reshape(text))
+    except Exception as e:
+        Logger.warning(f"HelloSms: Error reshaping text: {e}")
+        return text
+    finally:
+        _shape_miss_time.observe_since(started)
+
+
+def shape_many(texts):
+    """شکل‌دهی گروهی چند متن (مثلاً همه برچسب‌های صفحه)"""
+    return [shape(text) for text in texts]
+
+
+def cache_info():
+    """آمار کش شکل‌دهی"""
+    return shape.cache_info()
+
+
+def base_direction(lines):
+    """جهت پاراگراف ('L' یا 'R') بر اساس اولین کاراکتر قوی در خطوط"""
+    for line in lines:
+        for ch in line:
+            bidi_type = unicodedata.bidirectional(ch)
+            if bidi_type == 'L':
+                return 'L'
+            if bidi_type in ('R', 'AL'):
+                return 'R'
+    return 'L'
+
+
+def _reshape_offsets(line, reshaped):
+    """
+    نگاشت موقعیت منطقی به موقعیت در متن reshape شده
+
+    هر کاراکتر خروجی reshape یا همان کاراکتر ورودی است یا یک فرم نمایشی
+    که NFKC آن کاراکتر(های) ورودی را برمی‌گرداند (مثلاً لا -> ﻻ).
+    کاراکترهای حذف شده (اعراب/کشیده) صفر کاراکتر خروجی دارند.
+    """
+    n = len(line)
+    emitted = [0] * n
+    i = 0
+    for ch in reshaped:
+        source = unicodedata.normalize('NFKC', ch) if PRESENTATION_FORMS_RE.match(ch) else ch
+        while i < n and line[i] != source[0]:
+            i += 1
+        if i >= n:
+            # همترازی ممکن نشد - نگاشت یک به یک
+            return [min(k, len(reshaped)) for k in range(n + 1)]
+        emitted[i] = 1
+        i += len(source)
+
+    offsets = [0] * (n + 1)
+    for k in range(n):
+        offsets[k + 1] = offsets[k] + emitted[k]
+    return offsets
+
+
+def _bidi_reorder(text, base_dir):
+    """
+    اجرای الگوریتم bidi و برگرداندن (متن نمایشی، موقعیت نمایشی هر کاراکتر، سطح هر کاراکتر)
+
+    همان مراحل get_display اجرا می‌شود، با این تفاوت که اندیس منطقی هر
+    کاراکتر نگه داشته می‌شود تا جایگشت نمایشی دقیقاً معلوم باشد.
+    """
+    bidi_algorithm = _engines()[1]
+    storage = bidi_algorithm.get_empty_storage()
+    storage['base_level'] = bidi_algorithm.PARAGRAPH_LEVELS[base_dir]
+    storage['base_dir'] = base_dir
+    bidi_algorithm.get_embedding_levels(text, storage)
+    for idx, _ch in enumerate(storage['chars']):
+        _ch['idx'] = idx
+    bidi_algorithm.explicit_embed_and_overrides(storage, False)
+    bidi_algorithm.resolve_weak_types(storage, False)
+    bidi_algorithm.resolve_neutral_types(storage, False)
+    bidi_algorithm.resolve_implicit_levels(storage, False)
+    bidi_algorithm.reorder_resolved_levels(storage, False)
+    bidi_algorithm.apply_mirroring(storage, False)
+
+    chars = storage['chars']
+    positions = [None] * len(text)
+    levels = [0] * len(text)
+    for pos, _ch in enumerate(chars):
+        positions[_ch['idx']] = pos
+        levels[_ch['idx']] = _ch['level']
+    return ''.join(_ch['ch'] for _ch in chars), positions, levels
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def layout_line(line, base_dir='R'):
+    """
+    شکل‌دهی یک خط (بدون \n) با نگاشت دقیق cursor بین ترتیب منطقی و نمایشی
+
+    cursor بعد از کاراکتر منطقی k-1 در سمت انتهایی آن کاراکتر قرار می‌گیرد:
+    در اجرای راست به چپ سمت چپ آن و در اجرای چپ به راست سمت راست آن.
+    """
+    if not has_persian(line):
+        identity = list(range(len(line) + 1))
+        return LineLayout(line, identity, identity)
+
+    try:
+        reshaped = _engines()[0].reshape(line)
+        offsets = _reshape_offsets(line, reshaped)
+        display, positions, levels = _bidi_reorder(reshaped, base_dir)
+    except Exception as e:
+        Logger.warning(f"HelloSms: Error reshaping line: {e}")
+        identity = list(range(len(line) + 1))
+        return LineLayout(line, identity, identity)
+
+    # موقعیت نمایشی هر فاصله بین کاراکترهای reshape شده
+    base_rtl = base_dir == 'R'
+    gap_visual = []
+    for k in range(len(reshaped) + 1):
+        j = k - 1
+        while j >= 0 and positions[j] is None:
+            j -= 1
+        if j >= 0:
+            pos = positions[j]
+            gap_visual.append(pos if levels[j] % 2 else pos + 1)
+        elif positions and positions[0] is not None:
+            pos = positions[0]
+            gap_visual.append(pos + 1 if levels[0] % 2 else pos)
+        else:
+            gap_visual.append(len(display) if base_rtl else 0)
+
+    to_visual = [gap_visual[offsets[k]] for k in range(len(line) + 1)]
+
+    # نگاشت معکوس؛ موقعیت‌هایی که هیچ cursor منطقی به آن‌ها نمی‌رسد
+    # به نزدیک‌ترین موقعیت قبلی چسبانده می‌شوند
+    to_logical = [None] * (len(display) + 1)
+    for k, v in enumerate(to_visual):
+        if to_logical[v] is None or k > to_logical[v]:
+            to_logical[v] = k
+    last = len(line) if base_rtl else 0
+    for v in range(len(to_logical)):
+        if to_logical[v] is None:
+            to_logical[v] = last
+        last = to_logical[v]
+    return LineLayout(display, to_visual, to_logical)
+
+
+# آمار کش‌ها فقط هنگام snapshot خوانده می‌شود
+metrics.gauge_func('shape.cache', lambda: shape.cache_info()._asdict())
+metrics.gauge_func('layout.cache', lambda: layout_line.cache_info()._asdict())
@@ -0,0 +1,122 @@
+"""
+یکسان‌سازی شماره تلفن به فرم E.164 (مثلاً +989121234567) با کش
+"""
+
+from functools import lru_cache
+
+# کد کشور پیش‌فرض برای شماره‌های داخلی (ایران)
+DEFAULT_COUNTRY_CODE = '98'
+
+# حداکثر تعداد شماره‌های یکسان‌سازی شده در کش
+NORMALIZE_CACHE_SIZE = 4096
+
+# شماره‌های داخلی (با 0) کوتاه‌تر از این بدون تغییر می‌مانند
+MIN_NATIONAL_LENGTH = 7
+
+# طول شماره ملی بدون 0 ابتدایی (مثلاً 9121234567)؛ شماره بدون 0 و + با طول
+# دیگر سرشماره یا شماره خدماتی است (مثل 3000...) و کد کشور نمی‌گیرد
+NATIONAL_NUMBER_LENGTH = 10
+
+# ارقام فارسی/عربی -> لاتین و حذف جداکننده‌ها در یک translate
+_NUMBER_TABLE = str.maketrans(
+    '\u06F0\u06F1\u06F2\u06F3\u06F4\u06F5\u06F6\u06F7\u06F8\u06F9'
+    '\u0660\u0661\u0662\u0663\u0664\u0665\u0666\u0667\u0668\u0669',
+    '01234567890123456789',
+    ' -().\t/\u00A0\u200C\u200E\u200F',
+)
+
+_default_country = DEFAULT_COUNTRY_CODE
+
+
+def set_default_country(country_code):
+    """تنظیم کد کشور پیش‌فرض (مثلاً '98')"""
+    global _default_country
+    country_code = str(country_code).lstrip('+')
+    if country_code != _default_country:
+        _default_country = country_code
+        _normalize.cache_clear()
+
+
+def get_default_country():
+    """کد کشور پیش‌فرض فعلی"""
+    return _default_country
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(phone_number, country_code):
+    number = phone_number.translate(_NUMBER_TABLE)
+    if number.startswith('+'):
+        digits = number[1:]
+    elif number.startswith('00'):
+        digits = number[2:]
+    elif number.startswith('0'):
+        if len(number) < MIN_NATIONAL_LENGTH:
+            return number
+        digits = country_code + number[1:]
+    elif number.startswith(country_code) and len(number) > NATIONAL_NUMBER_LENGTH:
+        digits = number
+    elif len(number) == NATIONAL_NUMBER_LENGTH:
+        digits = country_code + number
+    else:
+        # سرشماره‌ها و شماره‌های خدماتی
+        return number
+
+    if not digits.isdigit():
+        # شماره‌های حرفی (مثل نام فرستنده) قابل یکسان‌سازی نیستند
+        return number
+    return '+' + digits
+
+
+def normalize_number(phone_number):
+    """
+    تبدیل شماره به فرم یکسان
+
+    +98912...، 0912...، 00989...، 912... (ده رقمی) و ارقام فارسی همه به
+    +98912... تبدیل می‌شوند. سرشماره‌ها و شماره‌های خدماتی بدون 0 و +
+    (مثل 30001234)، شماره‌های کوتاه و شماره‌های حرفی بدون تغییر می‌مانند.
+
+    Returns:
+        str: شماره یکسان شده یا None برای شماره خالی
+    """
+    if not phone_number:
+        return None
+    return _normalize(str(phone_number), _default_country)
+
+
+def normalize_prefix(prefix):
+    """
+    شکل‌های یکسان شده پیشوند شماره برای قوانین پیشوندی (مثلاً '0900' -> ('+98900',))
+
+    پیشوند بدون 0 یا + (مثل سرشماره 3000) همان‌طور که normalize_number با
+    شماره‌ها رفتار می‌کند دو شکل دارد: بدون تغییر برای سرشماره‌ها و شماره‌های
+    خدماتی، و با کد کشور برای شماره ملی ده رقمی بدون 0.
+
+    Returns:
+        tuple: شکل‌های پیشوند
+    """
+    prefix = str(prefix).translate(_NUMBER_TABLE)
+    if prefix.startswith('+'):
+        return (prefix,)
+    if prefix.startswith('00'):
+        return ('+' + prefix[2:],)
+    if prefix.startswith('0'):
+        return ('+' + _default_country + prefix[1:],)
+    if not prefix.isdigit() or len(prefix) > NATIONAL_NUMBER_LENGTH:
+        return (prefix,)
+    return prefix, '+' + _default_country + prefix
+
+
+def normalize_many(phone_numbers):
+    """
+    یکسان‌سازی گروهی (مثلاً لیست مخاطبین یا قوانین)
+
+    از کش عبور نمی‌کند تا لیست‌های بزرگ شماره‌های پرتکرار تماس را از کش بیرون نکنند.
+    """
+    country_code = _default_country
+    normalize = _normalize.__wrapped__
+    return [normalize(str(number), country_code) if number else None for number in phone_numbers]
+
+
+def cache_info():
+    """آمار کش یکسان‌سازی"""
+    return _normalize.cache_info()
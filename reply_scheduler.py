@@ -0,0 +1,309 @@
+"""
+زمان‌بندی ارسال پاسخ: ساعات سکوت، ارسال با تاخیر و لغو با تماس برگشتی
+
+پاسخ‌های عقب افتاده در یک heap بر اساس زمان ارسال نگه داشته و در یک ژورنال
+روی دیسک ثبت می‌شوند تا بعد از اجرای مجدد سرویس از دست نروند. رشته کارگر
+فقط تا نزدیک‌ترین زمان ارسال می‌خوابد و با تایمر جدید زودتر یا توقف بیدار
+می‌شود.
+"""
+
+import datetime
+import heapq
+import threading
+import time
+
+from kivy.logger import Logger
+
+from journal import Journal
+
+# مسیر فایل ژورنال تایمرهای پاسخ
+TIMER_JOURNAL_FILE = 'hellosms_timers.journal'
+
+# ژورنال وقتی تعداد رکوردها از این مقدار به علاوه دو برابر تایمرهای فعال بیشتر شد بازنویسی می‌شود
+TIMER_COMPACT_THRESHOLD = 1000
+
+
+def parse_clock(text):
+    """
+    تبدیل ساعت 'HH:MM' به دقیقه از ابتدای روز
+
+    Returns:
+        int یا None برای متن خالی یا نامعتبر
+    """
+    if not text:
+        return None
+    try:
+        hour, minute = (int(part) for part in str(text).strip().split(':'))
+    except ValueError:
+        Logger.warning(f"HelloSms: Invalid clock time in settings: {text!r}")
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        Logger.warning(f"HelloSms: Invalid clock time in settings: {text!r}")
+        return None
+    return hour * 60 + minute
+
+
+class QuietHours:
+    """
+    بازه روزانه‌ای که در آن پیامک ارسال نمی‌شود (مثلاً 22:00 تا 07:00)
+
+    بازه می‌تواند از نیمه‌شب بگذرد. شروع و پایان برابر یا نامشخص یعنی
+    ساعات سکوت غیرفعال است.
+    """
+
+    def __init__(self, start=None, end=None):
+        """
+        Args:
+            start: شروع بازه (دقیقه از ابتدای روز)
+            end: پایان بازه (دقیقه از ابتدای روز)
+        """
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ساخت از تنظیمات quiet_hours_start و quiet_hours_end"""
+        return cls(parse_clock(settings.get('quiet_hours_start', {}).get('value')),
+                   parse_clock(settings.get('quiet_hours_end', {}).get('value')))
+
+    @property
+    def enabled(self):
+        return self.start is not None and self.end is not None and self.start != self.end
+
+    def release_time(self, ts):
+        """
+        زودترین زمان مجاز ارسال از ts
+
+        Returns:
+            float: خود ts اگر خارج از ساعات سکوت است، وگرنه پایان همان بازه
+        """
+        if not self.enabled:
+            return ts
+        moment = datetime.datetime.fromtimestamp(ts)
+        minutes = moment.hour * 60 + moment.minute
+        if self.start < self.end:
+            quiet = self.start <= minutes < self.end
+        else:
+            quiet = minutes >= self.start or minutes < self.end
+        if not quiet:
+            return ts
+        release = moment.replace(hour=self.end // 60, minute=self.end % 60, second=0, microsecond=0)
+        if release <= moment:
+            # بازه از نیمه‌شب گذشته و پایان آن فرداست
+            release += datetime.timedelta(days=1)
+        return release.timestamp()
+
+
+class TimerQueue:
+    """
+    تایمرهای پایدار با کلید (مثلاً شماره تلفن) به ترتیب زمان
+
+    هر کلید حداکثر یک تایمر فعال دارد و schedule دوباره تایمر قبلی آن را
+    جایگزین می‌کند. لغو فقط تایمر را از نگاشت کلیدها حذف می‌کند و آیتم heap
+    هنگام رسیدن به سر heap کنار گذاشته می‌شود (یا وقتی تعداد آیتم‌های لغو
+    شده از تایمرهای فعال بیشتر شد heap دوباره ساخته می‌شود)، پس schedule و
+    cancel برای ده‌ها هزار تایمر هم O(log n) هستند.
+
+    زمان‌ها زمان دیواری (time.time) هستند تا بعد از اجرای مجدد معتبر بمانند.
+    on_fire در رشته کارگر و خارج از قفل فراخوانی می‌شود؛ تایمری که قبل از
+    ثبت اتمام آن پروسه از بین برود بعد از اجرای مجدد دوباره اجرا می‌شود.
+    """
+
+    def __init__(self, on_fire, journal_path=TIMER_JOURNAL_FILE):
+        """
+        Args:
+            on_fire: تابع on_fire(key, payload) که در زمان تایمر فراخوانی می‌شود
+            journal_path: مسیر فایل ژورنال (None یعنی بدون ذخیره روی دیسک)
+        """
+        self.on_fire = on_fire
+        self.journal_path = journal_path
+        # (زمان اجرا، شناسه، کلید، داده)
+        self._heap = []
+        # کلید -> (شناسه، زمان اجرا، داده) تایمر فعال
+        self._by_key = {}
+        self._cond = threading.Condition()
+        self._journal = Journal(journal_path, 'timer') if journal_path else None
+        self._next_id = 1
+        self._running = False
+        self._thread = None
+        self.fired = 0
+        self.cancelled = 0
+        self.wakeups = 0
+
+    def start(self):
+        """بازخوانی ژورنال و راه‌اندازی رشته کارگر (تایمرهای گذشته بلافاصله اجرا می‌شوند)"""
+        with self._cond:
+            if self._running:
+                return
+            self._replay_journal()
+            if self._journal:
+                self._journal.open()
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='HelloSmsTimers', daemon=True)
+        self._thread.start()
+        Logger.info(f"HelloSms: Reply timers started ({len(self._by_key)} pending)")
+
+    def stop(self, timeout=5):
+        """توقف رشته کارگر؛ تایمرهای باقی‌مانده در ژورنال می‌مانند"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            if self._journal:
+                self._journal.close()
+
+    def schedule(self, key, at, payload=None):
+        """
+        اجرای تایمر key در زمان at (جایگزین تایمر فعلی همان کلید)
+
+        Returns:
+            int: شناسه تایمر
+        """
+        with self._cond:
+            old = self._by_key.get(key)
+            if old is not None:
+                self._append_record({'op': 'done', 'id': old[0]})
+                if len(self._heap) > 2 * len(self._by_key) + 64:
+                    self._rebuild_heap()
+            timer_id = self._next_id
+            self._next_id += 1
+            self._append_record({'op': 'add', 'id': timer_id, 'at': at, 'key': key, 'data': payload})
+            self._by_key[key] = (timer_id, at, payload)
+            heapq.heappush(self._heap, (at, timer_id, key, payload))
+            # کارگر فقط وقتی بیدار می‌شود که این تایمر زودتر از تایمر قبلی سر heap باشد
+            if self._heap[0][1] == timer_id:
+                self._cond.notify()
+            self._compact_if_needed()
+        return timer_id
+
+    def cancel(self, key):
+        """
+        لغو تایمر فعال key
+
+        Returns:
+            داده تایمر لغو شده یا None اگر تایمری برای key نبود
+        """
+        with self._cond:
+            timer = self._by_key.pop(key, None)
+            if timer is None:
+                return None
+            self._append_record({'op': 'done', 'id': timer[0]})
+            self.cancelled += 1
+            if len(self._heap) > 2 * len(self._by_key) + 64:
+                self._rebuild_heap()
+            self._compact_if_needed()
+            return timer[2]
+
+    def pending(self, key):
+        """زمان اجرای تایمر فعال key یا None"""
+        with self._cond:
+            timer = self._by_key.get(key)
+            return timer[1] if timer else None
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._by_key)
+
+    def stats(self):
+        with self._cond:
+            self._drop_cancelled()
+            next_at = self._heap[0][0] if self._heap else None
+            return {
+                'pending': len(self._by_key),
+                'next_in': round(max(next_at - time.time(), 0.0), 1) if next_at is not None else None,
+                'fired': self.fired,
+                'cancelled': self.cancelled,
+                'wakeups': self.wakeups,
+            }
+
+    def _is_live(self, item):
+        timer = self._by_key.get(item[2])
+        return timer is not None and timer[0] == item[1]
+
+    def _drop_cancelled(self):
+        """حذف آیتم‌های لغو یا جایگزین شده از سر heap (باید با قفل فراخوانی شود)"""
+        heap = self._heap
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+
+    def _rebuild_heap(self):
+        """ساخت دوباره heap فقط با تایمرهای فعال (باید با قفل فراخوانی شود)"""
+        self._heap = [item for item in self._heap if self._is_live(item)]
+        heapq.heapify(self._heap)
+
+    def _append_record(self, record):
+        """نوشتن یک رکورد در ژورنال (باید با قفل فراخوانی شود)"""
+        if self._journal:
+            self._journal.append(record)
+
+    def _compact_if_needed(self):
+        """بازنویسی ژورنال وقتی بیشتر رکوردهای آن مربوط به تایمرهای تمام شده است"""
+        if not self._journal or not self._journal.is_open:
+            return
+        if self._journal.records >= TIMER_COMPACT_THRESHOLD + 2 * len(self._by_key):
+            self._rewrite_journal()
+
+    def _replay_journal(self):
+        """خواندن ژورنال و بازسازی تایمرهای فعال"""
+        records, max_id = self._journal.replay() if self._journal else ({}, 0)
+        self._heap = [(record.get('at', 0.0), timer_id, record.get('key'), record.get('data'))
+                      for timer_id, record in records.items()]
+        heapq.heapify(self._heap)
+        # اگر ژورنال برای یک کلید دو تایمر داشته باشد، جدیدتر معتبر است
+        self._by_key = {}
+        for at, timer_id, key, payload in sorted(self._heap, key=lambda item: item[1]):
+            self._by_key[key] = (timer_id, at, payload)
+        self._next_id = max_id + 1
+        if records:
+            Logger.info(f"HelloSms: Restored {len(self._by_key)} reply timers from journal")
+        if self._journal:
+            self._rewrite_journal()
+
+    def _rewrite_journal(self):
+        """بازنویسی اتمیک ژورنال فقط با تایمرهای فعال"""
+        live = sorted((item for item in self._heap if self._is_live(item)), key=lambda item: item[1])
+        self._journal.rewrite({'op': 'add', 'id': timer_id, 'at': at, 'key': key, 'data': payload}
+                              for at, timer_id, key, payload in live)
+
+    def _next_due(self):
+        """
+        انتظار تا رسیدن زمان نزدیک‌ترین تایمر (باید با قفل فراخوانی شود)
+
+        Returns:
+            آیتم heap یا None اگر صف متوقف شد
+        """
+        while self._running:
+            self._drop_cancelled()
+            if not self._heap:
+                self._cond.wait()
+            else:
+                delay = self._heap[0][0] - time.time()
+                if delay <= 0:
+                    item = heapq.heappop(self._heap)
+                    del self._by_key[item[2]]
+                    return item
+                self._cond.wait(delay)
+            self.wakeups += 1
+        return None
+
+    def _run(self):
+        """حلقه رشته کارگر"""
+        while True:
+            with self._cond:
+                item = self._next_due()
+                if item is None:
+                    return
+                self.fired += 1
+            _, timer_id, key, payload = item
+            try:
+                self.on_fire(key, payload)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in reply timer callback: {e}")
+            with self._cond:
+                self._append_record({'op': 'done', 'id': timer_id})
+                self._compact_if_needed()
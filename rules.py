@@ -0,0 +1,107 @@
+"""
+موتور قوانین پاسخ خودکار (لیست مجاز/مسدود و قالب پیامک هر گروه) با ایندکس trie
+"""
+
+from collections import namedtuple
+
+from kivy.logger import Logger
+
+from phone_numbers import normalize_number, normalize_prefix
+from sms_template import compile_template
+
+# عملکرد قوانین
+ACTION_BLOCK = 'block'
+ACTION_ALLOW = 'allow'
+RULE_ACTIONS = (ACTION_BLOCK, ACTION_ALLOW)
+
+# یک قانون کامپایل شده
+#   pattern: الگوی اصلی در تنظیمات ('0900*' برای پیشوند، یا یک شماره کامل)
+#   action: block یا allow
+#   template: نام قالب پیامک (یا None برای متن پیش‌فرض)
+#   compiled: قالب کامپایل شده (در زمان کامپایل قوانین از templates ساخته می‌شود)
+Rule = namedtuple('Rule', 'pattern action template compiled')
+
+# کلید نگه‌داری قانون در گره‌های trie (با کاراکترهای شماره تداخل ندارد)
+_RULE_KEY = None
+
+
+class RuleSet:
+    """
+    مجموعه قوانین کامپایل شده
+
+    شماره‌های کامل در یک dict و پیشوندها در یک trie (dict تو در تو) نگه
+    داشته می‌شوند. در match قانون شماره کامل بر طولانی‌ترین پیشوند منطبق
+    اولویت دارد؛ برای الگوی تکراری آخرین قانون برنده است.
+    """
+
+    def __init__(self, rules=(), templates=None):
+        """
+        Args:
+            rules: لیست dict با کلیدهای pattern، action و template (اختیاری)
+            templates: dict نام قالب -> متن پیامک
+        """
+        compiled = {}
+        for name, text in (templates or {}).items():
+            try:
+                compiled[name] = compile_template(text)
+            except Exception as e:
+                Logger.warning(f"HelloSms: Skipping invalid template {name!r}: {e}")
+        self._exact = {}
+        self._trie = {}
+        self._count = 0
+
+        for item in rules:
+            try:
+                pattern = str(item['pattern']).strip()
+                action = item.get('action', ACTION_BLOCK)
+                template = item.get('template')
+                if action not in RULE_ACTIONS:
+                    raise ValueError(f"unknown action {action!r}")
+                if template is not None and template not in compiled:
+                    raise ValueError(f"unknown template {template!r}")
+                rule = Rule(pattern, action, template, compiled.get(template))
+                if pattern.endswith('*'):
+                    for prefix in normalize_prefix(pattern[:-1]):
+                        self._add_prefix(prefix, rule)
+                else:
+                    self._exact[normalize_number(pattern)] = rule
+                self._count += 1
+            except Exception as e:
+                Logger.warning(f"HelloSms: Skipping invalid rule {item!r}: {e}")
+
+    @classmethod
+    def from_settings(cls, settings):
+        """کامپایل قوانین از تنظیمات (rules و templates)"""
+        return cls(
+            settings.get('rules', {}).get('value', []),
+            settings.get('templates', {}).get('value', {}),
+        )
+
+    def _add_prefix(self, prefix, rule):
+        node = self._trie
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node[_RULE_KEY] = rule
+
+    def match(self, phone_number):
+        """
+        یافتن قانون منطبق بر یک شماره یکسان شده
+
+        Returns:
+            Rule یا None
+        """
+        rule = self._exact.get(phone_number)
+        if rule is not None:
+            return rule
+
+        node = self._trie
+        rule = node.get(_RULE_KEY)
+        for ch in phone_number or '':
+            node = node.get(ch)
+            if node is None:
+                break
+            rule = node.get(_RULE_KEY, rule)
+        return rule
+
+    def __len__(self):
+        return self._count
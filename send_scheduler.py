@@ -0,0 +1,134 @@
+"""
+محدودکننده نرخ ارسال پیامک (token bucket) برای جلوگیری از محدودیت SMS اندروید
+"""
+
+import threading
+import time
+
+# اولویت پیامک‌ها در صف (عدد کمتر زودتر ارسال می‌شود)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+# پیش‌فرض‌ها زیر محدودیت پیش‌فرض اندروید (30 پیامک در هر 30 دقیقه) می‌مانند:
+# در هر بازه 30 دقیقه‌ای حداکثر burst + نرخ × 30 = 15 + 0.5 × 30 = 30 ارسال ممکن است
+DEFAULT_MESSAGES_PER_MINUTE = 0.5
+DEFAULT_PARTS_PER_MINUTE = 0.5
+DEFAULT_BURST = 15
+
+
+class TokenBucket:
+    """سطل توکن با نرخ پر شدن rate (توکن در ثانیه) و ظرفیت capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def configure(self, rate, capacity, now=None):
+        """تغییر نرخ و ظرفیت؛ توکن‌های مصرف شده برنمی‌گردند"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, amount, now=None):
+        """زمان انتظار (ثانیه) تا در دسترس بودن amount توکن"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return float('inf')
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount, now=None):
+        """برداشتن amount توکن (باید بعد از delay() == 0 فراخوانی شود)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+class SendRateLimiter:
+    """
+    دو سطل توکن برای تعداد پیامک و تعداد بخش‌ها در دقیقه
+
+    اندروید هر بخش پیامک چندبخشی را جداگانه می‌شمارد، پس یک پیامک فقط وقتی
+    ارسال می‌شود که هم توکن پیامک و هم به تعداد بخش‌هایش توکن بخش موجود باشد.
+    همه متدها با قفل اجرا می‌شوند چون صف، ارسال‌های مجدد و بک‌اند ارسال از
+    رشته‌های مختلف از یک محدودکننده استفاده می‌کنند.
+    """
+
+    def __init__(self, messages_per_minute=DEFAULT_MESSAGES_PER_MINUTE,
+                 parts_per_minute=DEFAULT_PARTS_PER_MINUTE, burst=DEFAULT_BURST):
+        self.messages = TokenBucket(messages_per_minute / 60.0, burst)
+        self.parts = TokenBucket(parts_per_minute / 60.0, burst)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, prefix=''):
+        """ساخت محدودکننده از تنظیمات (prefix برای سهمیه هر سیم‌کارت: 'sim_')"""
+        return cls(*cls._settings_values(settings, prefix))
+
+    @staticmethod
+    def _settings_values(settings, prefix):
+        return (
+            float(settings.get(f'{prefix}rate_messages_per_minute', {}).get('value', DEFAULT_MESSAGES_PER_MINUTE)),
+            float(settings.get(f'{prefix}rate_parts_per_minute', {}).get('value', DEFAULT_PARTS_PER_MINUTE)),
+            int(settings.get(f'{prefix}rate_burst', {}).get('value', DEFAULT_BURST)),
+        )
+
+    def configure(self, messages_per_minute, parts_per_minute, burst):
+        """تغییر نرخ‌ها در جا تا سهمیه مصرف شده با تغییر تنظیمات پر نشود"""
+        now = time.monotonic()
+        with self._lock:
+            self.messages.configure(messages_per_minute / 60.0, burst, now)
+            self.parts.configure(parts_per_minute / 60.0, burst, now)
+
+    def configure_from_settings(self, settings, prefix=''):
+        self.configure(*self._settings_values(settings, prefix))
+
+    def delay(self, part_count, now=None):
+        """زمان انتظار تا امکان ارسال یک پیامک با part_count بخش"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._delay(part_count, now)
+
+    def take(self, part_count, now=None):
+        """ثبت ارسال یک پیامک با part_count بخش"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._take(part_count, now)
+
+    def try_take(self, part_count, now=None):
+        """ثبت ارسال فقط در صورت وجود توکن کافی"""
+        return self.delay_or_take(part_count, now) == 0
+
+    def delay_or_take(self, part_count, now=None):
+        """
+        برداشتن توکن‌ها اگر موجود باشند، وگرنه زمان انتظار (به صورت اتمیک)
+
+        Returns:
+            float: 0 اگر توکن‌ها برداشته شدند، وگرنه ثانیه‌های انتظار
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            delay = self._delay(part_count, now)
+            if delay <= 0:
+                self._take(part_count, now)
+                return 0.0
+            return delay
+
+    def _delay(self, part_count, now):
+        return max(self.messages.delay(1, now), self.parts.delay(part_count, now))
+
+    def _take(self, part_count, now):
+        self.messages.take(1, now)
+        self.parts.take(part_count, now)
@@ -2,147 +2,755 @@
 سرویس اندروید برای مانیتورینگ تماس‌ها و ارسال پیامک
 """
 
+import os
+import threading
+import time
+from functools import lru_cache
+
 from kivy.logger import Logger
 from kivy.utils import platform
 
-if platform == 'android':
-    from jnius import autoclass, PythonJavaClass, java_method
+from call_state import CallStateMachine, CALL_STATE_IDLE, CALL_STATE_RINGING, CALL_STATE_OFFHOOK
+from sms_segment import segment_message
+from phone_numbers import normalize_number
+from sms_delivery import SMS_SENT_ACTION, SMS_DELIVERED_ACTION
+from sms_transport import SmsTransport, RESULT_OK
+from ipc import default_socket_path
+from contacts import Contact, ContactChanges, ContactsProvider
+from metrics import metrics, METRICS_FILE
+
+# کلاس‌های جاوای مورد استفاده؛ autoclass (reflection از طریق JNI) هر کلاس در
+# اولین استفاده انجام و کش می‌شود تا import این ماژول قبل از اولین تماس سریع بماند
+JAVA_CLASSES = {
+    'Context': 'android.content.Context',
+    'PhoneStateListener': 'android.telephony.PhoneStateListener',
+    'SmsManager': 'android.telephony.SmsManager',
+    'Intent': 'android.content.Intent',
+    'ArrayList': 'java.util.ArrayList',
+    'PendingIntent': 'android.app.PendingIntent',
+    'SmsMessage': 'android.telephony.SmsMessage',
+    'Looper': 'android.os.Looper',
+    'PythonService': 'org.kivy.android.PythonService',
+    'Contacts': 'android.provider.ContactsContract$Contacts',
+    'Phone': 'android.provider.ContactsContract$CommonDataKinds$Phone',
+    'DeletedContacts': 'android.provider.ContactsContract$DeletedContacts',
+    'CallLog': 'android.provider.CallLog$Calls',
+}
+
+
+@lru_cache(maxsize=None)
+def java_class(name):
+    """کلاس جاوا با نام کوتاه از JAVA_CLASSES (فقط روی اندروید)"""
+    from jnius import autoclass
+    return autoclass(JAVA_CLASSES[name])
+
+
+def _in_service():
+    """آیا این پروسه سرویس python-for-android است"""
+    return 'PYTHON_SERVICE_ARGUMENT' in os.environ
+
+
+@lru_cache(maxsize=None)
+def _context():
+    """Context اندروید: PythonService در پروسه سرویس، وگرنه Activity برنامه"""
+    if _in_service():
+        return java_class('PythonService').mService
     from android import mActivity
-    
-    Context = autoclass('android.content.Context')
-    TelephonyManager = autoclass('android.telephony.TelephonyManager')
-    PhoneStateListener = autoclass('android.telephony.PhoneStateListener')
-    SmsManager = autoclass('android.telephony.SmsManager')
-    Intent = autoclass('android.content.Intent')
-    BroadcastReceiver = autoclass('android.content.BroadcastReceiver')
-    IntentFilter = autoclass('android.content.IntentFilter')
+    return mActivity
+
+
+# وضعیت‌های TP-Status کمتر از این مقدار یعنی تحویل کامل شده است
+SMS_STATUS_PENDING = 0x20
+
+# broadcast هایی که یعنی سیم‌کارت‌ها یا سیم‌کارت پیش‌فرض پیامک تغییر کرده است
+SIM_CHANGED_ACTIONS = [
+    'android.intent.action.SIM_STATE_CHANGED',
+    'android.telephony.action.DEFAULT_SMS_SUBSCRIPTION_CHANGED',
+]
+
+# نتیجه انتخاب خط وقتی سهمیه همه سیم‌کارت‌ها تمام شده است
+NO_LINE = object()
+
+# PhoneStateListener شماره تماس خروجی را نمی‌دهد؛ این مدت بعد از پایان تماس
+# (تا سیستم آن را در لاگ تماس‌ها بنویسد) شماره از CallLog خوانده می‌شود (ثانیه)
+CALL_LOG_DELAY = 2.0
+# CallLog.Calls.OUTGOING_TYPE
+CALL_LOG_OUTGOING = 2
+
+_call_state_events = metrics.counter('call.state_events')
+_missed_calls = metrics.counter('call.missed')
+# از دریافت IDLE تا برگشت callback (ثبت در تاریخچه، ساخت متن و ورود به صف)
+_idle_to_enqueue = metrics.histogram('call.idle_to_enqueue_seconds')
+# مدت فراخوانی sendTextMessage/sendMultipartTextMessage
+_send_sms_time = metrics.histogram('sms.send_sms_seconds')
+_send_sms_ok = metrics.counter('sms.send_sms.ok')
+_send_sms_failed = metrics.counter('sms.send_sms.failed')
 
 
 class AndroidCallMonitor:
     """کلاس مانیتورینگ تماس برای اندروید"""
     
-    def __init__(self, callback):
+    def __init__(self, callback, subscriptions=None, outgoing_callback=None, scheduler=None):
         """
         Args:
             callback: تابعی که هنگام رد یا از دست رفتن تماس فراخوانی می‌شود
-                     باید یک شماره تلفن را به عنوان آرگومان دریافت کند
+                     شماره تلفن و شناسه سیم‌کارت دریافت‌کننده تماس (یا None) را دریافت می‌کند
+            subscriptions: SubscriptionRegistry برای یک listener جدا روی هر سیم‌کارت
+            outgoing_callback: تابع اختیاری که با شماره و شناسه سیم‌کارت تماس خروجی فراخوانی می‌شود
+            scheduler: RetryScheduler در حال اجرا برای خواندن شماره تماس خروجی از لاگ تماس‌ها
         """
         self.callback = callback
-        self.last_state = None
-        self.last_number = None
-        self.call_answered = False
+        self.outgoing_callback = outgoing_callback
+        self.subscriptions = subscriptions
+        # query لاگ تماس‌ها روی رشته ماندگار زمان‌بند اجرا می‌شود، نه یک Timer جدا برای هر تماس:
+        # Timer متد run را بازنویسی می‌کند و jnius هنگام پایان آن رشته را از VM جدا نمی‌کند
+        self.scheduler = scheduler
+        # هر سیم‌کارت ماشین حالت خودش را دارد؛ None برای listener پیش‌فرض
+        self.state_machine = CallStateMachine(self.on_missed_call, self.on_outgoing_call)
+        self.state_machines = {None: self.state_machine}
+        self.listeners = []
+        # زمان perf_counter آخرین IDLE برای اندازه‌گیری تاخیر تماس تا صف
+        self._idle_started = None
+        # سیم‌کارت -> زمان شروع (میلی‌ثانیه) تماس خروجی بدون شماره در جریان
+        self._outgoing_started = {}
         
+        if subscriptions is not None:
+            subscriptions.on_change.append(self.refresh_subscriptions)
         if platform == 'android':
             self.setup_monitor()
     
     def setup_monitor(self):
         """تنظیم مانیتورینگ تماس"""
         try:
-            telephony_manager = mActivity.getSystemService(Context.TELEPHONY_SERVICE)
+            from jnius import PythonJavaClass, java_method
+            
+            PhoneStateListener = java_class('PhoneStateListener')
+            telephony_manager = _context().getSystemService(java_class('Context').TELEPHONY_SERVICE)
             
             class CallStateListener(PythonJavaClass):
                 __javaclass__ = 'android/telephony/PhoneStateListener'
                 
-                def __init__(self, monitor):
+                def __init__(self, monitor, subscription_id):
                     super().__init__()
                     self.monitor = monitor
+                    self.subscription_id = subscription_id
                 
-                @java_method('(I)V')
+                @java_method('(ILjava/lang/String;)V')
                 def onCallStateChanged(self, state, phone_number):
                     """هنگام تغییر وضعیت تماس"""
-                    try:
-                        # حالت‌های تماس
-                        IDLE = 0
-                        RINGING = 1
-                        OFFHOOK = 2
-                        
-                        if state == RINGING:
-                            # تماس ورودی
-                            number = str(phone_number) if phone_number else None
-                            self.monitor.last_number = number
-                            self.monitor.call_answered = False
-                            Logger.info(f"HelloSms: Incoming call from {number}")
-                        
-                        elif state == OFFHOOK:
-                            # تماس پاسخ داده شده
-                            self.monitor.call_answered = True
-                            Logger.info("HelloSms: Call answered")
-                        
-                        elif state == IDLE:
-                            # تماس قطع شده
-                            if self.monitor.last_number and not self.monitor.call_answered:
-                                # تماس پاسخ داده نشده یا رد شده
-                                Logger.info(f"HelloSms: Missed/rejected call from {self.monitor.last_number}")
-                                # فراخوانی callback
-                                if self.monitor.callback:
-                                    self.monitor.callback(self.monitor.last_number)
-                            
-                            # ریست کردن وضعیت
-                            self.monitor.call_answered = False
-                            self.monitor.last_number = None
-                    
-                    except Exception as e:
-                        Logger.error(f"HelloSms: Error in CallStateListener: {e}")
+                    self.monitor.on_call_state(self.subscription_id, state, phone_number)
             
-            self.listener = CallStateListener(self)
-            telephony_manager.listen(self.listener, PhoneStateListener.LISTEN_CALL_STATE)
-            Logger.info("HelloSms: Call monitor initialized")
+            subscription_ids = self.subscriptions.subscription_ids() if self.subscriptions else ()
+            if subscription_ids:
+                # listener جدا برای هر سیم‌کارت تا خط دریافت‌کننده تماس مشخص باشد
+                for subscription_id in subscription_ids:
+                    manager = telephony_manager.createForSubscriptionId(subscription_id)
+                    listener = CallStateListener(self, subscription_id)
+                    manager.listen(listener, PhoneStateListener.LISTEN_CALL_STATE)
+                    self.listeners.append((manager, listener))
+            else:
+                listener = CallStateListener(self, None)
+                telephony_manager.listen(listener, PhoneStateListener.LISTEN_CALL_STATE)
+                self.listeners.append((telephony_manager, listener))
+            Logger.info(f"HelloSms: Call monitor initialized ({len(self.listeners)} line(s))")
         
         except Exception as e:
             Logger.error(f"HelloSms: Error setting up call monitor: {e}")
+    
+    def refresh_subscriptions(self):
+        """ثبت دوباره listener ها بعد از تغییر سیم‌کارت‌ها"""
+        if platform != 'android':
+            return
+        self.stop()
+        self.setup_monitor()
+    
+    def stop(self):
+        """حذف listener های وضعیت تماس"""
+        for manager, listener in self.listeners:
+            try:
+                manager.listen(listener, java_class('PhoneStateListener').LISTEN_NONE)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error removing call listener: {e}")
+        self.listeners = []
+    
+    def on_call_state(self, subscription_id, state, phone_number):
+        """تغییر وضعیت تماس روی یک سیم‌کارت"""
+        started = time.perf_counter()
+        _call_state_events.inc()
+        self._idle_started = started if state == CALL_STATE_IDLE else None
+        try:
+            number = normalize_number(phone_number)
+            if state == CALL_STATE_RINGING:
+                Logger.info(f"HelloSms: Incoming call from {number} (line {subscription_id})")
+            elif state == CALL_STATE_OFFHOOK:
+                Logger.info("HelloSms: Call answered")
+            
+            state_machine = self.state_machines.get(subscription_id)
+            if state_machine is None:
+                state_machine = CallStateMachine(
+                    lambda missed_number: self.on_missed_call(missed_number, subscription_id),
+                    lambda outgoing_number: self.on_outgoing_call(outgoing_number, subscription_id))
+                self.state_machines[subscription_id] = state_machine
+            state_machine.handle(state, number)
+            
+            started_ms = self._outgoing_started.pop(subscription_id, None) if state == CALL_STATE_IDLE else None
+            if started_ms is not None:
+                if self.scheduler is None:
+                    Logger.warning("HelloSms: No scheduler for reading outgoing calls from the call log")
+                else:
+                    self.scheduler.schedule(CALL_LOG_DELAY, self._resolve_outgoing, started_ms, subscription_id)
+        
+        except Exception as e:
+            Logger.error(f"HelloSms: Error in CallStateListener: {e}")
+    
+    def on_missed_call(self, phone_number, subscription_id=None):
+        """تماس رد شده یا بی‌پاسخ از ماشین حالت"""
+        Logger.info(f"HelloSms: Missed/rejected call from {phone_number}")
+        _missed_calls.inc()
+        if self.callback:
+            self.callback(phone_number, subscription_id)
+        if self._idle_started is not None:
+            _idle_to_enqueue.observe_since(self._idle_started)
+    
+    def on_outgoing_call(self, phone_number, subscription_id=None):
+        """
+        تماس خروجی از ماشین حالت
+        
+        روی اندروید شماره در OFFHOOK وجود ندارد؛ زمان شروع تماس نگه داشته و
+        شماره بعد از IDLE از لاگ تماس‌ها خوانده می‌شود (_resolve_outgoing).
+        """
+        if not phone_number and platform == 'android':
+            self._outgoing_started[subscription_id] = int(time.time() * 1000)
+            return
+        Logger.info(f"HelloSms: Outgoing call to {phone_number}")
+        if self.outgoing_callback:
+            self.outgoing_callback(phone_number, subscription_id)
+    
+    def _resolve_outgoing(self, started_ms, subscription_id):
+        """خواندن شماره تماس خروجی تمام شده از CallLog (نیاز به مجوز READ_CALL_LOG)"""
+        try:
+            number = None
+            # date در لاگ تماس‌ها زمان شروع تماس است؛ کمی فاصله برای اختلاف زمان OFFHOOK
+            cursor = _context().getContentResolver().query(
+                java_class('CallLog').CONTENT_URI, ['number'], 'type = ? AND date >= ?',
+                [str(CALL_LOG_OUTGOING), str(started_ms - 5000)], 'date DESC')
+            if cursor is not None:
+                try:
+                    if cursor.moveToFirst():
+                        number = normalize_number(cursor.getString(0))
+                finally:
+                    cursor.close()
+            if not number:
+                Logger.warning("HelloSms: Outgoing call not found in call log")
+                return
+            self.on_outgoing_call(number, subscription_id)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error reading outgoing call from call log: {e}")
 
 
-def send_sms(phone_number, message):
+class SubscriptionRegistry:
+    """
+    سیم‌کارت‌های فعال و کش SmsManager هر سیم‌کارت
+    
+    lookup های JNI (لیست سیم‌کارت‌ها و getSmsManagerForSubscriptionId) فقط یک
+    بار انجام و تا تغییر سیم‌کارت‌ها نگه داشته می‌شوند. با دریافت broadcast
+    تغییر سیم‌کارت، کش خالی و توابع on_change فراخوانی می‌شوند.
+    """
+    
+    def __init__(self, sms_manager_class=None, subscription_manager=None):
+        """
+        Args:
+            sms_manager_class: کلاس SmsManager (یا جایگزین جعلی روی لینوکس)
+            subscription_manager: SubscriptionManager سیستم (یا جایگزین جعلی)
+        """
+        if platform == 'android':
+            if sms_manager_class is None:
+                sms_manager_class = java_class('SmsManager')
+            if subscription_manager is None:
+                subscription_manager = _context().getSystemService(
+                    java_class('Context').TELEPHONY_SUBSCRIPTION_SERVICE)
+        self.sms_manager_class = sms_manager_class
+        self.subscription_manager = subscription_manager
+        self.on_change = []
+        self.lookups = 0
+        self.receiver = None
+        self._managers = {}
+        self._subscription_ids = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """ثبت BroadcastReceiver تغییر سیم‌کارت"""
+        if platform != 'android' or self.receiver:
+            return
+        try:
+            from android import broadcast
+            self.receiver = broadcast.BroadcastReceiver(
+                lambda context, intent: self.invalidate(), actions=SIM_CHANGED_ACTIONS)
+            self.receiver.start()
+        except Exception as e:
+            Logger.error(f"HelloSms: Error registering SIM change receiver: {e}")
+    
+    def stop(self):
+        if self.receiver:
+            self.receiver.stop()
+            self.receiver = None
+    
+    def subscription_ids(self):
+        """شناسه سیم‌کارت‌های فعال به ترتیب شکاف (خالی اگر قابل خواندن نباشد)"""
+        with self._lock:
+            if self._subscription_ids is None:
+                self._subscription_ids = self._load_subscription_ids()
+            return self._subscription_ids
+    
+    def sms_manager(self, subscription_id=None):
+        """SmsManager سیم‌کارت (None یعنی SmsManager پیش‌فرض)"""
+        with self._lock:
+            manager = self._managers.get(subscription_id)
+            if manager is None:
+                self.lookups += 1
+                if subscription_id is None:
+                    manager = self.sms_manager_class.getDefault()
+                else:
+                    manager = self.sms_manager_class.getSmsManagerForSubscriptionId(subscription_id)
+                self._managers[subscription_id] = manager
+            return manager
+    
+    def invalidate(self):
+        """خالی کردن کش بعد از تغییر سیم‌کارت‌ها"""
+        with self._lock:
+            self._managers.clear()
+            self._subscription_ids = None
+        Logger.info("HelloSms: SIM cards changed")
+        for callback in self.on_change:
+            try:
+                callback()
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in SIM change callback: {e}")
+    
+    def stats(self):
+        with self._lock:
+            return {'lookups': self.lookups, 'cached': len(self._managers),
+                    'lines': len(self._subscription_ids or ())}
+    
+    def _load_subscription_ids(self):
+        if self.subscription_manager is None:
+            return ()
+        try:
+            self.lookups += 1
+            infos = self.subscription_manager.getActiveSubscriptionInfoList()
+            if not infos:
+                return ()
+            infos = sorted(infos, key=lambda info: info.getSimSlotIndex())
+            return tuple(info.getSubscriptionId() for info in infos)
+        except Exception as e:
+            # بدون مجوز READ_PHONE_STATE لیست سیم‌کارت‌ها در دسترس نیست
+            Logger.error(f"HelloSms: Error reading SIM subscriptions: {e}")
+            return ()
+
+
+class AndroidContactsProvider(ContactsProvider):
+    """
+    مخاطبین از ContactsContract (نیاز به مجوز READ_CONTACTS)
+    
+    change token بیشترین CONTACT_LAST_UPDATED_TIMESTAMP دیده شده است؛ با آن
+    فقط شماره‌های مخاطبین تغییر یافته و مخاطبین حذف شده (DeletedContacts)
+    خوانده می‌شوند. نام ستون‌ها ثابت‌های API هستند و به صورت رشته آمده‌اند
+    چون ثابت‌های interface های ContactsContract از autoclass در دسترس نیستند.
+    """
+    
+    name = 'contacts'
+    
+    # DeletedContacts فقط حذف‌های این مدت اخیر را نگه می‌دارد (میلی‌ثانیه)
+    DELETED_RETENTION_MS = 30 * 86400 * 1000
+    
+    def changes(self, token=None):
+        if token is not None and time.time() * 1000 - token > self.DELETED_RETENTION_MS:
+            # حذف‌های قدیمی‌تر از token دیگر قابل پیدا کردن نیستند
+            token = None
+        resolver = _context().getContentResolver()
+        since = token or 0
+        latest = since
+        selection = 'contact_last_updated_timestamp > ?' if token is not None else None
+        args = [str(since)] if token is not None else None
+        
+        # contact_id -> (نام، شماره‌ها)
+        contacts = {}
+        cursor = resolver.query(java_class('Phone').CONTENT_URI,
+                                ['contact_id', 'display_name', 'data1', 'contact_last_updated_timestamp'],
+                                selection, args, None)
+        if cursor is not None:
+            try:
+                while cursor.moveToNext():
+                    contact_id = cursor.getLong(0)
+                    entry = contacts.get(contact_id)
+                    if entry is None:
+                        entry = contacts[contact_id] = (cursor.getString(1) or '', [])
+                    entry[1].append(cursor.getString(2))
+                    latest = max(latest, cursor.getLong(3))
+            finally:
+                cursor.close()
+        
+        deleted = []
+        if token is not None:
+            # مخاطب تغییر یافته‌ای که دیگر شماره‌ای ندارد در پرس‌وجوی Phone نیست
+            cursor = resolver.query(java_class('Contacts').CONTENT_URI,
+                                    ['_id', 'contact_last_updated_timestamp'], selection, args, None)
+            if cursor is not None:
+                try:
+                    while cursor.moveToNext():
+                        if cursor.getLong(0) not in contacts:
+                            deleted.append(cursor.getLong(0))
+                        latest = max(latest, cursor.getLong(1))
+                finally:
+                    cursor.close()
+            cursor = resolver.query(java_class('DeletedContacts').CONTENT_URI,
+                                    ['contact_id', 'contact_deleted_timestamp'],
+                                    'contact_deleted_timestamp > ?', args, None)
+            if cursor is not None:
+                try:
+                    while cursor.moveToNext():
+                        deleted.append(cursor.getLong(0))
+                        latest = max(latest, cursor.getLong(1))
+                finally:
+                    cursor.close()
+        
+        return ContactChanges(latest, [Contact(contact_id, name, tuple(numbers))
+                                       for contact_id, (name, numbers) in contacts.items()],
+                              deleted, token is None)
+
+
+def create_sms_intent(action, msg_id, part):
+    """ساخت PendingIntent گزارش ارسال/تحویل برای یک بخش پیامک"""
+    context = _context()
+    PendingIntent = java_class('PendingIntent')
+    intent = java_class('Intent')(action)
+    intent.setPackage(context.getPackageName())
+    intent.putExtra('msg_id', str(msg_id))
+    intent.putExtra('part', str(part))
+    request_code = (msg_id * 256 + part) & 0x7FFFFFFF
+    flags = PendingIntent.FLAG_IMMUTABLE | PendingIntent.FLAG_UPDATE_CURRENT
+    return PendingIntent.getBroadcast(context, request_code, intent, flags)
+
+
+class SmsStatusReceiver:
+    """دریافت گزارش‌های ارسال و تحویل پیامک و انتقال آن‌ها به DeliveryTracker"""
+    
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.receiver = None
+    
+    def start(self):
+        """ثبت BroadcastReceiver برای اکشن‌های ارسال و تحویل"""
+        if platform != 'android' or self.receiver:
+            return
+        try:
+            from android import broadcast
+            self.receiver = broadcast.BroadcastReceiver(
+                self.on_receive, actions=[SMS_SENT_ACTION, SMS_DELIVERED_ACTION])
+            self.receiver.start()
+            Logger.info("HelloSms: SMS status receiver registered")
+        except Exception as e:
+            Logger.error(f"HelloSms: Error registering SMS status receiver: {e}")
+    
+    def stop(self):
+        if self.receiver:
+            self.receiver.stop()
+            self.receiver = None
+    
+    def on_receive(self, context, intent):
+        """هنگام دریافت گزارش ارسال یا تحویل"""
+        try:
+            action = intent.getAction()
+            msg_id = int(intent.getStringExtra('msg_id'))
+            part = int(intent.getStringExtra('part'))
+            if action == SMS_SENT_ACTION:
+                success = self.receiver.receiver.getResultCode() == RESULT_OK
+            else:
+                pdu = intent.getByteArrayExtra('pdu')
+                status = 0
+                if pdu:
+                    status = java_class('SmsMessage').createFromPdu(pdu, intent.getStringExtra('format')).getStatus()
+                success = status < SMS_STATUS_PENDING
+            self.tracker.handle_broadcast(action, msg_id, part, success)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error handling SMS status broadcast: {e}")
+
+
+def _java_list(items):
+    """تبدیل لیست پایتون به ArrayList (فقط روی اندروید)"""
+    if platform != 'android':
+        return list(items)
+    java_list = java_class('ArrayList')()
+    for item in items:
+        java_list.add(item)
+    return java_list
+
+
+def send_sms(phone_number, message, sent_intents=None, delivery_intents=None, sms_manager=None):
     """
     ارسال پیامک
     
     Args:
         phone_number: شماره تلفن گیرنده
         message: متن پیامک
+        sent_intents: لیست PendingIntent گزارش ارسال هر بخش (اختیاری)
+        delivery_intents: لیست PendingIntent گزارش تحویل هر بخش (اختیاری)
+        sms_manager: SmsManager دلخواه (مثلاً FakeSmsManager روی لینوکس)
     
     Returns:
-        bool: True در صورت موفقیت، False در غیر این صورت
+        bool: True اگر پیامک بدون خطا به SmsManager تحویل شد، False در غیر این صورت
     """
-    if platform != 'android':
+    if sms_manager is None and platform != 'android':
         Logger.warning("HelloSms: Cannot send SMS on non-Android platform")
+        _send_sms_failed.inc()
         return False
     
     try:
-        # پاکسازی شماره تلفن
-        phone_number = phone_number.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
+        # یکسان‌سازی شماره تلفن (کش شده)
+        phone_number = normalize_number(phone_number)
         
         # دریافت SmsManager
-        sms_manager = SmsManager.getDefault()
+        if sms_manager is None:
+            sms_manager = java_class('SmsManager').getDefault()
         
-        # تقسیم پیامک در صورت طولانی بودن
-        parts = sms_manager.divideMessage(message)
+        # بخش‌های پیامک یک بار برای هر متن محاسبه و کش می‌شوند
+        segmented = segment_message(message)
         
-        if len(parts) == 1:
+        started = time.perf_counter()
+        if len(segmented.parts) == 1:
             # پیامک کوتاه
             sms_manager.sendTextMessage(
                 phone_number,
                 None,
                 message,
-                None,
-                None
+                sent_intents[0] if sent_intents else None,
+                delivery_intents[0] if delivery_intents else None
             )
         else:
             # پیامک طولانی
             sms_manager.sendMultipartTextMessage(
                 phone_number,
                 None,
-                parts,
-                None,
-                None
+                _java_list(segmented.parts),
+                _java_list(sent_intents) if sent_intents else None,
+                _java_list(delivery_intents) if delivery_intents else None
             )
+        _send_sms_time.observe_since(started)
+        _send_sms_ok.inc()
         
-        Logger.info(f"HelloSms: SMS sent successfully to {phone_number}")
+        Logger.info(f"HelloSms: SMS handed to SmsManager for {phone_number}")
         return True
     
     except Exception as e:
+        _send_sms_failed.inc()
         Logger.error(f"HelloSms: Error sending SMS: {e}")
         return False
 
 
+class AndroidSmsTransport(SmsTransport):
+    """
+    بک‌اند ارسال با SmsManager اندروید
+    
+    اگر limiter داده شود، سهمیه ارسال دستگاه را مدل می‌کند: با تمام شدن
+    توکن‌ها بک‌اند در دسترس نیست و FailoverTransport پیامک را به بک‌اند
+    بعدی (مثلاً درگاه HTTP) می‌دهد.
+    
+    با subscriptions، پاسخ از همان سیم‌کارتی ارسال می‌شود که تماس را دریافت
+    کرده است. اگر سهمیه آن خط (line_limiter_factory) تمام شده یا خط نامشخص
+    است، پیامک به صورت نوبتی از خط دیگری که سهمیه دارد ارسال می‌شود.
+    """
+    
+    name = 'android'
+    
+    def __init__(self, sms_manager=None, limiter=None, subscriptions=None, line_limiter_factory=None, **kwargs):
+        """
+        Args:
+            sms_manager: SmsManager ثابت برای همه پیامک‌ها (مثلاً FakeSmsManager)
+            limiter: SendRateLimiter سهمیه کل دستگاه
+            subscriptions: SubscriptionRegistry برای ارسال از سیم‌کارت مناسب
+            line_limiter_factory: تابع بدون آرگومان که SendRateLimiter سهمیه هر خط را می‌سازد
+        """
+        super().__init__(**kwargs)
+        self.sms_manager = sms_manager
+        self.limiter = limiter
+        self.subscriptions = subscriptions
+        self.line_limiter_factory = line_limiter_factory
+        self.line_limiters = {}
+        self.sent_by_line = {}
+        self._next_line = 0
+        self._lock = threading.Lock()
+    
+    def ready(self, message=None):
+        if (self.sms_manager is None and platform != 'android'
+                and (self.subscriptions is None or self.subscriptions.sms_manager_class is None)):
+            return False
+        if message is None:
+            return True
+        part_count = len(segment_message(message).parts)
+        if self.limiter and self.limiter.delay(part_count) > 0:
+            return False
+        return self._choose_line(None, part_count, advance=False) is not NO_LINE
+    
+    def send(self, phone_number, message, sent_intents=None, delivery_intents=None, subscription_id=None):
+        part_count = len(segment_message(message).parts)
+        line = self._choose_line(subscription_id, part_count)
+        if line is NO_LINE:
+            return False
+        if self.limiter and not self.limiter.try_take(part_count):
+            return False
+        line_limiter = self._line_limiter(line)
+        if line_limiter and not line_limiter.try_take(part_count):
+            return False
+        
+        sms_manager = self.sms_manager
+        if sms_manager is None and self.subscriptions is not None:
+            sms_manager = self.subscriptions.sms_manager(line)
+        sent = send_sms(phone_number, message, sent_intents, delivery_intents, sms_manager)
+        if sent:
+            with self._lock:
+                self.sent_by_line[line] = self.sent_by_line.get(line, 0) + 1
+        return sent
+    
+    def stats(self):
+        with self._lock:
+            stats = {'lines': dict(self.sent_by_line)}
+        if self.subscriptions is not None:
+            stats['subscriptions'] = self.subscriptions.stats()
+        return stats
+    
+    def _line_limiter(self, line):
+        """سهمیه یک خط (ساخته شده در اولین استفاده)"""
+        if line is None or self.line_limiter_factory is None:
+            return None
+        with self._lock:
+            limiter = self.line_limiters.get(line)
+            if limiter is None:
+                limiter = self.line_limiters[line] = self.line_limiter_factory()
+            return limiter
+    
+    def _line_ready(self, line, part_count):
+        limiter = self._line_limiter(line)
+        return limiter is None or limiter.delay(part_count) == 0
+    
+    def _choose_line(self, subscription_id, part_count, advance=True):
+        """
+        انتخاب سیم‌کارت ارسال
+        
+        Returns:
+            شناسه سیم‌کارت، None برای SmsManager پیش‌فرض، یا NO_LINE اگر سهمیه همه خط‌ها تمام شده
+        """
+        lines = self.subscriptions.subscription_ids() if self.subscriptions else ()
+        if not lines:
+            return None
+        if subscription_id in lines and self._line_ready(subscription_id, part_count):
+            return subscription_id
+        with self._lock:
+            start = self._next_line
+        for offset in range(len(lines)):
+            line = lines[(start + offset) % len(lines)]
+            if self._line_ready(line, part_count):
+                if advance:
+                    with self._lock:
+                        self._next_line = (start + offset + 1) % len(lines)
+                return line
+        return NO_LINE
+
+
+def start_monitor_service():
+    """
+    شروع foreground service مانیتورینگ از رابط کاربری
+    
+    python-for-android برای «services = Monitor:service.py» در buildozer.spec
+    کلاس <package>.ServiceMonitor را می‌سازد. شروع سرویسی که در حال اجراست
+    اثری ندارد.
+    """
+    if platform != 'android':
+        return
+    from jnius import autoclass
+    context = _context()
+    autoclass(f'{context.getPackageName()}.ServiceMonitor').start(context, '')
+
+
+def run_service(socket_path=None):
+    """
+    نقطه ورود سرویس مانیتورینگ (پروسه جدا از رابط کاربری)
+    
+    مانیتورینگ تماس، صف و ارسال پیامک در این پروسه اجرا می‌شوند و با بسته
+    شدن Activity از بین نمی‌روند؛ رابط کاربری از طریق ipc وضعیت را می‌خواند
+    و تنظیمات جدید را می‌فرستد. روی لینوکس سرویس با کلاس‌های جعلی
+    fake_android اجرا می‌شود و دستور call_state برای شبیه‌سازی تماس فعال است.
+    """
+    from ipc import IpcServer
+    from monitor_runtime import MonitorRuntime
+    
+    stopped = threading.Event()
+    looper = None
+    if platform == 'android':
+        # callback های PhoneStateListener روی Looper رشته سازنده اجرا می‌شوند
+        Looper = java_class('Looper')
+        Looper.prepare()
+        looper = Looper.myLooper()
+        # اندروید سرویس را بعد از kill شدن پروسه دوباره اجرا می‌کند
+        _context().setAutoRestartService(True)
+        runtime = MonitorRuntime()
+    else:
+        from contacts import ContactsIndex
+        from fake_android import (FakeSmsManagerClass, FakeSubscriptionManager, FakeContactsProvider,
+                                  fake_intent_factory)
+        sms_manager_class = FakeSmsManagerClass(
+            on_broadcast=lambda *report: runtime.delivery_tracker.handle_broadcast(*report))
+        contacts_provider = FakeContactsProvider()
+        runtime = MonitorRuntime(subscriptions=SubscriptionRegistry(sms_manager_class, FakeSubscriptionManager()),
+                                 intent_factory=fake_intent_factory, contacts=ContactsIndex(contacts_provider))
+    
+    def stop(request):
+        stopped.set()
+        if looper is not None:
+            looper.quitSafely()
+    
+    def export_metrics(request):
+        if request.get('write'):
+            metrics.write(METRICS_FILE)
+        return {'metrics': metrics.snapshot()}
+    
+    handlers = {
+        'status': lambda request: runtime.status(),
+        'settings': lambda request: runtime.update_settings(request['settings']),
+        'history': lambda request: runtime.history_summary(request.get('days', 7)),
+        'activity': lambda request: {'events': runtime.activity.since(request.get('since', 0))},
+        'metrics': export_metrics,
+        'stop': stop,
+    }
+    if platform != 'android':
+        handlers['call_state'] = lambda request: runtime.call_monitor.on_call_state(
+            request.get('sub'), request['state'], request.get('number'))
+        
+        def put_contact(request):
+            contacts_provider.put(request['id'], request.get('name', ''), request.get('numbers', ()))
+            runtime.contacts.request_sync(force=True)
+        
+        handlers['contact'] = put_contact
+    
+    server = IpcServer(handlers, socket_path or default_socket_path())
+    runtime.start()
+    server.start()
+    try:
+        if looper is not None:
+            java_class('Looper').loop()
+        else:
+            stopped.wait()
+    finally:
+        server.stop()
+        runtime.stop()
+        try:
+            metrics.write(METRICS_FILE)
+        except OSError as e:
+            Logger.error(f"HelloSms: Error writing metrics: {e}")
+        if platform == 'android' and stopped.is_set():
+            # توقف درخواست شده توسط کاربر - اجرای مجدد خودکار لازم نیست
+            _context().setAutoRestartService(False)
+        Logger.info("HelloSms: Monitor service stopped")
 
 
+if __name__ == '__main__':
+    run_service()
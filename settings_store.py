@@ -0,0 +1,202 @@
+"""
+ذخیره‌ساز تنظیمات - نوشتن اتمیک با تاخیر (write-behind) و بارگذاری مجدد با تغییر فایل
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+
+from kivy.logger import Logger
+
+from metrics import metrics
+
+# مسیر فایل تنظیمات
+SETTINGS_FILE = 'hellosms_settings.json'
+
+# تنظیمات پیش‌فرض وقتی فایل تنظیمات وجود ندارد
+DEFAULT_SETTINGS = {
+    'sms_enabled': {'value': True},
+    'sms_text': {'value': 'سلام، متأسفانه نتواستم تماس شما را پاسخ دهم. لطفاً در زمان دیگری تماس بگیرید.'}
+}
+
+# نسخه فعلی ساختار فایل تنظیمات
+SETTINGS_SCHEMA_VERSION = 1
+
+# کلید نسخه در فایل (جدا از تنظیمات {'کلید': {'value': ...}})
+SCHEMA_VERSION_KEY = 'schema_version'
+
+# تاخیر نوشتن تغییرات پشت سر هم (ثانیه)
+DEFAULT_WRITE_DELAY = 0.5
+
+_load_time = metrics.histogram('settings.load_seconds')
+_write_time = metrics.histogram('settings.write_seconds')
+_write_errors = metrics.counter('settings.write_errors')
+_reloads = metrics.counter('settings.reloads')
+
+
+def _migrate_v0(data):
+    """فایل‌های قبل از نسخه‌بندی همان ساختار {'کلید': {'value': ...}} را دارند"""
+    return data
+
+
+# مهاجرت از هر نسخه به نسخه بعدی
+MIGRATIONS = {
+    0: _migrate_v0,
+}
+
+
+class SettingsStore:
+    """
+    تنظیمات برنامه با شکل {'کلید': {'value': ...}}
+
+    data همیشه همان dict است (بارگذاری مجدد آن را در جا به‌روز می‌کند)، پس
+    ارجاع‌های دیگر به آن معتبر می‌مانند. set تغییر را در حافظه اعمال و نوشتن
+    را write_delay ثانیه عقب می‌اندازد تا تغییرات پشت سر هم یک بار نوشته
+    شوند. نوشتن با فایل موقت و rename اتمیک است و reload_if_changed فقط با
+    یک stat (mtime، inode، اندازه) تغییر فایل توسط پروسه دیگر را تشخیص می‌دهد.
+    """
+
+    def __init__(self, path=SETTINGS_FILE, defaults=None, write_delay=DEFAULT_WRITE_DELAY):
+        self.path = path
+        self.defaults = defaults or {}
+        self.write_delay = write_delay
+        self.data = {}
+        self._signature = None
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def load(self):
+        """
+        بارگذاری تنظیمات از فایل (یا پیش‌فرض‌ها اگر فایل نباشد یا خراب باشد)
+
+        Returns:
+            dict: data
+        """
+        with self._lock:
+            started = time.perf_counter()
+            signature = self._stat()
+            loaded = None
+            if signature is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        loaded = self._migrate(json.load(f))
+                except Exception as e:
+                    Logger.error(f"HelloSms: Error loading settings: {e}")
+            _load_time.observe_since(started)
+            self.data.clear()
+            self.data.update(loaded if loaded is not None else copy.deepcopy(self.defaults))
+            self._signature = signature
+            self._dirty = False
+            return self.data
+
+    def reload_if_changed(self):
+        """
+        بارگذاری مجدد اگر فایل بعد از آخرین خواندن/نوشتن عوض شده باشد
+
+        Returns:
+            bool: True اگر تنظیمات دوباره بارگذاری شد
+        """
+        if not self.changed():
+            return False
+        self.load()
+        _reloads.inc()
+        Logger.info("HelloSms: Settings reloaded after external change")
+        return True
+
+    def changed(self):
+        """آیا فایل بعد از آخرین خواندن/نوشتن عوض شده است (فقط یک stat)"""
+        signature = self._stat()
+        with self._lock:
+            # تغییرات نوشته نشده این پروسه بر فایل اولویت دارند
+            return signature != self._signature and not self._dirty
+
+    def update(self, data):
+        """
+        جایگزینی تنظیمات حافظه با نسخه پروسه دیگر (بدون نوشتن فایل)
+
+        فایل فعلی نسخه‌ای از همین تنظیمات فرض می‌شود تا reload_if_changed
+        آن را دوباره بارگذاری نکند.
+        """
+        with self._lock:
+            self.data.clear()
+            self.data.update(data)
+            self._signature = self._stat()
+
+    def get(self, key, default=None):
+        return self.data.get(key, {}).get('value', default)
+
+    def set(self, key, value):
+        """تغییر یک تنظیم و زمان‌بندی نوشتن با تاخیر"""
+        with self._lock:
+            self.data[key] = {'value': value}
+            self.schedule_write()
+
+    def schedule_write(self):
+        """علامت‌گذاری تغییر و نوشتن بعد از write_delay (تغییرات بعدی تایمر را تمدید می‌کنند)"""
+        with self._lock:
+            self._dirty = True
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.write_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def save(self):
+        """نوشتن فوری همه تنظیمات (مثلاً با دکمه ذخیره)"""
+        with self._lock:
+            self._dirty = True
+            return self.flush()
+
+    def flush(self):
+        """
+        نوشتن تغییرات در انتظار؛ بدون تغییر کاری انجام نمی‌دهد
+
+        Returns:
+            bool: False اگر نوشتن فایل ناموفق بود
+        """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return True
+            started = time.perf_counter()
+            payload = dict(self.data)
+            payload[SCHEMA_VERSION_KEY] = SETTINGS_SCHEMA_VERSION
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                _write_errors.inc()
+                Logger.error(f"HelloSms: Error saving settings: {e}")
+                return False
+            _write_time.observe_since(started)
+            self._signature = self._stat()
+            self._dirty = False
+            return True
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_ino, st.st_size
+
+    def _migrate(self, data):
+        """اعمال مهاجرت‌ها تا نسخه فعلی و حذف کلید نسخه از تنظیمات"""
+        if not isinstance(data, dict):
+            raise ValueError("settings file is not a JSON object")
+        version = data.pop(SCHEMA_VERSION_KEY, 0)
+        if version > SETTINGS_SCHEMA_VERSION:
+            Logger.warning(f"HelloSms: Settings schema {version} is newer than {SETTINGS_SCHEMA_VERSION}")
+        while version < SETTINGS_SCHEMA_VERSION:
+            data = MIGRATIONS[version](data)
+            version += 1
+        return data
@@ -0,0 +1,339 @@
+"""
+پیگیری وضعیت ارسال و تحویل پیامک و ارسال مجدد با تاخیر نمایی
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from kivy.logger import Logger
+
+from sms_segment import segment_message
+
+# اکشن‌های Intent برای گزارش ارسال و تحویل
+SMS_SENT_ACTION = 'org.hellosms.SMS_SENT'
+SMS_DELIVERED_ACTION = 'org.hellosms.SMS_DELIVERED'
+
+# وضعیت پیامک‌های در جریان
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DELIVERED = 'delivered'
+STATUS_RETRY = 'retry'
+STATUS_FAILED = 'failed'
+
+# پیش‌فرض‌های ارسال مجدد
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 5
+DEFAULT_MAX_DELAY = 300
+
+# تلاشی که گزارش ارسال همه بخش‌هایش در این مدت (ثانیه) نرسد ناموفق اعلام می‌شود
+SENT_REPORT_TIMEOUT = 300
+# پیامک ارسال شده بدون گزارش تحویل بعد از این مدت (ثانیه) از جدول حذف می‌شود
+DELIVERY_REPORT_TIMEOUT = 3600
+
+
+def backoff_delay(attempt, base=DEFAULT_BASE_DELAY, cap=DEFAULT_MAX_DELAY, rng=random):
+    """
+    تاخیر تلاش بعدی با رشد نمایی و jitter
+
+    نیمی از تاخیر ثابت و نیم دیگر تصادفی است تا ارسال‌های مجدد چند پیامک
+    ناموفق همزمان روی هم نیفتند.
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+class RetryScheduler:
+    """اجرای توابع در زمان مشخص با یک رشته و heap زمانی"""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='HelloSmsRetry', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def schedule(self, delay, func, *args):
+        """اجرای func(*args) بعد از delay ثانیه"""
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), func, args))
+            self._cond.notify()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+                _, _, func, args = heapq.heappop(self._heap)
+            try:
+                func(*args)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in retry scheduler: {e}")
+
+
+class InFlightMessage:
+    """یک ردیف از جدول پیامک‌های در جریان"""
+
+    __slots__ = ('msg_id', 'phone_number', 'message', 'part_count', 'subscription_id', 'attempts',
+                 'status', 'sent_parts', 'failed_parts', 'delivered_parts', 'on_done')
+
+    def __init__(self, msg_id, phone_number, message, part_count, subscription_id=None, on_done=None):
+        self.msg_id = msg_id
+        self.phone_number = phone_number
+        self.message = message
+        self.part_count = part_count
+        self.subscription_id = subscription_id
+        self.attempts = 0
+        self.status = STATUS_SENDING
+        self.sent_parts = set()
+        self.failed_parts = set()
+        self.delivered_parts = set()
+        self.on_done = on_done
+
+    def as_dict(self):
+        return {
+            'id': self.msg_id,
+            'to': self.phone_number,
+            'parts': self.part_count,
+            'attempts': self.attempts,
+            'status': self.status,
+        }
+
+
+class DeliveryTracker:
+    """
+    جدول پیامک‌های در جریان و هماهنگی گزارش‌های ارسال/تحویل
+
+    هر بخش پیامک یک PendingIntent ارسال و یک PendingIntent تحویل با شناسه
+    پیامک و شماره بخش دارد. وقتی گزارش ارسال همه بخش‌ها رسید، پیامک موفق
+    یا ناموفق اعلام می‌شود؛ پیامک ناموفق تا max_attempts بار با تاخیر
+    نمایی دوباره ارسال می‌شود.
+
+    مهلت گزارش‌ها با همان زمان‌بند ارسال مجدد (heap زمانی) پیگیری می‌شود:
+    تلاشی که گزارش ارسالش تا SENT_REPORT_TIMEOUT نرسد ناموفق اعلام و پیامک
+    ارسال شده بدون گزارش تحویل بعد از DELIVERY_REPORT_TIMEOUT حذف می‌شود.
+    """
+
+    def __init__(self, send_func, intent_factory=None, on_result=None,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY):
+        """
+        Args:
+            send_func: send_func(phone_number, message, sent_intents, delivery_intents,
+                                 subscription_id) -> bool
+            intent_factory: intent_factory(action, msg_id, part) -> PendingIntent
+                            (None یعنی بدون گزارش؛ ارسال بدون خطا موفق حساب می‌شود)
+            on_result: on_result(phone_number, message, success) برای نتیجه نهایی
+        """
+        self.send_func = send_func
+        self.intent_factory = intent_factory
+        self.on_result = on_result
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # SendRateLimiter اختیاری برای ارسال‌های مجدد (تلاش اول از سهمیه صف استفاده می‌کند)
+        self.limiter = None
+        self.scheduler = RetryScheduler()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._next_id = itertools.count(1)
+
+    def start(self):
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+
+    def send(self, phone_number, message, subscription_id=None, on_done=None):
+        """
+        ثبت و ارسال یک پیامک (امضای سازگار با sender در SmsQueue با deferred)
+
+        Args:
+            on_done: on_done(success) اختیاری که همراه on_result با نتیجه نهایی
+                     (بعد از همه ارسال‌های مجدد) فراخوانی می‌شود
+
+        Returns:
+            bool: همیشه True - نتیجه نهایی از طریق on_result و on_done اعلام می‌شود
+        """
+        record = InFlightMessage(next(self._next_id), phone_number, message,
+                                 len(segment_message(message).parts), subscription_id, on_done)
+        with self._lock:
+            self._in_flight[record.msg_id] = record
+        self._attempt(record.msg_id)
+        return True
+
+    def in_flight(self):
+        """تصویر جدول پیامک‌های در جریان"""
+        with self._lock:
+            return [record.as_dict() for record in self._in_flight.values()]
+
+    def _attempt(self, msg_id):
+        """یک تلاش ارسال برای پیامک"""
+        with self._lock:
+            record = self._in_flight.get(msg_id)
+            if record is None:
+                return
+            retry = record.attempts > 0
+
+        limiter = self.limiter
+        if retry and limiter:
+            # ارسال‌های مجدد مستقیم به بک‌اند می‌روند و باید از همان سهمیه صف بگیرند
+            delay = limiter.delay_or_take(record.part_count)
+            if delay > 0:
+                self.scheduler.schedule(delay, self._attempt, msg_id)
+                return
+
+        with self._lock:
+            if self._in_flight.get(msg_id) is not record:
+                return
+            record.attempts += 1
+            record.status = STATUS_SENDING
+            record.sent_parts.clear()
+            record.failed_parts.clear()
+            attempt = record.attempts
+
+        sent_intents = delivery_intents = None
+        if self.intent_factory:
+            self.scheduler.schedule(SENT_REPORT_TIMEOUT, self._expire, msg_id, attempt, STATUS_SENDING)
+            parts = range(record.part_count)
+            sent_intents = [self.intent_factory(SMS_SENT_ACTION, msg_id, part) for part in parts]
+            delivery_intents = [self.intent_factory(SMS_DELIVERED_ACTION, msg_id, part) for part in parts]
+
+        try:
+            accepted = self.send_func(record.phone_number, record.message, sent_intents, delivery_intents,
+                                      record.subscription_id)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error sending SMS {msg_id}: {e}")
+            accepted = False
+
+        if not accepted:
+            self._finish_attempt(msg_id, False)
+        elif not self.intent_factory:
+            self._finish_attempt(msg_id, True)
+
+    def handle_broadcast(self, action, msg_id, part, success):
+        """
+        گزارش ارسال یا تحویل یک بخش (از BroadcastReceiver یا SmsManager جعلی)
+
+        Args:
+            action: SMS_SENT_ACTION یا SMS_DELIVERED_ACTION
+            msg_id: شناسه پیامک
+            part: شماره بخش
+            success: نتیجه گزارش
+        """
+        if action == SMS_DELIVERED_ACTION:
+            self._handle_delivered(msg_id, part, success)
+            return
+
+        with self._lock:
+            record = self._in_flight.get(msg_id)
+            if record is None or record.status != STATUS_SENDING:
+                return
+            (record.sent_parts if success else record.failed_parts).add(part)
+            if len(record.sent_parts) + len(record.failed_parts) < record.part_count:
+                return
+            all_sent = not record.failed_parts
+        self._finish_attempt(msg_id, all_sent)
+
+    def _handle_delivered(self, msg_id, part, success):
+        """گزارش تحویل یک بخش؛ با تحویل همه بخش‌ها پیامک از جدول حذف می‌شود"""
+        if not success:
+            return
+        with self._lock:
+            record = self._in_flight.get(msg_id)
+            if record is None:
+                return
+            record.delivered_parts.add(part)
+            if len(record.delivered_parts) < record.part_count:
+                return
+            # گزارش تحویل ممکن است زودتر از گزارش ارسال برسد، یا همه بخش‌ها
+            # در مجموع چند تلاش تحویل شده باشند در حالی که تلاش بعدی در انتظار است
+            report_sent = record.status in (STATUS_SENDING, STATUS_RETRY)
+            record.status = STATUS_DELIVERED
+            del self._in_flight[msg_id]
+        Logger.info(f"HelloSms: SMS {msg_id} delivered to {record.phone_number}")
+        if report_sent:
+            self._report(record, True)
+
+    def _finish_attempt(self, msg_id, success):
+        """پایان یک تلاش - اعلام نتیجه یا زمان‌بندی تلاش بعدی"""
+        with self._lock:
+            record = self._in_flight.get(msg_id)
+            if record is None:
+                return
+            if success:
+                record.status = STATUS_SENT
+                if not self.intent_factory:
+                    del self._in_flight[msg_id]
+                else:
+                    self.scheduler.schedule(DELIVERY_REPORT_TIMEOUT, self._expire, msg_id, record.attempts,
+                                            STATUS_SENT)
+            elif record.attempts < self.max_attempts:
+                record.status = STATUS_RETRY
+                delay = backoff_delay(record.attempts - 1, self.base_delay, self.max_delay)
+                Logger.warning(f"HelloSms: SMS {msg_id} failed, retry {record.attempts} in {delay:.1f}s")
+                self.scheduler.schedule(delay, self._attempt, msg_id)
+                return
+            else:
+                record.status = STATUS_FAILED
+                del self._in_flight[msg_id]
+
+        self._report(record, success)
+
+    def _report(self, record, success):
+        """اعلام نتیجه نهایی یک پیامک"""
+        if record.on_done:
+            try:
+                record.on_done(success)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in SMS completion callback: {e}")
+        if self.on_result:
+            try:
+                self.on_result(record.phone_number, record.message, success)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in delivery callback: {e}")
+
+    def _expire(self, msg_id, attempt, status):
+        """پایان مهلت گزارش یک تلاش (اگر پیامک هنوز در همان تلاش و وضعیت مانده باشد)"""
+        with self._lock:
+            record = self._in_flight.get(msg_id)
+            if record is None or record.attempts != attempt or record.status != status:
+                return
+            del self._in_flight[msg_id]
+            if status == STATUS_SENT:
+                # نتیجه قبلاً اعلام شده است؛ فقط گزارش تحویل هرگز نرسید
+                return
+            record.status = STATUS_FAILED
+        # پیامک ممکن است ارسال شده باشد، پس به جای ارسال مجدد ناموفق اعلام می‌شود
+        Logger.warning(f"HelloSms: No sent report for SMS {msg_id} in {SENT_REPORT_TIMEOUT}s, giving up")
+        self._report(record, False)
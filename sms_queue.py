@@ -0,0 +1,218 @@
+"""
+صف پایدار ارسال پیامک - ارسال در یک رشته جداگانه با ژورنال روی دیسک
+"""
+
+import heapq
+import threading
+import time
+
+from kivy.logger import Logger
+
+from journal import Journal
+from metrics import metrics
+from send_scheduler import PRIORITY_NORMAL
+from sms_segment import segment_message
+
+# مسیر فایل ژورنال صف ارسال
+OUTBOX_JOURNAL_FILE = 'hellosms_outbox.journal'
+
+# بعد از این تعداد رکورد، وقتی صف خالی شد ژورنال کوتاه می‌شود
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+_enqueue_to_sent = metrics.histogram('sms.enqueue_to_sent_seconds')
+
+
+class SmsQueue:
+    """
+    صف اولویت‌دار ارسال پیامک با رشته کارگر اختصاصی
+
+    enqueue فقط رکورد را به انتهای ژورنال اضافه می‌کند و برمی‌گردد؛ ارسال
+    واقعی در رشته کارگر انجام می‌شود. پیامک‌ها به ترتیب اولویت و سپس ترتیب
+    ورود ارسال می‌شوند و در صورت وجود limiter، کارگر تا آزاد شدن توکن
+    منتظر می‌ماند (پیامک با اولویت بالاتر در این مدت جلو می‌افتد).
+    پیامک‌هایی که قبل از مرگ پروسه ارسال نشده‌اند در start دوباره صف
+    می‌شوند (ارسال حداقل یک بار).
+
+    با deferred، sender نتیجه نهایی را بعداً (مثلاً بعد از گزارش ارسال و
+    ارسال‌های مجدد) با done(success) اعلام می‌کند و رکورد done ژورنال تا آن
+    زمان نوشته نمی‌شود؛ پس پیامکی که هنوز در انتظار تلاش بعدی است بعد از
+    مرگ پروسه از دست نمی‌رود.
+    """
+
+    def __init__(self, sender, journal_path=OUTBOX_JOURNAL_FILE, on_result=None, limiter=None, deferred=False):
+        """
+        Args:
+            sender: تابع ارسال با امضای sender(phone_number, message, subscription_id) -> bool
+                    (با deferred: sender(phone_number, message, subscription_id, done) که
+                    done(success) را یک بار با نتیجه نهایی فراخوانی می‌کند)
+            journal_path: مسیر فایل ژورنال
+            on_result: تابع اختیاری on_result(phone_number, message, success)
+                       که بعد از نتیجه نهایی هر پیامک فراخوانی می‌شود
+            limiter: SendRateLimiter اختیاری برای محدود کردن نرخ ارسال
+            deferred: نتیجه ارسال با done اعلام می‌شود نه با مقدار برگشتی sender
+        """
+        self.sender = sender
+        self.on_result = on_result
+        self.journal_path = journal_path
+        self.limiter = limiter
+        self.deferred = deferred
+        # (اولویت، شناسه، شماره، متن، زمان ورود، شناسه سیم‌کارت)
+        self._pending = []
+        # شناسه پیامک‌های تحویل شده به sender که نتیجه نهایی آن‌ها نرسیده
+        self._in_flight = set()
+        self._cond = threading.Condition()
+        self._journal = Journal(journal_path, 'SMS')
+        self._next_id = 1
+        self._running = False
+        self._thread = None
+        self._sent_count = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def start(self):
+        """بازخوانی ژورنال و راه‌اندازی رشته کارگر"""
+        with self._cond:
+            if self._running:
+                return
+            self._replay_journal()
+            self._journal.open()
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='HelloSmsQueue', daemon=True)
+        self._thread.start()
+        Logger.info(f"HelloSms: SMS queue started ({len(self._pending)} pending)")
+
+    def stop(self, timeout=5):
+        """توقف رشته کارگر؛ پیامک‌های باقی‌مانده در ژورنال می‌مانند"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            self._journal.close()
+
+    def enqueue(self, phone_number, message, priority=PRIORITY_NORMAL, subscription_id=None):
+        """
+        اضافه کردن یک پیامک به صف
+
+        Args:
+            subscription_id: سیم‌کارتی که تماس را دریافت کرده (None یعنی نامشخص)
+
+        Returns:
+            int: شناسه پیامک در صف
+        """
+        queued_at = time.time()
+        with self._cond:
+            msg_id = self._next_id
+            self._next_id += 1
+            self._journal.append({'op': 'add', 'id': msg_id, 'to': phone_number, 'text': message,
+                                  'pri': priority, 'ts': queued_at, 'sub': subscription_id})
+            heapq.heappush(self._pending, (priority, msg_id, phone_number, message, queued_at, subscription_id))
+            self._cond.notify()
+        return msg_id
+
+    def pending_count(self):
+        """تعداد پیامک‌های در انتظار ارسال"""
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        """عمق صف و زمان انتظار پیامک‌ها از ورود تا ارسال (ثانیه)"""
+        with self._cond:
+            oldest = min((item[4] for item in self._pending), default=None)
+            return {
+                'depth': len(self._pending),
+                'in_flight': len(self._in_flight),
+                'oldest_wait': round(time.time() - oldest, 3) if oldest else 0.0,
+                'sent': self._sent_count,
+                'last_wait': round(self._last_wait, 3),
+                'avg_wait': round(self._total_wait / self._sent_count, 3) if self._sent_count else 0.0,
+                'max_wait': round(self._max_wait, 3),
+            }
+
+    def _replay_journal(self):
+        """خواندن ژورنال و بازسازی صف پیامک‌های ارسال‌نشده"""
+        records, max_id = self._journal.replay()
+        self._pending = [(record.get('pri', PRIORITY_NORMAL), msg_id, record.get('to'), record.get('text'),
+                          record.get('ts', time.time()), record.get('sub'))
+                         for msg_id, record in records.items()]
+        heapq.heapify(self._pending)
+        self._next_id = max_id + 1
+        if records:
+            Logger.info(f"HelloSms: Replaying {len(records)} pending SMS from journal")
+        self._journal.rewrite(records.values())
+
+    def _next_ready(self):
+        """
+        انتظار تا پیامک بعدی قابل ارسال شود (باید با قفل فراخوانی شود)
+
+        Returns:
+            آیتم صف یا None اگر صف متوقف شد
+        """
+        while self._running:
+            if not self._pending:
+                self._cond.wait()
+                continue
+            if self.limiter:
+                part_count = len(segment_message(self._pending[0][3]).parts)
+                # محدودکننده با ارسال‌های مجدد DeliveryTracker مشترک است
+                delay = self.limiter.delay_or_take(part_count)
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            return heapq.heappop(self._pending)
+        return None
+
+    def _run(self):
+        """حلقه رشته کارگر"""
+        while True:
+            with self._cond:
+                item = self._next_ready()
+                if item is None:
+                    return
+                _, msg_id, phone_number, message, queued_at, subscription_id = item
+                wait = time.time() - queued_at
+                self._sent_count += 1
+                self._total_wait += wait
+                self._last_wait = wait
+                self._max_wait = max(self._max_wait, wait)
+                self._in_flight.add(msg_id)
+
+            done = lambda success, msg_id=msg_id, phone_number=phone_number, message=message: \
+                self._complete(msg_id, phone_number, message, success)
+            try:
+                if self.deferred:
+                    self.sender(phone_number, message, subscription_id, done)
+                else:
+                    success = self.sender(phone_number, message, subscription_id)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in SMS queue sender: {e}")
+                success = False
+            else:
+                if self.deferred:
+                    success = None
+            # از ورود به صف تا برگشت sender (شامل انتظار برای سهمیه و فراخوانی SmsManager)
+            _enqueue_to_sent.observe(time.time() - queued_at)
+            if success is not None:
+                done(success)
+
+    def _complete(self, msg_id, phone_number, message, success):
+        """نتیجه نهایی یک پیامک: نوشتن رکورد done و فراخوانی on_result"""
+        with self._cond:
+            if msg_id not in self._in_flight:
+                return
+            self._in_flight.discard(msg_id)
+            self._journal.append({'op': 'done', 'id': msg_id})
+            # پیامک‌های در جریان هنوز رکورد add خود را در ژورنال لازم دارند
+            if not self._pending and not self._in_flight and self._journal.records >= JOURNAL_COMPACT_THRESHOLD:
+                self._journal.truncate()
+
+        if self.on_result:
+            try:
+                self.on_result(phone_number, message, success)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in SMS queue callback: {e}")
@@ -0,0 +1,81 @@
+"""
+تقسیم پیامک به بخش‌ها (GSM-7 / UCS-2) بدون نیاز به SmsManager
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+# الفبای پیش‌فرض GSM 03.38 (هر کاراکتر یک septet)
+GSM7_BASIC = frozenset(
+    '@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?'
+    '¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà'
+)
+
+# جدول توسعه GSM 03.38 (هر کاراکتر دو septet: ESC + کاراکتر)
+GSM7_EXTENDED = frozenset('^{}\\[~]|€\f')
+
+# ظرفیت هر بخش (septet برای GSM-7، واحد UTF-16 برای UCS-2)
+GSM7_SINGLE_LIMIT = 160
+GSM7_MULTI_LIMIT = 153
+UCS2_SINGLE_LIMIT = 70
+UCS2_MULTI_LIMIT = 67
+
+ENCODING_GSM7 = 'GSM-7'
+ENCODING_UCS2 = 'UCS-2'
+
+# نتیجه تقسیم پیامک
+#   encoding: GSM-7 یا UCS-2
+#   parts: تاپل متن بخش‌ها
+#   units: طول کل (septet یا واحد UTF-16)
+SegmentedMessage = namedtuple('SegmentedMessage', 'encoding parts units')
+
+
+def _gsm7_units(ch):
+    """تعداد septet یک کاراکتر یا 0 اگر در GSM-7 نیست"""
+    if ch in GSM7_BASIC:
+        return 1
+    if ch in GSM7_EXTENDED:
+        return 2
+    return 0
+
+
+def _split(text, unit_sizes, limit):
+    """تقسیم متن بدون شکستن کاراکترهای چند واحدی بین دو بخش"""
+    parts = []
+    start = 0
+    used = 0
+    for index, size in enumerate(unit_sizes):
+        if used + size > limit:
+            parts.append(text[start:index])
+            start = index
+            used = 0
+        used += size
+    parts.append(text[start:])
+    return tuple(parts)
+
+
+@lru_cache(maxsize=64)
+def segment_message(message):
+    """
+    محاسبه کدگذاری، بخش‌ها و نقاط تقسیم یک پیامک (با کش)
+
+    قواعد همان قواعد SmsManager.divideMessage برای الفبای پیش‌فرض است:
+    پیامک تک‌بخشی تا 160 septet یا 70 واحد UCS-2، و در پیامک چندبخشی
+    153 یا 67 واحد در هر بخش (بقیه برای سرآیند UDH). کاراکترهای جدول
+    توسعه GSM و جفت‌های surrogate بین دو بخش شکسته نمی‌شوند.
+    """
+    if not message:
+        return SegmentedMessage(ENCODING_GSM7, ('',), 0)
+
+    gsm_sizes = [_gsm7_units(ch) for ch in message]
+    if all(gsm_sizes):
+        units = sum(gsm_sizes)
+        if units <= GSM7_SINGLE_LIMIT:
+            return SegmentedMessage(ENCODING_GSM7, (message,), units)
+        return SegmentedMessage(ENCODING_GSM7, _split(message, gsm_sizes, GSM7_MULTI_LIMIT), units)
+
+    ucs2_sizes = [2 if ord(ch) > 0xFFFF else 1 for ch in message]
+    units = sum(ucs2_sizes)
+    if units <= UCS2_SINGLE_LIMIT:
+        return SegmentedMessage(ENCODING_UCS2, (message,), units)
+    return SegmentedMessage(ENCODING_UCS2, _split(message, ucs2_sizes, UCS2_MULTI_LIMIT), units)
@@ -0,0 +1,114 @@
+"""
+قالب پیامک با متغیرهای هر تماس - کامپایل یک باره به تابع render
+
+نحو قالب:
+    {name}                  جایگذاری متغیر
+    {?name}...{/name}       بخش شرطی - فقط اگر متغیر مقدار داشته باشد
+    {!name}...{/name}       بخش شرطی - فقط اگر متغیر خالی باشد
+    {{ و }}                 آکولاد معمولی
+"""
+
+import re
+from collections import namedtuple
+
+# متغیرهای قابل استفاده در قالب
+TEMPLATE_VARIABLES = (
+    'name',             # نام مخاطب
+    'number',           # شماره تماس‌گیرنده
+    'time_of_day',      # صبح / ظهر / عصر / شب
+    'call_count',       # تعداد تماس‌های از دست رفته امروز از این شماره
+    'callback_window',  # بازه زمانی تماس مجدد از تنظیمات
+)
+
+_TOKEN_RE = re.compile(r'\{\{|\}\}|\{([?!/]?)(\w*)\}|[{}]')
+
+# قالب کامپایل شده
+#   source: متن اصلی قالب
+#   variables: مجموعه متغیرهای استفاده شده
+#   render: تابع render(values) که values یک dict از نام متغیر به مقدار است
+CompiledTemplate = namedtuple('CompiledTemplate', 'source variables render')
+
+
+class TemplateError(ValueError):
+    """خطای نحوی یا متغیر ناشناخته در قالب"""
+
+
+def _parse(source):
+    """تبدیل قالب به لیست عبارت‌های پایتون که با + به هم الحاق می‌شوند"""
+    stack = [('', [])]
+    variables = set()
+    literal = []
+    position = 0
+
+    def flush():
+        if literal:
+            stack[-1][1].append(repr(''.join(literal)))
+            literal.clear()
+
+    for match in _TOKEN_RE.finditer(source):
+        literal.append(source[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+        if token in ('{{', '}}'):
+            literal.append(token[0])
+            continue
+
+        kind, name = match.group(1), match.group(2)
+        if token in ('{', '}') or not name:
+            raise TemplateError(f"unexpected {token!r} at position {match.start()}")
+        if name not in TEMPLATE_VARIABLES:
+            raise TemplateError(f"unknown variable {name!r} at position {match.start()}")
+        flush()
+
+        if kind == '':
+            variables.add(name)
+            stack[-1][1].append(f'str(v.get({name!r}, ""))')
+        elif kind in ('?', '!'):
+            variables.add(name)
+            stack.append((kind + name, []))
+        else:
+            opened, parts = stack.pop() if len(stack) > 1 else ('', None)
+            if parts is None or opened[1:] != name:
+                raise TemplateError(f"unmatched {{/{name}}} at position {match.start()}")
+            body = ' + '.join(parts) if parts else "''"
+            test = f'v.get({name!r})' if opened[0] == '?' else f'not v.get({name!r})'
+            stack[-1][1].append(f"(({body}) if {test} else '')")
+
+    literal.append(source[position:])
+    flush()
+    if len(stack) > 1:
+        raise TemplateError(f"unclosed {{{stack[-1][0]}}} section")
+    return stack[0][1], variables
+
+
+def compile_template(source):
+    """
+    اعتبارسنجی و کامپایل قالب
+
+    قالب یک بار به یک تابع پایتون تبدیل می‌شود تا render فقط الحاق رشته
+    باشد و در زمان ارسال هیچ تجزیه‌ای انجام نشود.
+
+    Raises:
+        TemplateError: در صورت متغیر ناشناخته یا بخش شرطی نامتوازن
+    """
+    parts, variables = _parse(source)
+    body = ' + '.join(parts) if parts else "''"
+    namespace = {}
+    exec(compile(f'def render(v):\n    return {body}\n', '<sms template>', 'exec'), namespace)
+    return CompiledTemplate(source, frozenset(variables), namespace['render'])
+
+
+def literal_template(text):
+    """قالبی که متن را بدون هیچ جایگذاری برمی‌گرداند (برای متن‌های قدیمی نامعتبر)"""
+    return CompiledTemplate(text, frozenset(), lambda v: text)
+
+
+def time_of_day(hour):
+    """نام بخش روز برای یک ساعت (0 تا 23)"""
+    if 5 <= hour < 12:
+        return 'صبح'
+    if 12 <= hour < 15:
+        return 'ظهر'
+    if 15 <= hour < 19:
+        return 'عصر'
+    return 'شب'
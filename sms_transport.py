@@ -0,0 +1,362 @@
+"""
+بک‌اندهای ارسال پیامک - رابط مشترک، درگاه HTTP و جابجایی خودکار بین بک‌اندها
+
+بک‌اند SmsManager اندروید در service.py قرار دارد.
+
+پروتکل درگاه HTTP:
+    POST <url> با بدنه {"messages": [{"to": "+98...", "text": "..."}, ...]}
+    پاسخ 2xx یعنی پذیرش؛ بدنه اختیاری {"results": [{"ok": true}, ...]}
+    نتیجه هر پیامک را به همان ترتیب مشخص می‌کند.
+"""
+
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from kivy.logger import Logger
+
+# Activity.RESULT_OK و SmsManager.RESULT_ERROR_GENERIC_FAILURE - کد نتیجه گزارش ارسال
+RESULT_OK = -1
+RESULT_ERROR_GENERIC_FAILURE = 1
+
+# مدت کنار گذاشتن بک‌اند بعد از خطا (ثانیه)
+DEFAULT_FAILURE_BACKOFF = 30
+
+# پیش‌فرض‌های درگاه HTTP
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_BATCH_WINDOW = 0.2
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TIMEOUT = 10
+
+
+def fire_pending_intent(intent, success):
+    """اجرای PendingIntent گزارش ارسال با همان کد نتیجه‌ای که SmsManager می‌فرستد"""
+    intent.send(RESULT_OK if success else RESULT_ERROR_GENERIC_FAILURE)
+
+
+class SmsTransport:
+    """
+    رابط بک‌اند ارسال پیامک
+
+    send همان امضای send_func در DeliveryTracker را دارد و subscription_id
+    سیم‌کارت ترجیحی برای ارسال است. اگر sent_intents داده شود، بک‌اند باید
+    نتیجه هر بخش را از طریق آن‌ها گزارش کند؛ در غیر این صورت مقدار بازگشتی
+    نتیجه ارسال است.
+    """
+
+    name = 'transport'
+
+    def __init__(self, failure_backoff=DEFAULT_FAILURE_BACKOFF):
+        self.failure_backoff = failure_backoff
+        self._down_until = 0.0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def available(self, message=None):
+        """آیا بک‌اند می‌تواند همین حالا پیامک message را بپذیرد"""
+        return not self.is_down() and self.ready(message)
+
+    def ready(self, message=None):
+        """آیا بک‌اند (صرف نظر از کنار گذاشته شدن بعد از خطا) سهمیه ارسال message را دارد"""
+        return True
+
+    def is_down(self):
+        """آیا بک‌اند بعد از خطای اتصال یا بک‌اند کنار گذاشته شده است"""
+        return time.monotonic() < self._down_until
+
+    def mark_down(self):
+        """کنار گذاشتن بک‌اند به مدت failure_backoff ثانیه"""
+        self._down_until = time.monotonic() + self.failure_backoff
+
+    def send(self, phone_number, message, sent_intents=None, delivery_intents=None, subscription_id=None):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class HttpGatewayTransport(SmsTransport):
+    """
+    ارسال از طریق درگاه پیامک HTTP با اتصال‌های keep-alive و ارسال دسته‌ای
+
+    اتصال‌های بیکار در یک pool نگه داشته می‌شوند تا هر درخواست هزینه
+    اتصال TCP/TLS نداشته باشد. وقتی گزارش ارسال خواسته شده و رشته دسته‌بندی
+    فعال است، send فقط پیامک را به دسته جاری اضافه می‌کند؛ دسته با رسیدن به
+    batch_size یا بعد از batch_window ثانیه در یک درخواست ارسال می‌شود و
+    نتیجه از طریق PendingIntent ها گزارش می‌شود.
+    """
+
+    name = 'http'
+
+    def __init__(self, url, token=None, batch_size=DEFAULT_BATCH_SIZE, batch_window=DEFAULT_BATCH_WINDOW,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, report=fire_pending_intent,
+                 failure_backoff=DEFAULT_FAILURE_BACKOFF):
+        """
+        Args:
+            url: آدرس کامل درگاه (http یا https)
+            token: توکن اختیاری برای هدر Authorization
+            pool_size: حداکثر اتصال‌های بیکار نگه داشته شده (0 یعنی بدون keep-alive)
+            report: report(intent, success) برای گزارش نتیجه هر بخش
+        """
+        super().__init__(failure_backoff)
+        # http.client (و ssl/email) فقط وقتی درگاه تنظیم شده بارگذاری می‌شود
+        import http.client
+        self._http_errors = (http.client.HTTPException, OSError)
+        # خطاهای اتصال keep-alive که سرور قبلاً بسته است (هیچ بایتی از پاسخ نرسیده)
+        self._stale_errors = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+        self._remote_disconnected = http.client.RemoteDisconnected
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"invalid gateway url {url!r}")
+        self.url = url
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.report = report
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self._headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if token:
+            self._headers['Authorization'] = f'Bearer {token}'
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._batch = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.requests = 0
+        self.messages = 0
+        self.connections = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ساخت درگاه از تنظیمات؛ None اگر آدرس درگاه تنظیم نشده باشد"""
+        url = settings.get('gateway_url', {}).get('value', '').strip()
+        if not url:
+            return None
+        return cls(
+            url,
+            token=settings.get('gateway_token', {}).get('value') or None,
+            batch_size=int(settings.get('gateway_batch_size', {}).get('value', DEFAULT_BATCH_SIZE)),
+        )
+
+    def start(self):
+        """راه‌اندازی رشته ارسال دسته‌ای"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='HelloSmsGateway', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """توقف رشته دسته‌بندی بعد از ارسال دسته باقی‌مانده و بستن اتصال‌ها"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def send(self, phone_number, message, sent_intents=None, delivery_intents=None, subscription_id=None):
+        """ارسال یک پیامک (درگاه گزارش تحویل ندارد و delivery_intents نادیده گرفته می‌شود)"""
+        if sent_intents:
+            with self._cond:
+                if self._running:
+                    self._batch.append((phone_number, message, sent_intents))
+                    self._cond.notify()
+                    return True
+            success = self.send_batch([(phone_number, message)])[0]
+            self._report(sent_intents, success)
+            return True
+        return self.send_batch([(phone_number, message)])[0]
+
+    def send_batch(self, messages):
+        """
+        ارسال چند پیامک در یک درخواست
+
+        Args:
+            messages: لیست (شماره، متن)
+
+        Returns:
+            list: نتیجه هر پیامک به همان ترتیب
+        """
+        if not messages:
+            return []
+        body = json.dumps({'messages': [{'to': to, 'text': text} for to, text in messages]},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        try:
+            status, data = self._request(body)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error sending {len(messages)} SMS to gateway: {e}")
+            self.mark_down()
+            return [False] * len(messages)
+
+        self.requests += 1
+        if not 200 <= status < 300:
+            Logger.error(f"HelloSms: SMS gateway returned HTTP {status}")
+            if status >= 500:
+                self.mark_down()
+            return [False] * len(messages)
+        self.messages += len(messages)
+        try:
+            results = json.loads(data)['results']
+            if len(results) == len(messages):
+                return [bool(result.get('ok')) for result in results]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            pass
+        return [True] * len(messages)
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._batch)
+        return {'requests': self.requests, 'messages': self.messages,
+                'connections': self.connections, 'queued': queued}
+
+    def _acquire(self):
+        """یک اتصال از pool یا اتصال جدید؛ (اتصال، استفاده مجدد)"""
+        with self._pool_lock:
+            if self._idle:
+                return self._idle.pop(), True
+        self.connections += 1
+        return self._connection_class(self._host, self._port, timeout=self.timeout), False
+
+    def _release(self, connection):
+        with self._pool_lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _request(self, body):
+        """
+        ارسال درخواست POST و خواندن کامل پاسخ؛ (کد وضعیت، بدنه)
+
+        درخواست فقط وقتی روی اتصال دیگری تکرار می‌شود که اتصال بیکار pool
+        از قبل بسته بوده است: خطای نوشتن در request یا بسته شدن اتصال بدون
+        هیچ بایتی از پاسخ. بعد از آن (مثلاً timeout خواندن پاسخ) ممکن است
+        درگاه دسته را پذیرفته باشد، پس دسته ناموفق اعلام می‌شود و ارسال
+        مجدد به DeliveryTracker سپرده می‌شود تا پیامک‌ها دو بار ارسال نشوند.
+        """
+        while True:
+            connection, reused = self._acquire()
+            try:
+                connection.request('POST', self._path, body, self._headers)
+            except self._http_errors as e:
+                connection.close()
+                if reused and isinstance(e, self._stale_errors):
+                    continue
+                raise
+            try:
+                response = connection.getresponse()
+            except self._http_errors as e:
+                connection.close()
+                if reused and isinstance(e, self._remote_disconnected):
+                    continue
+                raise
+            try:
+                data = response.read()
+            except self._http_errors:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+            return response.status, data
+
+    def _report(self, sent_intents, success):
+        for intent in sent_intents:
+            try:
+                self.report(intent, success)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error reporting gateway SMS result: {e}")
+
+    def _run(self):
+        """حلقه رشته دسته‌بندی"""
+        while True:
+            with self._cond:
+                while self._running and not self._batch:
+                    self._cond.wait()
+                if not self._batch:
+                    return
+                # پنجره کوتاه برای جمع شدن پیامک‌های بیشتر در یک درخواست
+                deadline = time.monotonic() + self.batch_window
+                while self._running and len(self._batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._batch[:self.batch_size]
+                del self._batch[:self.batch_size]
+
+            results = self.send_batch([(phone_number, message) for phone_number, message, _ in batch])
+            for (_, _, sent_intents), success in zip(batch, results):
+                self._report(sent_intents, success)
+
+
+class FailoverTransport(SmsTransport):
+    """
+    ارسال با اولین بک‌اند در دسترس به ترتیب اولویت
+
+    پیامکی که یک بک‌اند نپذیرد با بک‌اند بعدی ارسال می‌شود. فقط خطای خود
+    بک‌اند (استثنا در send، یا خطای اتصال و 5xx درگاه) آن را برای مدتی کنار
+    می‌گذارد، نه رد شدن یک پیامک. بک‌اند کنار گذاشته شده فقط تا وقتی رد
+    می‌شود که بک‌اند سالم دیگری با سهمیه وجود دارد؛ آخرین بک‌اند سالم هیچ
+    وقت کنار گذاشته نمی‌شود.
+    """
+
+    name = 'failover'
+
+    def __init__(self, backends):
+        super().__init__()
+        self.backends = list(backends)
+        self.sent = {backend.name: 0 for backend in self.backends}
+
+    def start(self):
+        for backend in self.backends:
+            backend.start()
+
+    def stop(self):
+        for backend in self.backends:
+            backend.stop()
+
+    def available(self, message=None):
+        return bool(self._candidates(message))
+
+    def send(self, phone_number, message, sent_intents=None, delivery_intents=None, subscription_id=None):
+        for backend in self._candidates(message):
+            try:
+                accepted = backend.send(phone_number, message, sent_intents, delivery_intents, subscription_id)
+            except Exception as e:
+                Logger.error(f"HelloSms: Error in SMS transport {backend.name}: {e}")
+                backend.mark_down()
+                accepted = False
+            if accepted:
+                self.sent[backend.name] += 1
+                return True
+            Logger.warning(f"HelloSms: SMS transport {backend.name} failed, trying next")
+        Logger.error(f"HelloSms: No SMS transport available for {phone_number}")
+        return False
+
+    def _candidates(self, message):
+        """بک‌اندهای دارای سهمیه به ترتیب اولویت؛ کنار گذاشته شده‌ها فقط اگر بک‌اند سالمی نمانده"""
+        ready = [backend for backend in self.backends if backend.ready(message)]
+        return [backend for backend in ready if not backend.is_down()] or ready
+
+    def stats(self):
+        return {'sent': dict(self.sent),
+                'backends': {backend.name: backend.stats() for backend in self.backends}}
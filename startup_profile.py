@@ -0,0 +1,90 @@
+"""
+پروفایل زمان شروع برنامه - زمان هر مرحله شروع در لاگ و فایل لاگ شروع
+
+این ماژول باید اولین import در main.py باشد و خودش هیچ وابستگی سنگینی
+(حتی Kivy) را در زمان import بارگذاری نمی‌کند.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# فایل لاگ شروع - هر خط یک اجرای برنامه به صورت JSON
+STARTUP_LOG_FILE = 'hellosms_startup.log'
+
+# تعداد اجراهای نگه داشته شده در فایل لاگ
+STARTUP_LOG_MAX_RUNS = 50
+
+
+class StartupProfiler:
+    """
+    ثبت زمان مراحل شروع برنامه نسبت به لحظه ساخت پروفایلر
+
+    بعد از report مراحل جدید ثبت نمی‌شوند، پس فراخوانی‌های بعدی همان
+    متدها (مثلاً راه‌اندازی دوباره مانیتورینگ بعد از ذخیره تنظیمات) روی
+    گزارش شروع اثری ندارند.
+    """
+
+    def __init__(self, path=STARTUP_LOG_FILE, started=None):
+        self.path = path
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []
+        self.reported = False
+
+    def record(self, name, begin, end=None):
+        """ثبت مرحله name از begin تا end (زمان perf_counter)"""
+        if self.reported:
+            return
+        end = time.perf_counter() if end is None else end
+        self.phases.append((name, begin - self.started, end - begin))
+
+    def mark(self, name):
+        """ثبت یک لحظه (مرحله با طول صفر) مثل رسم اولین فریم"""
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    @contextmanager
+    def phase(self, name):
+        """اندازه‌گیری بدنه with به عنوان مرحله name"""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, begin)
+
+    def report(self):
+        """نوشتن زمان مراحل در لاگ و افزودن یک خط به فایل لاگ شروع (فقط یک بار)"""
+        if self.reported:
+            return
+        self.reported = True
+        total = time.perf_counter() - self.started
+
+        from kivy.logger import Logger
+        for name, offset, duration in self.phases:
+            Logger.info(f"HelloSms: Startup {name}: {duration * 1000:.1f} ms (at {offset * 1000:.1f} ms)")
+        Logger.info(f"HelloSms: Startup total: {total * 1000:.1f} ms")
+
+        entry = {
+            'ts': round(time.time(), 3),
+            'total_ms': round(total * 1000, 1),
+            # [نام، طول مرحله، شروع مرحله نسبت به شروع برنامه] به میلی‌ثانیه
+            'phases': [[name, round(duration * 1000, 1), round(offset * 1000, 1)]
+                       for name, offset, duration in self.phases],
+        }
+        try:
+            lines = []
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+            lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines[-STARTUP_LOG_MAX_RUNS:])
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            Logger.error(f"HelloSms: Error writing startup log: {e}")
+
+
+# پروفایلر شروع همین پروسه
+profiler = StartupProfiler()
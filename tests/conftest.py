@@ -0,0 +1,15 @@
+"""
+تنظیمات مشترک تست‌ها: اجرای Kivy بدون پردازش آرگومان و لاگ کنسول، و
+import ماژول‌های ریشه مخزن
+"""
+
+import os
+import sys
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,162 @@
+"""
+درگاه HTTP و failover با درگاه جعلی روی localhost
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fake_android import FakeSmsManager
+from fake_gateway import FakeSmsGateway
+from service import AndroidSmsTransport
+from sms_transport import FailoverTransport, HttpGatewayTransport, SmsTransport
+
+
+@pytest.fixture
+def gateway():
+    gateway = FakeSmsGateway().start()
+    yield gateway
+    gateway.stop()
+
+
+class _SilentHandler(BaseHTTPRequestHandler):
+    """درگاهی که بدنه را می‌خواند و پاسخ نمی‌دهد (یا اتصال را می‌بندد)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.posts += 1
+        if self.server.hang:
+            self.server.release.wait(5)
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def silent_gateway():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SilentHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.posts = 0
+    server.hang = True
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def url_of(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}/send'
+
+
+def test_batches_reuse_one_connection(gateway):
+    reports = []
+    done = threading.Event()
+
+    def report(intent, success):
+        reports.append((intent, success))
+        if len(reports) == 10:
+            done.set()
+
+    transport = HttpGatewayTransport(gateway.url, batch_size=5, batch_window=1, report=report)
+    transport.start()
+    try:
+        for index in range(10):
+            assert transport.send('09121234567', f'msg {index}', sent_intents=[index])
+        assert done.wait(5)
+    finally:
+        transport.stop()
+
+    assert sorted(reports) == [(index, True) for index in range(10)]
+    assert gateway.requests == 2
+    assert gateway.connections == 1
+    assert [text for _, text in gateway.received] == [f'msg {index}' for index in range(10)]
+
+
+def test_per_message_results(gateway):
+    gateway.failure_rate = 1.0
+    transport = HttpGatewayTransport(gateway.url)
+
+    assert transport.send_batch([('0912', 'a'), ('0913', 'b')]) == [False, False]
+    # رد شدن پیامک‌ها خطای درگاه نیست
+    assert not transport.is_down()
+
+
+def test_no_repost_after_response_timeout(silent_gateway):
+    transport = HttpGatewayTransport(url_of(silent_gateway), timeout=0.3)
+
+    assert transport.send_batch([('09121234567', 'hello')]) == [False]
+
+    assert silent_gateway.posts == 1
+    assert transport.is_down()
+
+
+def test_no_repost_when_closed_after_body(silent_gateway):
+    silent_gateway.hang = False
+    transport = HttpGatewayTransport(url_of(silent_gateway))
+
+    assert transport.send_batch([('09121234567', 'hello')]) == [False]
+
+    time.sleep(0.1)
+    assert silent_gateway.posts == 1
+
+
+def test_failover_to_gateway_when_sms_manager_raises(gateway):
+    class BrokenSmsManager(FakeSmsManager):
+        def sendTextMessage(self, *args):
+            raise RuntimeError('radio off')
+
+    android = AndroidSmsTransport(BrokenSmsManager())
+    transport = FailoverTransport([android, HttpGatewayTransport(gateway.url)])
+
+    assert transport.send('09121234567', 'hello')
+
+    assert gateway.received == [('09121234567', 'hello')]
+    assert transport.stats()['sent'] == {'android': 0, 'http': 1}
+
+
+def test_failover_to_android_when_gateway_unreachable():
+    stopped = FakeSmsGateway().start()
+    url = stopped.url
+    stopped.stop()
+    sms_manager = FakeSmsManager()
+    http = HttpGatewayTransport(url, timeout=1)
+    transport = FailoverTransport([http, AndroidSmsTransport(sms_manager)])
+
+    assert transport.send('09121234567', 'hello')
+    assert http.is_down()
+    assert transport.send('09121234567', 'hello')
+
+    assert len(sms_manager.sent) == 2
+    # درگاه کنار گذاشته شده تا پایان backoff امتحان نمی‌شود
+    assert http.connections == 1
+
+
+def test_last_backend_is_never_benched():
+    class FlakyTransport(SmsTransport):
+        name = 'flaky'
+        calls = 0
+
+        def send(self, *args, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError('transient')
+            return True
+
+    backend = FlakyTransport()
+    transport = FailoverTransport([backend])
+
+    assert not transport.send('09121234567', 'hello')
+    assert backend.is_down()
+    # تنها بک‌اند با وجود خطای قبلی دوباره امتحان می‌شود
+    assert transport.send('09121234567', 'hello')
+    assert backend.calls == 2
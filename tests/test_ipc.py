@@ -0,0 +1,105 @@
+"""
+رفت و برگشت IPC بین رابط کاربری و سرویس (در همین پروسه و با سرویس بدون رابط کاربری)
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from call_state import CALL_STATE_IDLE, CALL_STATE_RINGING
+from ipc import IPC_SOCKET_FILE, IpcClient, IpcError, IpcServer
+from conftest import ROOT
+
+
+@pytest.fixture
+def server(tmp_path):
+    def fail(request):
+        raise ValueError('boom')
+
+    server = IpcServer({'echo': lambda request: {'echo': request.get('value')}, 'fail': fail},
+                       str(tmp_path / IPC_SOCKET_FILE))
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_round_trip(server):
+    client = IpcClient(server.path)
+    try:
+        assert client.request('echo', value='سلام') == {'ok': True, 'echo': 'سلام'}
+        assert client.request('echo', value=[1, 2]) == {'ok': True, 'echo': [1, 2]}
+    finally:
+        client.close()
+    assert server.requests == 2
+
+
+def test_errors_are_reported(server):
+    client = IpcClient(server.path)
+    try:
+        with pytest.raises(IpcError, match='boom'):
+            client.request('fail')
+        with pytest.raises(IpcError, match='unknown command'):
+            client.request('missing')
+        # اتصال بعد از پاسخ خطا قابل استفاده است
+        assert client.request('echo', value=1)['echo'] == 1
+    finally:
+        client.close()
+
+
+def test_unreachable_service_then_connect(tmp_path):
+    path = str(tmp_path / IPC_SOCKET_FILE)
+    client = IpcClient(path)
+    server = IpcServer({'echo': lambda request: {'echo': request.get('value')}}, path)
+    try:
+        with pytest.raises(IpcError, match='not reachable'):
+            client.request('echo', value=1)
+        server.start()
+        assert client.request('echo', value=2)['echo'] == 2
+    finally:
+        client.close()
+        server.stop()
+
+
+def wait_for_service(client, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return client.request('status')
+        except IpcError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def test_headless_service(tmp_path):
+    env = dict(os.environ, KIVY_NO_FILELOG='1')
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'service.py')], cwd=tmp_path, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = IpcClient(str(tmp_path / IPC_SOCKET_FILE), timeout=5)
+    try:
+        wait_for_service(client)
+        client.request('settings', settings={'sms_enabled': {'value': True},
+                                             'sms_text': {'value': 'سلام {number}'},
+                                             'reply_cooldown_minutes': {'value': 0}})
+
+        client.request('call_state', state=CALL_STATE_RINGING, number='09121234567')
+        client.request('call_state', state=CALL_STATE_IDLE)
+        wait_until(lambda: client.request('status')['sent'] == 1)
+
+        client.request('stop')
+        assert process.wait(10) == 0
+    finally:
+        client.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
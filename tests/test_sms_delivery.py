@@ -0,0 +1,153 @@
+"""
+ارسال مجدد و انصراف DeliveryTracker با SmsManager جعلی
+"""
+
+import threading
+import time
+
+import pytest
+
+import sms_delivery
+from fake_android import FakeSmsManager, fake_intent_factory
+from service import send_sms
+from sms_delivery import SMS_DELIVERED_ACTION, SMS_SENT_ACTION, DeliveryTracker
+
+
+class Results:
+    """جمع‌آوری نتیجه‌های نهایی on_result"""
+
+    def __init__(self):
+        self.items = []
+        self.event = threading.Event()
+
+    def __call__(self, phone_number, message, success):
+        self.items.append((phone_number, message, success))
+        self.event.set()
+
+    def wait(self, timeout=5):
+        assert self.event.wait(timeout), 'no final result'
+        return self.items
+
+
+@pytest.fixture
+def tracker_with():
+    trackers = []
+
+    def make(sms_manager, send_func=None, **kwargs):
+        results = Results()
+        if send_func is None:
+            send_func = lambda *args: send_sms(*args[:4], sms_manager=sms_manager)
+        tracker = DeliveryTracker(send_func, fake_intent_factory, results,
+                                  base_delay=0.01, max_delay=0.05, **kwargs)
+        sms_manager.on_broadcast = tracker.handle_broadcast
+        tracker.start()
+        trackers.append(tracker)
+        return tracker, results
+
+    yield make
+    for tracker in trackers:
+        tracker.stop()
+
+
+def test_sent_on_first_attempt(tracker_with):
+    sms_manager = FakeSmsManager()
+    tracker, results = tracker_with(sms_manager)
+
+    tracker.send('09121234567', 'hello')
+
+    assert results.wait() == [('09121234567', 'hello', True)]
+    assert len(sms_manager.sent) == 1
+    # با رسیدن گزارش تحویل پیامک از جدول حذف می‌شود
+    assert tracker.in_flight() == []
+
+
+def test_gives_up_after_max_attempts(tracker_with):
+    sms_manager = FakeSmsManager(failure_rate=1.0)
+    tracker, results = tracker_with(sms_manager, max_attempts=3)
+    done = []
+
+    tracker.send('09121234567', 'hello', on_done=done.append)
+
+    assert results.wait() == [('09121234567', 'hello', False)]
+    assert len(sms_manager.sent) == 3
+    assert done == [False]
+    assert tracker.in_flight() == []
+
+
+def test_retry_succeeds_after_rejections(tracker_with):
+    sms_manager = FakeSmsManager()
+    attempts = []
+
+    def send_func(phone_number, message, sent_intents, delivery_intents, subscription_id):
+        attempts.append(subscription_id)
+        if len(attempts) < 3:
+            raise RuntimeError('radio off')
+        return send_sms(phone_number, message, sent_intents, delivery_intents, sms_manager)
+
+    tracker, results = tracker_with(sms_manager, send_func)
+
+    tracker.send('09121234567', 'hello', subscription_id=7)
+
+    assert results.wait() == [('09121234567', 'hello', True)]
+    assert attempts == [7, 7, 7]
+    assert len(sms_manager.sent) == 1
+
+
+def test_multipart_waits_for_every_part(tracker_with):
+    sms_manager = FakeSmsManager(deliver=False)
+    # گزارش‌ها دستی فرستاده می‌شوند
+    tracker, results = tracker_with(sms_manager)
+    sms_manager.on_broadcast = None
+    message = 'a' * 200
+
+    tracker.send('09121234567', message)
+    [record] = tracker.in_flight()
+    assert record['parts'] == 2
+
+    tracker.handle_broadcast(SMS_SENT_ACTION, record['id'], 0, True)
+    assert results.items == []
+    tracker.handle_broadcast(SMS_SENT_ACTION, record['id'], 1, True)
+    assert results.wait() == [('09121234567', message, True)]
+
+
+def test_delivery_report_before_sent_report(tracker_with):
+    sms_manager = FakeSmsManager(deliver=False)
+    tracker, results = tracker_with(sms_manager)
+    sms_manager.on_broadcast = None
+
+    tracker.send('09121234567', 'hello')
+    [record] = tracker.in_flight()
+    tracker.handle_broadcast(SMS_DELIVERED_ACTION, record['id'], 0, True)
+    tracker.handle_broadcast(SMS_SENT_ACTION, record['id'], 0, True)
+
+    assert results.wait() == [('09121234567', 'hello', True)]
+    assert tracker.in_flight() == []
+
+
+def test_missing_sent_report_fails_without_resend(tracker_with, monkeypatch):
+    monkeypatch.setattr(sms_delivery, 'SENT_REPORT_TIMEOUT', 0.05)
+    sms_manager = FakeSmsManager()
+    tracker, results = tracker_with(sms_manager)
+    # گزارش ارسال هرگز نمی‌رسد
+    sms_manager.on_broadcast = None
+
+    tracker.send('09121234567', 'hello')
+
+    assert results.wait() == [('09121234567', 'hello', False)]
+    assert len(sms_manager.sent) == 1
+    assert tracker.in_flight() == []
+
+
+def test_missing_delivery_report_is_dropped(tracker_with, monkeypatch):
+    monkeypatch.setattr(sms_delivery, 'DELIVERY_REPORT_TIMEOUT', 0.05)
+    sms_manager = FakeSmsManager(deliver=False)
+    tracker, results = tracker_with(sms_manager)
+
+    tracker.send('09121234567', 'hello')
+
+    assert results.wait() == [('09121234567', 'hello', True)]
+    deadline = time.monotonic() + 5
+    while tracker.in_flight() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert tracker.in_flight() == []
+    assert len(results.items) == 1
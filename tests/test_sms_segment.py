@@ -0,0 +1,64 @@
+"""
+مرزهای تقسیم پیامک GSM-7 و UCS-2 طبق قواعد اپراتور (3GPP TS 23.038/23.040)
+"""
+
+import pytest
+
+from sms_segment import ENCODING_GSM7, ENCODING_UCS2, segment_message
+
+
+@pytest.mark.parametrize('length, parts', [(160, 1), (161, 2), (306, 2), (307, 3)])
+def test_gsm7_boundaries(length, parts):
+    segmented = segment_message('a' * length)
+
+    assert segmented.encoding == ENCODING_GSM7
+    assert len(segmented.parts) == parts
+    assert segmented.units == length
+    assert ''.join(segmented.parts) == 'a' * length
+    if parts > 1:
+        assert all(len(part) <= 153 for part in segmented.parts)
+
+
+def test_gsm7_extended_chars_count_twice():
+    assert len(segment_message('€' * 80).parts) == 1
+    assert len(segment_message('€' * 80 + 'a').parts) == 2
+    assert segment_message('€' * 80).units == 160
+
+
+def test_gsm7_escape_sequence_not_split():
+    # 152 septet + '€' (دو septet) از 153 بیشتر است، پس '€' به بخش دوم می‌رود
+    segmented = segment_message('a' * 152 + '€' + 'a' * 10)
+
+    assert segmented.parts[0] == 'a' * 152
+    assert segmented.parts[1] == '€' + 'a' * 10
+
+
+@pytest.mark.parametrize('length, parts', [(70, 1), (71, 2), (134, 2), (135, 3)])
+def test_ucs2_boundaries(length, parts):
+    segmented = segment_message('س' * length)
+
+    assert segmented.encoding == ENCODING_UCS2
+    assert len(segmented.parts) == parts
+    if parts > 1:
+        assert all(len(part) <= 67 for part in segmented.parts)
+
+
+def test_single_non_gsm_char_switches_to_ucs2():
+    segmented = segment_message('a' * 69 + 'س')
+
+    assert segmented.encoding == ENCODING_UCS2
+    assert len(segmented.parts) == 1
+    assert len(segment_message('a' * 70 + 'س').parts) == 2
+
+
+def test_surrogate_pair_not_split():
+    # هر ایموجی دو واحد UTF-16 است: 66 + 2 از 67 بیشتر است
+    segmented = segment_message('س' * 66 + '😀' + 'س' * 10)
+
+    assert segmented.units == 78
+    assert segmented.parts[0] == 'س' * 66
+    assert segmented.parts[1].startswith('😀')
+
+
+def test_empty_message_is_one_part():
+    assert segment_message('').parts == ('',)
@@ -0,0 +1,76 @@
+"""
+انتخاب SmsManager هر سیم‌کارت با لایه jnius جعلی (fake_android)
+"""
+
+from fake_android import FakeSmsManagerClass, FakeSubscriptionManager
+from send_scheduler import SendRateLimiter
+from service import AndroidSmsTransport, SubscriptionRegistry
+
+
+def make_transport(subscription_ids=(11, 22), line_limiter_factory=None):
+    manager_class = FakeSmsManagerClass()
+    registry = SubscriptionRegistry(manager_class, FakeSubscriptionManager(subscription_ids))
+    transport = AndroidSmsTransport(subscriptions=registry, line_limiter_factory=line_limiter_factory)
+    return transport, registry, manager_class
+
+
+def test_reply_uses_sim_that_received_call():
+    transport, _, manager_class = make_transport()
+
+    assert transport.send('09121234567', 'hello', subscription_id=22)
+    assert transport.send('09121234567', 'hello', subscription_id=11)
+
+    assert [dest for dest, _ in manager_class.managers[22].sent] == ['+989121234567']
+    assert [dest for dest, _ in manager_class.managers[11].sent] == ['+989121234567']
+    assert transport.stats()['lines'] == {22: 1, 11: 1}
+
+
+def test_unknown_line_rotates_between_sims():
+    transport, _, manager_class = make_transport()
+
+    for _ in range(4):
+        assert transport.send('09121234567', 'hello')
+
+    assert len(manager_class.managers[11].sent) == 2
+    assert len(manager_class.managers[22].sent) == 2
+
+
+def test_no_subscriptions_uses_default_manager():
+    transport, _, manager_class = make_transport(subscription_ids=())
+
+    assert transport.send('09121234567', 'hello', subscription_id=22)
+
+    assert list(manager_class.managers) == [None]
+
+
+def test_exhausted_line_falls_back_to_other_sim():
+    factory = lambda: SendRateLimiter(messages_per_minute=0.001, parts_per_minute=0.001, burst=1)
+    transport, _, manager_class = make_transport(line_limiter_factory=factory)
+
+    assert transport.send('09121234567', 'hello', subscription_id=11)
+    assert transport.send('09121234567', 'hello', subscription_id=11)
+    assert not transport.ready('hello')
+    assert not transport.send('09121234567', 'hello', subscription_id=11)
+
+    assert len(manager_class.managers[11].sent) == 1
+    assert len(manager_class.managers[22].sent) == 1
+
+
+def test_lookups_are_cached_until_sim_change():
+    transport, registry, manager_class = make_transport()
+    subscription_manager = registry.subscription_manager
+
+    for _ in range(10):
+        transport.send('09121234567', 'hello', subscription_id=11)
+    assert manager_class.lookups == 1
+    assert subscription_manager.calls == 1
+
+    changes = []
+    registry.on_change.append(lambda: changes.append(True))
+    subscription_manager.set_subscriptions([33])
+    registry.invalidate()
+    assert transport.send('09121234567', 'hello', subscription_id=11)
+
+    assert changes == [True]
+    assert len(manager_class.managers[33].sent) == 1
+    assert subscription_manager.calls == 2